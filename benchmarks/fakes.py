@@ -0,0 +1,198 @@
+"""
+In-process stand-ins for Elasticsearch and the processor's requests
+session, so the processing pipeline can be benchmarked without a network.
+"""
+import io
+import json
+import os
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from elasticsearch.exceptions import NotFoundError, ConflictError
+from bonfire.elastic import ESCollection, ESDocument
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+class FakeIndices(object):
+
+    def exists(self, *args, **kwargs):
+        return True
+
+    def create(self, *args, **kwargs):
+        pass
+
+    def put_mapping(self, *args, **kwargs):
+        pass
+
+    def delete_mapping(self, *args, **kwargs):
+        pass
+
+    def refresh(self, *args, **kwargs):
+        pass
+
+
+class FakeES(object):
+    """
+    Dict-backed stand-in for bonfire.elastic.ESClient. Documents are stored
+    by (index, doc_type, id). Searches ignore the query body and return the
+    documents of the requested types, which is enough for the processor's
+    queue and cache lookups.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.indices = FakeIndices()
+        self.counter = 0
+
+    def _hit(self, key, source):
+        index, doc_type, id_ = key
+        return {
+            '_index': index,
+            '_type': doc_type,
+            '_id': id_,
+            '_version': 1,
+            'found': True,
+            '_source': source
+        }
+
+    def index(self, index, doc_type, body, id=None, op_type=None, **kwargs):
+        if id is None:
+            self.counter += 1
+            id = str(self.counter)
+        key = (index, doc_type, str(id))
+        if op_type == 'create' and key in self.docs:
+            raise ConflictError(409, 'DocumentAlreadyExistsException')
+        self.docs[key] = dict(body)
+        return {'_id': id, 'created': True}
+
+    def create(self, index, doc_type, body, id=None, **kwargs):
+        return self.index(index, doc_type, body, id=id, op_type='create')
+
+    def update(self, index, doc_type, id, body, **kwargs):
+        key = (index, doc_type, str(id))
+        if key not in self.docs:
+            if not body.get('doc_as_upsert'):
+                raise NotFoundError(404, 'DocumentMissingException')
+            self.docs[key] = {}
+        self.docs[key].update(body.get('doc', {}))
+
+    def get(self, index, id, doc_type='_all', **kwargs):
+        key = (index, doc_type, str(id))
+        if key not in self.docs:
+            raise NotFoundError(404, 'not found')
+        return ESDocument(self._hit(key, self.docs[key]))
+
+    def get_source(self, *args, **kwargs):
+        return self.get(*args, **kwargs)
+
+    def exists(self, index, id, doc_type='_all', **kwargs):
+        return (index, doc_type, str(id)) in self.docs
+
+    def delete(self, index, doc_type, id, **kwargs):
+        key = (index, doc_type, str(id))
+        if key not in self.docs:
+            raise NotFoundError(404, 'not found')
+        del self.docs[key]
+
+    def mget(self, body, index, doc_type, **kwargs):
+        docs = []
+        for id_ in body['ids']:
+            key = (index, doc_type, str(id_))
+            if key in self.docs:
+                docs.append(self._hit(key, self.docs[key]))
+            else:
+                docs.append({'_index': index, '_type': doc_type,
+                    '_id': id_, 'found': False})
+        return ESCollection({'docs': docs})
+
+    def search(self, index=None, doc_type=None, body=None, size=10,
+               **kwargs):
+        doc_types = doc_type.split(',') if doc_type else None
+        hits = [self._hit(key, source) for key, source in
+            sorted(self.docs.items())
+            if key[0] == index and (not doc_types or key[1] in doc_types)]
+        return ESCollection({
+            'took': 0,
+            'hits': {
+                'total': len(hits),
+                'max_score': None,
+                'hits': hits[:size]
+            }
+        })
+
+    def count(self, index=None, doc_type=None, body=None, **kwargs):
+        return {'count': len([k for k in self.docs
+            if k[0] == index and (not doc_type or k[1] == doc_type)])}
+
+    def bulk(self, actions):
+        for action in actions:
+            op = action.get('_op_type', 'index')
+            key = (action['_index'], action['_type'], action['_id'])
+            if op == 'delete':
+                self.docs.pop(key, None)
+            elif op == 'update':
+                self.docs.setdefault(key, {}).update(action['doc'])
+            else:
+                self.docs[key] = action['_source']
+
+
+class FakeConnection(object):
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    """
+    Stand-in for a requests session, serving recorded pages. Each page in
+    fixtures/pages.json maps a tweeted url to the redirects it went
+    through, its final url, content type, and body file.
+    """
+
+    def __init__(self, pages=None):
+        if pages is None:
+            pages = load_fixture('pages.json')
+        self.pages = dict((p['url'], p) for p in pages)
+        self.bodies = {}
+        for page in pages:
+            if page['file']:
+                path = os.path.join(FIXTURES_DIR, 'pages', page['file'])
+                with open(path, 'rb') as f:
+                    self.bodies[page['url']] = f.read()
+            else:
+                self.bodies[page['url']] = '\0' * 1024 * 1024
+        self.headers = {}
+
+    def _response(self, url, status, headers, body):
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response.connection = FakeConnection()
+        return response
+
+    def get(self, url, **kwargs):
+        page = self.pages.get(url)
+        if page is None:
+            raise requests.exceptions.ConnectionError('No fixture for %s' % url)
+        history = []
+        redirects = page['redirects']
+        for i, hop in enumerate(redirects):
+            target = redirects[i + 1] if i + 1 < len(redirects) \
+                else page['final_url']
+            history.append(self._response(hop, 301, {'Location': target}, ''))
+        response = self._response(page['final_url'], 200,
+            {'Content-Type': page['content_type']}, self.bodies[url])
+        response.history = history
+        return response
+
+    def close(self):
+        pass
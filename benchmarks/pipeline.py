@@ -0,0 +1,171 @@
+"""
+Offline benchmark of the processing pipeline.
+
+Runs recorded tweets through `process.process_rawtweet`, and recorded pages
+through `content.extract`, against in-process stand-ins for Elasticsearch
+and the web, then reports tweets/sec, pages/sec, p50/p99 extraction time and
+peak RSS. Results are compared against benchmarks/baseline.json.
+
+Run from the repository root:
+
+::
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --check
+    python -m benchmarks.pipeline --save-baseline
+"""
+import ConfigParser
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import warnings
+import click
+from bonfire import config, content, db, metrics, process
+from bonfire.elastic import ESDocument
+from bonfire.metrics import percentile
+from bonfire.process import UnsupportedContentType
+from .fakes import FakeES, FakeSession, load_fixture
+
+UNIVERSE = 'benchmark'
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_TOLERANCE = 0.3
+# Whether a larger value of each result is an improvement
+HIGHER_IS_BETTER = {
+    'tweets_per_sec': True,
+    'pages_per_sec': True,
+    'extract_p50_ms': False,
+    'extract_p99_ms': False,
+    'peak_rss_kb': False,
+}
+
+
+def setup_universe():
+    """Point the benchmark universe at a fresh in-memory Elasticsearch."""
+    parser = ConfigParser.SafeConfigParser()
+    parser.add_section('universe:%s' % UNIVERSE)
+    config.use_settings(parser)
+    db._es_connections[UNIVERSE] = FakeES()
+
+
+def raw_tweets():
+    return [ESDocument({
+        '_index': UNIVERSE,
+        '_type': db.UNPROCESSED_TWEET_DOCUMENT_TYPE,
+        '_id': tweet['id_str'],
+        '_source': tweet
+    }) for tweet in load_fixture('tweets.json')]
+
+
+def bench_tweets(iterations):
+    """Process every recorded tweet with a cold URL cache, `iterations`
+    times. Returns tweets per second."""
+    tweets = raw_tweets()
+    session = FakeSession()
+    elapsed = 0.0
+    for i in range(iterations):
+        setup_universe()
+        start = time.time()
+        for tweet in tweets:
+            process.process_rawtweet(UNIVERSE, tweet, session=session)
+        elapsed += time.time() - start
+    return len(tweets) * iterations / elapsed
+
+
+def bench_pages(iterations):
+    """Fetch and extract every recorded HTML page `iterations` times.
+    Returns pages per second and the extraction times in ms."""
+    session = FakeSession()
+    max_length = config.get_max_content_length(UNIVERSE)
+    pages = []
+    for page in load_fixture('pages.json'):
+        try:
+            response, html = process.fetch_html(session, page['url'],
+                max_length)
+        except UnsupportedContentType:
+            continue
+        pages.append((response.url, html,
+            [r.url for r in response.history]))
+    times = []
+    for i in range(iterations):
+        for url, html, redirect_urls in pages:
+            start = time.time()
+            content.extract(url, html=html, resolved_url=url,
+                redirect_urls=redirect_urls)
+            times.append((time.time() - start) * 1000)
+    return len(times) / (sum(times) / 1000), sorted(times)
+
+
+def run(iterations):
+    setup_universe()
+    # Warm up imports and parser caches before timing anything
+    bench_tweets(1)
+    metrics.registry.reset()
+    tweets_per_sec = bench_tweets(iterations)
+    pages_per_sec, times = bench_pages(iterations)
+    return {
+        'tweets_per_sec': round(tweets_per_sec, 1),
+        'pages_per_sec': round(pages_per_sec, 1),
+        'extract_p50_ms': round(percentile(times, 50), 2),
+        'extract_p99_ms': round(percentile(times, 99), 2),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results to a baseline. Returns a list of (name, result,
+    baseline, change) tuples for the results that regressed by more than
+    the tolerance, a fraction of the baseline.
+    """
+    regressions = []
+    for name, higher_is_better in sorted(HIGHER_IS_BETTER.items()):
+        if not baseline.get(name):
+            continue
+        change = float(results[name] - baseline[name]) / baseline[name]
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((name, results[name], baseline[name], change))
+    return regressions
+
+
+@click.command()
+@click.option('--iterations', default=20,
+    help='Number of passes over the recorded tweets and pages.')
+@click.option('--tolerance', default=DEFAULT_TOLERANCE,
+    help='Allowed regression from the baseline, as a fraction.')
+@click.option('--save-baseline', is_flag=True,
+    help='Save these results as the new baseline.')
+@click.option('--check', is_flag=True,
+    help='Exit with an error if any result regressed past the tolerance.')
+def main(iterations, tolerance, save_baseline, check):
+    """Benchmark tweet processing and content extraction offline."""
+    logging.getLogger('bonfire').setLevel(logging.ERROR)
+    warnings.simplefilter('ignore')
+    results = run(iterations)
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+    for name in sorted(results):
+        line = '%-16s %10s' % (name, results[name])
+        if baseline.get(name):
+            change = float(results[name] - baseline[name]) / baseline[name]
+            line += '   baseline %10s  %+.1f%%' % (baseline[name],
+                change * 100)
+        click.echo(line)
+    if save_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        click.echo('Saved baseline to %s' % BASELINE_FILE)
+    regressions = compare(results, baseline, tolerance)
+    for name, result, base, change in regressions:
+        click.echo('Regression: %s is %s, %+.1f%% from baseline %s' % (
+            name, result, change * 100, base), err=True)
+    if check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
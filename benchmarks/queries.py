@@ -0,0 +1,128 @@
+"""
+Benchmark of the universe queries against a local Elasticsearch.
+
+For each data size, loads a synthetic universe (see benchmarks.synthetic)
+and times `get_items` at each of the `CACHE_HOURS` windows, `search_items`,
+`get_top_link` and finally `cleanup`, recording wall time and the `took` time
+Elasticsearch reports for the searches each one makes.
+
+This replaces the benchmark universe's index, and `cleanup` deletes old
+documents from the shared url and results cache indices, so only point it at
+a disposable Elasticsearch:
+
+::
+
+    python -m benchmarks.queries --host localhost:9200 \\
+        --size 1000:10000 --size 5000:100000
+"""
+import ConfigParser
+import json
+import logging
+import time
+import warnings
+import click
+from bonfire import config, db, metrics
+from bonfire.elastic import ESClient
+from bonfire.metrics import percentile
+from bonfire.universe import CACHE_HOURS
+from .synthetic import load_universe, WORDS
+
+UNIVERSE = 'bonfire_benchmark'
+
+
+def setup_universe(host):
+    """Point the benchmark universe at the given Elasticsearch host."""
+    parser = ConfigParser.SafeConfigParser()
+    parser.add_section('universe:%s' % UNIVERSE)
+    config.use_settings(parser)
+    db._es_connections[UNIVERSE] = ESClient(hosts=[host])
+
+
+def es_took():
+    timer = metrics.registry.timers.get('es.search.took')
+    return timer.total if timer else 0.0
+
+
+def measure(f, repeat):
+    """Call f repeat times. Returns wall time and Elasticsearch took time
+    percentiles, in ms."""
+    times, tooks = [], []
+    for i in range(repeat):
+        took = es_took()
+        start = time.time()
+        f()
+        times.append((time.time() - start) * 1000)
+        tooks.append(es_took() - took)
+    times.sort()
+    tooks.sort()
+    return {
+        'p50_ms': round(percentile(times, 50), 2),
+        'p99_ms': round(percentile(times, 99), 2),
+        'took_p50_ms': percentile(tooks, 50),
+        'took_p99_ms': percentile(tooks, 99),
+    }
+
+
+def benchmarks():
+    """The queries to benchmark, as (name, function) pairs."""
+    queries = [('get_items.%dh' % hours,
+        lambda hours=hours: db.get_items(UNIVERSE, hours=hours))
+        for hours in CACHE_HOURS]
+    queries.append(('search_items',
+        lambda: db.search_items(UNIVERSE, WORDS[0])))
+    queries.append(('get_top_link',
+        lambda: db.get_top_link(UNIVERSE)))
+    return queries
+
+
+def run(num_users, num_tweets, repeat, skew, days):
+    load_universe(UNIVERSE, num_users, num_tweets, skew=skew, days=days)
+    results = {}
+    for name, f in benchmarks():
+        f()  # warm up Elasticsearch's caches for the query
+        results[name] = measure(f, repeat)
+    # cleanup deletes what it finds, so it can only be timed once
+    results['cleanup'] = measure(lambda: db.cleanup(UNIVERSE), 1)
+    return results
+
+
+def parse_size(size):
+    users, tweets = size.split(':')
+    return int(users), int(tweets)
+
+
+@click.command()
+@click.option('--host', default='localhost:9200',
+    help='Elasticsearch host to load and query.')
+@click.option('--size', 'sizes', multiple=True,
+    default=['1000:10000', '5000:100000'],
+    help='Data size to benchmark, as USERS:TWEETS. Repeatable.')
+@click.option('--repeat', default=20, help='Times to run each query.')
+@click.option('--skew', default=1.1,
+    help='Exponent of the Zipf distribution of tweets over links.')
+@click.option('--days', default=35, help='Age in days of the oldest link.')
+@click.option('--output', type=click.Path(),
+    help='Also write the results to this JSON file.')
+def main(host, sizes, repeat, skew, days, output):
+    """Benchmark universe queries over synthetic data."""
+    logging.getLogger('elasticsearch').setLevel(logging.ERROR)
+    warnings.simplefilter('ignore')
+    setup_universe(host)
+    all_results = {}
+    for size in sizes:
+        num_users, num_tweets = parse_size(size)
+        click.echo('%d users, %d tweets' % (num_users, num_tweets))
+        results = run(num_users, num_tweets, repeat, skew, days)
+        for name in sorted(results):
+            r = results[name]
+            click.echo('  %-16s p50 %9.2f ms  p99 %9.2f ms  '
+                'took p50 %6s ms  p99 %6s ms' % (name, r['p50_ms'],
+                r['p99_ms'], r['took_p50_ms'], r['took_p99_ms']))
+        all_results[size] = results
+    if output:
+        with open(output, 'w') as f:
+            json.dump(all_results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
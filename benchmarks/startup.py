@@ -0,0 +1,110 @@
+"""
+Startup time of bonfire commands.
+
+Runs each command in a fresh interpreter, several times, and reports the
+median wall time, the time of the bare interpreter for comparison, and which
+heavy libraries the command loaded. With --imports, also lists the slowest
+modules to import for each command, like `python -X importtime` in Python 3.
+
+::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --imports "cache --help"
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import click
+
+DEFAULT_COMMANDS = ('help', 'universes', 'status --help', 'cache --help',
+    'process --help')
+HEAVY_MODULES = ('elasticsearch', 'birdy', 'requests', 'bs4', 'delorean')
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), os.pardir,
+    'bonfire', 'bonfire.cfg')
+
+# Run in the child interpreter: time imports, run the command, and report
+# back on the last line of stderr.
+CHILD = '''
+import __builtin__, json, sys, time
+args, heavy, trace = json.loads(sys.argv[1])
+times, stack = {}, []
+if trace:
+    real_import = __builtin__.__import__
+    def timed_import(name, *a, **kw):
+        new = name not in sys.modules
+        start = time.time()
+        stack.append(0.0)
+        try:
+            return real_import(name, *a, **kw)
+        finally:
+            elapsed = time.time() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if new and name in sys.modules:
+                times[name] = (elapsed - children) * 1000
+    __builtin__.__import__ = timed_import
+from bonfire.cli import cli
+try:
+    cli(args, standalone_mode=False)
+except SystemExit:
+    pass
+sys.stderr.write('\\n' + json.dumps({
+    'loaded': [m for m in heavy if m in sys.modules],
+    'imports': sorted(times.items(), key=lambda t: -t[1])[:15]}) + '\\n')
+'''
+
+
+def run_child(code, argv):
+    env = dict(os.environ)
+    env.setdefault('BONFIRE_CONFIG', os.path.abspath(CONFIG_FILE))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [
+        os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+        env.get('PYTHONPATH')]))
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-c', code] + argv, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    elapsed = (time.time() - start) * 1000
+    return elapsed, err
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_command(command, repeat, trace=False):
+    """Returns the median ms to run a command, and the child's report from
+    its last run."""
+    argv = [json.dumps([command.split(), HEAVY_MODULES, trace])]
+    times = []
+    for i in range(repeat):
+        elapsed, err = run_child(CHILD, argv)
+        times.append(elapsed)
+    return median(times), json.loads(err.strip().splitlines()[-1])
+
+
+@click.command()
+@click.argument('commands', nargs=-1)
+@click.option('--repeat', default=5, help='Runs of each command.')
+@click.option('--imports', is_flag=True,
+    help='Also show the slowest modules to import.')
+def main(commands, repeat, imports):
+    """Time the startup of bonfire commands, e.g. "cache --help"."""
+    python = median([run_child('pass', [])[0] for i in range(repeat)])
+    click.echo('%-20s %8.1f ms' % ('(python)', python))
+    for command in commands or DEFAULT_COMMANDS:
+        ms, report = time_command(command, repeat)
+        click.echo('%-20s %8.1f ms  loads %s' % (command, ms,
+            ', '.join(report['loaded']) or '-'))
+        if imports:
+            ms, report = time_command(command, 1, trace=True)
+            for name, import_ms in report['imports']:
+                click.echo('    %-44s %8.1f ms' % (name, import_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Synthetic universe data for benchmarking queries against a local
+Elasticsearch.
+
+Users get a weight like the one `build_universe` gives them: the fraction of
+14 authorities that follow them. Links are published at random times over
+the last `days` days, and the number of tweets each one gets follows a Zipf
+distribution: the link of popularity rank r gets a share of tweets
+proportional to 1 / r ** skew. A link's tweets arrive after it is published,
+with exponentially distributed delays, so that every time window has links
+that are new to it.
+"""
+import bisect
+import random
+from elasticsearch.helpers import bulk
+from bonfire.dates import now_epoch, epoch_to_datetime, stringify_date, \
+    DAY_MS, MINUTE_MS
+from bonfire.db import (
+    es,
+    build_universe_mappings,
+    USER_DOCUMENT_TYPE,
+    CONTENT_DOCUMENT_TYPE,
+    TWEET_DOCUMENT_TYPE)
+
+AUTHORITIES = 14
+LINK_LIFETIME_MS = 6 * 60 * MINUTE_MS
+WORDS = ('election', 'budget', 'council', 'climate', 'school', 'transit',
+    'housing', 'court', 'health', 'storm', 'police', 'museum', 'startup',
+    'mayor', 'river', 'library', 'festival', 'science', 'data', 'vote')
+CHUNK_SIZE = 5000
+
+
+def sentence(rand, length):
+    return ' '.join(rand.choice(WORDS) for i in range(length))
+
+
+class ZipfChooser(object):
+    """Choose indexes 0..n-1, where index i is chosen with probability
+    proportional to 1 / (i + 1) ** skew."""
+
+    def __init__(self, n, skew, rand):
+        self.rand = rand
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, n + 1):
+            total += 1.0 / rank ** skew
+            self.cumulative.append(total)
+
+    def choose(self):
+        return bisect.bisect_left(self.cumulative,
+            self.rand.random() * self.cumulative[-1])
+
+
+def generate_users(num_users, rand):
+    for i in range(num_users):
+        yield {
+            'id': str(i),
+            'weight': rand.randint(1, AUTHORITIES) / float(AUTHORITIES)
+        }
+
+
+def generate_links(num_links, days, rand, now_ms):
+    """Generate content documents, with a `published_ms` used to time
+    their tweets. Returns them in popularity rank order."""
+    links = []
+    for i in range(num_links):
+        url = 'http://news%d.example.com/story/%d' % (i % 50, i)
+        links.append({
+            'url': url,
+            'title': sentence(rand, 6),
+            'description': sentence(rand, 20),
+            'provider': 'news%d.example.com' % (i % 50),
+            'published_ms': now_ms - rand.randint(0, days * DAY_MS),
+        })
+    return links
+
+
+def generate_tweets(num_tweets, num_users, links, skew, rand, now_ms):
+    chooser = ZipfChooser(len(links), skew, rand)
+    for i in range(num_tweets):
+        link = links[chooser.choose()]
+        created_ms = link['published_ms'] + \
+            int(rand.expovariate(1.0 / LINK_LIFETIME_MS))
+        if created_ms > now_ms:
+            created_ms = rand.randint(link['published_ms'], now_ms)
+        user_id = str(rand.randrange(num_users))
+        yield {
+            'id': str(i),
+            'text': sentence(rand, 12),
+            'created': stringify_date(epoch_to_datetime(created_ms)),
+            'created_ms': created_ms,
+            'retweet_count': 0,
+            'user_id': user_id,
+            'user_name': 'User %s' % user_id,
+            'user_screen_name': 'user%s' % user_id,
+            'user_profile_image_url': '',
+            'content_url': link['url'],
+        }
+
+
+def actions(index, doc_type, docs, id_field):
+    for doc in docs:
+        yield {
+            '_index': index,
+            '_type': doc_type,
+            '_id': doc[id_field],
+            '_source': doc
+        }
+
+
+def load_universe(universe, num_users, num_tweets, num_links=None, days=35,
+                  skew=1.1, seed=0):
+    """
+    Replace the universe index with synthetic users, content and tweets.
+
+    :arg num_links: number of distinct links tweeted. Defaults to one for
+        every 10 tweets.
+    :arg days: age in days of the oldest link.
+    :arg skew: exponent of the Zipf distribution of tweets over links.
+    :arg seed: random seed, so that runs load the same data.
+    """
+    rand = random.Random(seed)
+    client = es(universe)
+    if client.indices.exists(universe):
+        client.indices.delete(index=universe)
+    build_universe_mappings(universe)
+    now_ms = now_epoch()
+    links = generate_links(num_links or max(num_tweets // 10, 1), days,
+        rand, now_ms)
+    bulk(client, actions(universe, USER_DOCUMENT_TYPE,
+        generate_users(num_users, rand), 'id'), chunk_size=CHUNK_SIZE)
+    bulk(client, actions(universe, CONTENT_DOCUMENT_TYPE, links, 'url'),
+        chunk_size=CHUNK_SIZE)
+    bulk(client, actions(universe, TWEET_DOCUMENT_TYPE,
+        generate_tweets(num_tweets, num_users, links, skew, rand, now_ms),
+        'id'), chunk_size=CHUNK_SIZE)
+    client.indices.refresh(index=universe)
@@ -0,0 +1,139 @@
+"""
+Character encodings of fetched HTML.
+
+Pages are decoded with the first encoding found, in order, from:
+
+1. a byte order mark at the start of the body,
+2. the charset of the Content-Type header,
+3. a `<meta charset>` or `<meta http-equiv="Content-Type">` tag in the first
+   META_SCAN_BYTES of the body,
+4. UTF-8, if the body is valid UTF-8,
+5. chardet, if it is installed, run over the first CHARDET_BYTES of the body.
+
+Failing all of those, pages are decoded as windows-1252, the usual encoding
+of old pages that don't declare one. Unlike `requests`, a text/html response
+without a charset isn't assumed to be ISO-8859-1, and the statistical
+detection of chardet, which is slow on large pages, is only the last resort.
+"""
+import codecs
+import re
+try:
+    import chardet
+except ImportError:
+    chardet = None
+
+META_SCAN_BYTES = 4 * 1024
+CHARDET_BYTES = 64 * 1024
+DEFAULT_ENCODING = 'cp1252'
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET = re.compile(
+    r'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+# Labels that browsers read as another encoding
+ENCODING_ALIASES = {
+    'iso-8859-1': DEFAULT_ENCODING,
+    'latin-1': DEFAULT_ENCODING,
+    'latin1': DEFAULT_ENCODING,
+    'us-ascii': DEFAULT_ENCODING,
+    'ascii': DEFAULT_ENCODING,
+}
+
+
+def normalize_encoding(name):
+    """The Python codec name of an encoding label, or None if Python has no
+    such codec."""
+    if not name:
+        return None
+    name = name.strip().lower()
+    name = ENCODING_ALIASES.get(name, name)
+    try:
+        codec = codecs.lookup(name)
+    except LookupError:
+        return None
+    return codec.name
+
+
+def bom_encoding(body):
+    """The encoding given by a byte order mark, and the length of the mark,
+    or (None, 0)."""
+    for bom, encoding in BOMS:
+        if body.startswith(bom):
+            return encoding, len(bom)
+    return None, 0
+
+
+def header_encoding(content_type):
+    """The encoding of a Content-Type header's charset, or None."""
+    match = HEADER_CHARSET.search(content_type or '')
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def meta_encoding(body):
+    """The encoding declared by a meta tag near the start of the body, or
+    None."""
+    match = META_CHARSET.search(body[:META_SCAN_BYTES])
+    encoding = normalize_encoding(match.group(1)) if match else None
+    # A body whose markup can be read as ASCII isn't really UTF-16 or 32
+    if encoding and encoding.startswith(('utf-16', 'utf-32')):
+        return 'utf-8'
+    return encoding
+
+
+def is_utf8(body):
+    """Whether the body is UTF-8. The body may have been cut off in the
+    middle of a character."""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(body, False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detected_encoding(body):
+    """The encoding chardet guesses for the start of the body, or None."""
+    if chardet is None:
+        return None
+    guess = chardet.detect(body[:CHARDET_BYTES])
+    return normalize_encoding(guess.get('encoding'))
+
+
+def detect_encoding(body, content_type=None):
+    """
+    Find the encoding of an HTML body.
+
+    :arg body: the body, as bytes.
+    :arg content_type: the Content-Type header of the response, if any.
+
+    Returns a tuple of the encoding and where it was found: 'bom', 'header',
+    'meta', 'utf-8', 'chardet' or 'default'.
+    """
+    encoding = bom_encoding(body)[0]
+    if encoding is not None:
+        return encoding, 'bom'
+    encoding = header_encoding(content_type)
+    if encoding is not None:
+        return encoding, 'header'
+    encoding = meta_encoding(body)
+    if encoding is not None:
+        return encoding, 'meta'
+    if is_utf8(body):
+        return 'utf-8', 'utf-8'
+    encoding = detected_encoding(body)
+    if encoding is not None:
+        return encoding, 'chardet'
+    return DEFAULT_ENCODING, 'default'
+
+
+def decode_html(body, content_type=None):
+    """Decode an HTML body, as described above. Returns a tuple of the
+    unicode HTML and where its encoding was found."""
+    encoding, source = detect_encoding(body, content_type)
+    if source == 'bom':
+        body = body[bom_encoding(body)[1]:]
+    return body.decode(encoding, 'replace'), source
@@ -1,26 +1,28 @@
+"""
+The bonfire command line tool.
+
+Importing this module is kept cheap: the config file is only read, and
+logging only set up, when a command runs, and each command imports the
+parts of bonfire it uses, so that e.g. `bonfire universes` doesn't load
+Elasticsearch, Twitter or HTML parsing libraries.
+"""
 import click
 import logging.config
 import os
 import shutil
 import sys
 import ConfigParser
-from pkg_resources import resource_string
 from .config import (
     config_file_path,
     get_universes,
     logging_config,
-    get_universes,
-    BONFIRE_CONFIG_ENV_VAR)
-from .db import (
-    get_latest_tweet,
-    get_latest_raw_tweet,
-    delete_content_by_url,
-    delete_tweets_by_url,
-    build_universe_mappings )
-from .universe import build_universe, cache_queries, cleanup_universe
-from .twitter import collect_universe_tweets
-from .process import process_universe_rawtweets
+    install_reload_handler,
+    BONFIRE_CONFIG_ENV_VAR,
+    MAPPING_PROFILES)
+from . import metrics
 
+# The same as health.COMPONENTS, which can't be imported without db
+COMPONENTS = ('collector', 'processor')
 
 
 from click.core import Command
@@ -35,6 +37,9 @@ def command(name=None, cls=None, **attrs):
     return decorator
 
 
+metrics_port = click.option('--metrics-port', type=int,
+    help='Port to serve metrics on, instead of the [metrics] http_port.')
+
 
 def yes_no(s):
     return s.lower().startswith('y')
@@ -48,32 +53,48 @@ def ensure_config():
             '\n\nCreate %s now? [Y/n] ' % (
             path, BONFIRE_CONFIG_ENV_VAR, path))
         if inp == '' or yes_no(inp):
+            from pkg_resources import resource_string
             with open(path, 'w') as f:
                 f.write(resource_string(__name__, 'bonfire.cfg'))
     if not os.path.exists(path):
         print('\nConfig file not found. Run `bonfire config` to create it.')
         sys.exit(0)
-ensure_config()
-
-logconf = logging_config()
-UNIVERSES = get_universes()
-if len(UNIVERSES) == 1:
-    DEFAULT_UNIVERSE = UNIVERSES[0]
-else:
-    DEFAULT_UNIVERSE = None
-
-
-if logconf.get('configfile'):
-    configfile = logconf.pop('configfile')
-    try:
-        logging.config.fileConfig(configfile, defaults=logconf)
-    except ConfigParser.NoSectionError, e:
-        print('\nMissing or malformed logging configuration file: %s' %
-            configfile)
-        print(e)
-        sys.exit(0)
-else:
-    logging.basicConfig(**logging_config())
+
+
+def configure_logging():
+    logconf = logging_config()
+    if logconf.get('configfile'):
+        configfile = logconf.pop('configfile')
+        try:
+            logging.config.fileConfig(configfile, defaults=logconf)
+        except ConfigParser.NoSectionError, e:
+            print('\nMissing or malformed logging configuration file: %s' %
+                configfile)
+            print(e)
+            sys.exit(0)
+    else:
+        logging.basicConfig(**logconf)
+
+
+def default_universe():
+    """The only configured universe, if there is just one."""
+    universes = get_universes()
+    return universes[0] if len(universes) == 1 else None
+
+
+class UniverseType(click.ParamType):
+    """A universe defined in the config file, which is only read when a
+    value is given."""
+    name = 'universe'
+
+    def convert(self, value, param, ctx):
+        universes = get_universes()
+        if value not in universes:
+            self.fail('invalid choice: %s. (choose from %s)' % (
+                value, ', '.join(universes)), param, ctx)
+        return value
+
+UNIVERSE = UniverseType()
 
 
 def edit_file(filename):
@@ -88,7 +109,8 @@ def edit_file(filename):
 @click.group(context_settings={'help_option_names':['-h','--help']})
 def cli():
     """Bonfire application management"""
-    pass
+    ensure_config()
+    configure_logging()
 
 
 @command()
@@ -110,56 +132,94 @@ def universes():
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
-def build(universe):
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@click.option('--incremental', is_flag=True,
+    help='Only refetch changed authorities and write changed weights.')
+def build(universe, incremental):
     """Build a universe from configured seed."""
+    from .universe import build_universe
     click.echo('Building universe: %s' % universe)
-    build_universe(universe)
+    counts = build_universe(universe, incremental=incremental)
+    click.echo('Fetched friends of %(fetched)d authorities, updated '
+        '%(updated)d users, deleted %(deleted)d users' % counts)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
-def collect(universe):
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@metrics_port
+def collect(universe, metrics_port):
     """Collect Tweets for a universe."""
+    from .twitter import collect_universe_tweets
+    install_reload_handler()
+    metrics.configure(metrics_port)
     collect_universe_tweets(universe)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
-def process(universe):
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@metrics_port
+def process(universe, metrics_port):
     """Resolve, extract, and save tweets from a universe."""
+    from .process import process_universe_rawtweets
     click.echo('Processing: %s' % universe)
+    install_reload_handler()
+    metrics.configure(metrics_port)
     process_universe_rawtweets(universe)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@click.option('--hours', default=24,
+    help='Refresh content tweeted in this many hours.')
+@metrics_port
+def refresh(universe, hours, metrics_port):
+    """Fetch recently tweeted pages again and update changed content."""
+    from .process import refresh_content
+    click.echo('Refreshing: %s' % universe)
+    metrics.configure(metrics_port)
+    counts = refresh_content(universe, hours=hours)
+    click.echo('Refreshed %(refreshed)d pages, %(unchanged)d unchanged, '
+        '%(failed)d failed' % counts)
+
+
+@command()
+@click.argument('universe', default=default_universe, type=UNIVERSE)
 @click.option('--top_links', is_flag=True)
 @click.option('--tweet', is_flag=True)
-def cache(universe, top_links, tweet):
+@click.option('--daemon', is_flag=True,
+    help='Keep caching results, every --interval seconds.')
+@click.option('--interval', type=int,
+    help='Seconds between runs with --daemon. Defaults to the '
+    'universe\'s cache_interval, or 300.')
+@metrics_port
+def cache(universe, top_links, tweet, daemon, interval, metrics_port):
     """Cache common results from a universe."""
+    from .universe import cache_queries, cache_queries_forever
     click.echo('Caching universe: %s' % universe)
-    cache_queries(universe, top_links=top_links, tweet=tweet)
+    metrics.configure(metrics_port)
+    if daemon:
+        install_reload_handler()
+        cache_queries_forever(universe, interval=interval,
+            top_links=top_links, tweet=tweet)
+    else:
+        cache_queries(universe, top_links=top_links, tweet=tweet)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
+@click.argument('universe', default=default_universe, type=UNIVERSE)
 @click.option('--days', default=30,
     help='Number of days ago to consider something old.')
 def cleanup(universe, days):
     """Delete old records from a universe index."""
+    from .universe import cleanup_universe
     cleanup_universe(universe, days=days)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE)
+@click.argument('universe', default=default_universe)
 def lasttweet(universe):
     """Show the latest processed tweet."""
+    from .db import get_latest_tweet
     t = get_latest_tweet(universe)    
     if t is None:
         print '\nTweet Index Is Empty\n'
@@ -171,9 +231,10 @@ def lasttweet(universe):
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE)
+@click.argument('universe', default=default_universe)
 def lastrawtweet(universe):
     """Show the latest unprocessed queued tweet."""
+    from .db import get_latest_raw_tweet
     t = get_latest_raw_tweet(universe)    
     if t is None:
         print '\nRaw Tweet Queue Is Empty\n'
@@ -188,18 +249,86 @@ def lastrawtweet(universe):
 @click.argument('url')
 def delete(universe, url):
     """Delete universe content and tweets specified by URL."""
+    from .db import delete_content_by_url, delete_tweets_by_url
     delete_content_by_url(universe, url)
     delete_tweets_by_url(universe, url)
 
 
 @command()
-@click.argument('universe', default=DEFAULT_UNIVERSE,
-    type=click.Choice(UNIVERSES))
+@click.argument('universe', default=default_universe, type=UNIVERSE)
 def map(universe):
     """Delete universe data and rebuild mappings."""
+    from .db import build_universe_mappings
     build_universe_mappings(universe, True)
 
 
+@command()
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@click.option('--profile', type=click.Choice(MAPPING_PROFILES),
+    help='Mapping profile to copy to. Defaults to the universe\'s '
+    'mapping_profile.')
+def remap(universe, profile):
+    """Copy a universe into an index with new mappings."""
+    from .db import remap_universe
+    click.echo('Remapping universe: %s' % universe)
+    click.echo('Copied to %s' % remap_universe(universe, profile=profile))
+
+
+@command()
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+@click.option('--save', type=click.Path(),
+    help='Also write the report to this JSON file.')
+@click.option('--compare', type=click.File(),
+    help='Show changes from a report saved with --save.')
+def indexcost(universe, save, compare):
+    """Show what each field of a universe index costs."""
+    import json
+    from .indexcost import index_cost, format_cost
+    cost = index_cost(universe)
+    before = json.load(compare) if compare else None
+    for line in format_cost(cost, before=before):
+        click.echo(line)
+    if save:
+        with open(save, 'w') as f:
+            json.dump(cost, f, indent=2, sort_keys=True)
+
+
+@command()
+@click.argument('universe', default=default_universe, type=UNIVERSE)
+def migrate(universe):
+    """Add epoch timestamps and first seen times from older versions."""
+    from .db import migrate_epoch_times
+    click.echo('Migrating universe: %s' % universe)
+    for doc_type, count in migrate_epoch_times(universe).items():
+        click.echo('Updated %d %s' % (count, doc_type))
+
+
+@command()
+@click.argument('universe', required=False, type=UNIVERSE)
+@click.option('--component', type=click.Choice(COMPONENTS),
+    help='Only show this component.')
+@click.option('--check', is_flag=True,
+    help='Exit with status 1 if a shown component is stalled.')
+def status(universe, component, check):
+    """Show collector and processor lag for all universes."""
+    seconds = lambda s: '-' if s is None else '%ds' % s
+    stalled = False
+    from .health import universe_status
+    for u in [universe] if universe else get_universes():
+        state = universe_status(u)
+        for c in [component] if component else COMPONENTS:
+            info = state[c]
+            stalled = stalled or info['stalled']
+            line = '%-20s %-10s lag %-8s heartbeat %-8s %s' % (
+                u, c, seconds(info['lag']), seconds(info['heartbeat_age']),
+                'STALLED' if info['stalled'] else 'ok')
+            if 'queue_depth' in info:
+                line += '  (%d queued)' % info['queue_depth']
+            click.echo(line)
+    if check and stalled:
+        sys.exit(1)
+
+
 @command()
 @click.pass_context
 def help(ctx):
@@ -213,10 +342,15 @@ cli.add_command(universes)
 cli.add_command(build)
 cli.add_command(collect)
 cli.add_command(process)
+cli.add_command(refresh)
 cli.add_command(cache)
 cli.add_command(cleanup)
 cli.add_command(lasttweet)
 cli.add_command(lastrawtweet)
 cli.add_command(delete)
 cli.add_command(map)
+cli.add_command(migrate)
+cli.add_command(remap)
+cli.add_command(indexcost)
+cli.add_command(status)
 cli.add_command(help)
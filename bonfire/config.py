@@ -3,24 +3,228 @@ import ConfigParser
 import logging
 import os
 import re
+import signal
 import sys
+import threading
+import time
 from os.path import expanduser
 
 BONFIRE_CONFIG_ENV_VAR = 'BONFIRE_CONFIG'
 DEFAULT_CONFIG_DIR = expanduser('~')
 DEFAULT_CONFIG_FILE = 'bonfire.cfg'
 CONFIG_LIST_REGEX = re.compile(r'[, \s]+')
+DEFAULT_MAX_CONTENT_LENGTH = 1024 * 1024
+DEFAULT_ELASTICSEARCH_MAXSIZE = 10
+DEFAULT_STALL_SECONDS = 600
+DEFAULT_AUTHORITY_REFRESH_HOURS = 24
+DEFAULT_CACHE_INTERVAL = 300
+DEFAULT_SCORE_HALF_LIFE_HOURS = 24
+DEFAULT_HTTP_CACHE_SIZE = 256 * 1024 * 1024
+MAPPING_PROFILES = ('default', 'compact')
+
+
+RELOAD_CHECK_SECONDS = 5
+
+TwitterKeys = collections.namedtuple('TwitterKeys', [
+    'consumer_key',
+    'consumer_secret',
+    'access_token',
+    'access_token_secret'])
+
+ListConfig = collections.namedtuple('ListConfig', [
+    'list_id',
+    'slug',
+    'owner_screen_name',
+    'owner_id'])
+
+UniverseConfig = collections.namedtuple('UniverseConfig', [
+    'name',
+    'type',
+    'seed',
+    'twitter_keys',
+    'elasticsearch_hosts',
+    'elasticsearch_maxsize',
+    'max_content_length',
+    'stall_seconds',
+    'authority_refresh_hours',
+    'cache_interval',
+    'score_half_life_hours',
+    'http_cache_dir',
+    'http_cache_size',
+    'mapping_profile',
+    'list_config'])
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def split_list(value):
+    """Split a comma or whitespace separated config value into a tuple."""
+    if value is None:
+        return None
+    return tuple(s.strip() for s in CONFIG_LIST_REGEX.split(value) if s.strip())
+
+
+def mapping_profile(value):
+    if value not in MAPPING_PROFILES:
+        raise ValueError('mapping_profile must be one of %s, not %s' % (
+            ', '.join(MAPPING_PROFILES), value))
+    return value
+
+
+def parse_universe(parser, section, name):
+    """Parse a universe or list section into an immutable UniverseConfig.
+    Raises ValueError if an option has the wrong type."""
+    def option(key, default=None, type_=None):
+        try:
+            value = parser.get(section, key)
+        except ConfigParser.NoOptionError:
+            return default
+        return type_(value) if type_ else value
+    keys = [option('twitter_' + key) for key in TwitterKeys._fields]
+    return UniverseConfig(
+        name=name,
+        type=option('type', 'seeded'),
+        seed=split_list(option('seed')),
+        twitter_keys=TwitterKeys(*keys) if None not in keys else None,
+        elasticsearch_hosts=split_list(option('elasticsearch_hosts')),
+        elasticsearch_maxsize=option('elasticsearch_maxsize',
+            DEFAULT_ELASTICSEARCH_MAXSIZE, int),
+        max_content_length=option('max_content_length',
+            DEFAULT_MAX_CONTENT_LENGTH, int),
+        stall_seconds=option('stall_seconds', DEFAULT_STALL_SECONDS, int),
+        authority_refresh_hours=option('authority_refresh_hours',
+            DEFAULT_AUTHORITY_REFRESH_HOURS, float),
+        cache_interval=option('cache_interval', DEFAULT_CACHE_INTERVAL, int),
+        score_half_life_hours=option('score_half_life_hours',
+            DEFAULT_SCORE_HALF_LIFE_HOURS, float),
+        http_cache_dir=option('http_cache_dir'),
+        http_cache_size=option('http_cache_size', DEFAULT_HTTP_CACHE_SIZE,
+            int),
+        mapping_profile=option('mapping_profile', MAPPING_PROFILES[0],
+            mapping_profile),
+        list_config=ListConfig(*[option(key) for key in ListConfig._fields]))
+
+
+class Settings(object):
+    """
+    A parsed config file, with an immutable UniverseConfig for each universe.
+    Settings are never changed once built: reloading the config file builds
+    new Settings and swaps them in whole, so a reader never sees a mix of old
+    and new values.
+    """
+
+    def __init__(self, parser, path=None, mtime=None):
+        self.parser = parser
+        self.path = path
+        self.mtime = mtime
+        self.universe_names = tuple(section.split(':')[-1] for section in
+            parser.sections() if section.startswith('universe:'))
+        self.universes = {}
+        for section in parser.sections():
+            kind, _, name = section.partition(':')
+            # A universe section takes precedence over a list section
+            if kind == 'universe' or \
+                    (kind == 'list' and name not in self.universes):
+                self.universes[name] = parse_universe(parser, section, name)
+
+
+def read_settings(path=None):
+    path = path or config_file_path()
+    parser = ConfigParser.SafeConfigParser()
+    mtime = os.path.getmtime(path)
+    with open(path) as f:
+        parser.readfp(f)
+    return Settings(parser, path, mtime)
+
+
+_settings = None
+_settings_lock = threading.Lock()
+def settings():
+    """Return the current Settings, reading the config file the first time."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = read_settings()
+    return _settings
+
+
+def use_settings(parser):
+    """Use settings from a ConfigParser instead of the config file."""
+    global _settings
+    with _settings_lock:
+        _settings = Settings(parser)
 
 
-_config = None
 def configuration():
-    global _config
-    if _config is None:
-        _config = ConfigParser.SafeConfigParser()
-        path = config_file_path()
-        with open(path) as f:
-            _config.readfp(f)
-    return _config
+    return settings().parser
+
+
+_bad_mtime = None
+def reload():
+    """
+    Re-read the config file and replace the current settings at once. If the
+    file can't be read or parsed, the current settings are kept and False is
+    returned.
+    """
+    global _settings, _bad_mtime
+    path = config_file_path()
+    try:
+        new_settings = read_settings(path)
+    except (IOError, OSError, ConfigParser.Error, ValueError) as e:
+        logger().error('Could not reload config file %s, keeping the '
+            'current settings: %s' % (path, e))
+        try:
+            _bad_mtime = os.path.getmtime(path)
+        except OSError:
+            pass
+        return False
+    with _settings_lock:
+        _settings = new_settings
+    logger().info('Reloaded config file %s' % path)
+    return True
+
+
+_reload_requested = False
+_last_checked = 0
+def maybe_reload():
+    """
+    Reload the config file if a SIGHUP was received, or if the file has
+    changed since it was read. The file is checked at most every
+    RELOAD_CHECK_SECONDS, so this is cheap to call from a busy loop.
+    Returns True if the settings were reloaded.
+    """
+    global _reload_requested, _last_checked
+    if not _reload_requested:
+        if time.time() - _last_checked < RELOAD_CHECK_SECONDS:
+            return False
+        _last_checked = time.time()
+        current = settings()
+        if current.path is None:
+            return False
+        try:
+            mtime = os.path.getmtime(current.path)
+        except OSError:
+            return False
+        if mtime == current.mtime or mtime == _bad_mtime:
+            return False
+    _reload_requested = False
+    return reload()
+
+
+def _request_reload(signum, frame):
+    global _reload_requested
+    _reload_requested = True
+
+
+def install_reload_handler():
+    """Reload the config file on SIGHUP, the next time maybe_reload is
+    called. Must be called from the main thread. System calls interrupted by
+    the signal are restarted, so e.g. a Twitter stream is not dropped."""
+    signal.signal(signal.SIGHUP, _request_reload)
+    signal.siginterrupt(signal.SIGHUP, False)
 
 
 def get(section, option, default=None):
@@ -35,41 +239,43 @@ def config_file_path():
         os.path.join(DEFAULT_CONFIG_DIR, DEFAULT_CONFIG_FILE))
 
 
+def universe_config(universe):
+    """Get the parsed, immutable UniverseConfig of a universe."""
+    try:
+        return settings().universes[universe]
+    except KeyError:
+        raise ConfigParser.NoSectionError('universe:%s' % universe)
+
+
 def get_universe_seed(universe):
-    config = configuration()
-    seed = config.get('universe:%s' % universe, 'seed')
-    return [s.strip() for s in CONFIG_LIST_REGEX.split(seed) if s.strip()]
+    seed = universe_config(universe).seed
+    if seed is None:
+        raise ConfigParser.NoOptionError('seed', 'universe:%s' % universe)
+    return list(seed)
 
 
 def get_universes():
-    config = configuration()
-    return [section.split(':')[-1] for section in configuration().sections() if
-        section.startswith('universe:')]
+    return list(settings().universe_names)
 
 
 def get_twitter_keys(universe):
-    config = configuration()
-    TwitterKeys = collections.namedtuple('TwitterKeys', [
-        'consumer_key',
-        'consumer_secret',
-        'access_token',
-        'access_token_secret'])
-    section = 'universe:%s' % universe
-    if not config.has_section(section):
-        section = 'list:%s' % universe
-    k = TwitterKeys(
-        config.get(section, 'twitter_consumer_key'),
-        config.get(section, 'twitter_consumer_secret'),
-        config.get(section, 'twitter_access_token'),
-        config.get(section, 'twitter_access_token_secret'))
-    return k
+    keys = universe_config(universe).twitter_keys
+    if keys is None:
+        raise ConfigParser.NoOptionError('twitter_consumer_key', universe)
+    return keys
 
 
 def get_elasticsearch_hosts(universe):
-    config = configuration()
-    universe = 'universe:%s' % universe
-    hosts = config.get(universe, 'elasticsearch_hosts')
-    return [s.strip() for s in CONFIG_LIST_REGEX.split(hosts) if s.strip()]
+    hosts = universe_config(universe).elasticsearch_hosts
+    if hosts is None:
+        raise ConfigParser.NoOptionError('elasticsearch_hosts',
+            'universe:%s' % universe)
+    return list(hosts)
+
+
+def get_elasticsearch_maxsize(universe):
+    """Number of pooled connections to keep open to each Elasticsearch host."""
+    return universe_config(universe).elasticsearch_maxsize
 
 
 def logging_config():
@@ -88,12 +294,60 @@ def logging_config():
         return {}
 
 
+def get_stall_seconds(universe):
+    """Seconds of lag, without a heartbeat, before a collector or processor
+    is considered stalled."""
+    return universe_config(universe).stall_seconds
+
+
+def get_metrics_config():
+    try:
+        return {
+            'http_port': get('metrics', 'http_port'),
+            'statsd_host': get('metrics', 'statsd_host'),
+            'statsd_port': get('metrics', 'statsd_port'),
+            'prefix': get('metrics', 'prefix'),
+        }
+    except ConfigParser.NoSectionError:
+        return {}
+
+
 def get_list_config(universe):
-    config = configuration()
-    section = 'universe:%s' % universe
-    return {
-        'list_id': get(section, 'list_id'),
-        'slug': get(section, 'slug'),
-        'owner_screen_name': get(section, 'owner_screen_name'),
-        'owner_id': get(section, 'owner_id')
-    }
+    return dict(universe_config(universe).list_config._asdict())
+
+
+def get_max_content_length(universe):
+    """Maximum number of bytes to download when fetching a tweeted URL."""
+    return universe_config(universe).max_content_length
+
+
+def get_authority_refresh_hours(universe):
+    """Hours after which an incremental build refetches an authority's
+    friends even if their friend count hasn't changed."""
+    return universe_config(universe).authority_refresh_hours
+
+
+def get_cache_interval(universe):
+    """Seconds between runs of `bonfire cache --daemon`."""
+    return universe_config(universe).cache_interval
+
+
+def get_score_half_life_hours(universe):
+    """Hours after which a score counts half as much in the running
+    statistics that top links are compared against."""
+    return universe_config(universe).score_half_life_hours
+
+
+def get_http_cache(universe):
+    """Directory and size in bytes of the processor's HTTP cache, or None
+    if `http_cache_dir` isn't set."""
+    conf = universe_config(universe)
+    if not conf.http_cache_dir:
+        return None
+    return expanduser(conf.http_cache_dir), conf.http_cache_size
+
+
+def get_mapping_profile(universe):
+    """Which mappings the universe's indices are built with: 'default' or
+    'compact'."""
+    return universe_config(universe).mapping_profile
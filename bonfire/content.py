@@ -1,3 +1,5 @@
+import hashlib
+import re
 import requests
 newspaper_article = None
 try:
@@ -6,87 +8,123 @@ try:
 except ImportError:
     pass
 from urlparse import urlparse, urljoin
+from . import metrics
 from .extract import ArticleExtractor
+from .profiles import ProfileCache, provider_host
+from .urls import is_short_url, normalize_url
 
-# Known url shortening domains.
-# Newspaper sometimes assumes that shortened domains are canonical, so this
-# list is here to catch any that shouldn't be included.
-SHORT_URLS = set((
-    '0rz.tw', '1link.in', '1url.com', '2.gp', '2big.at', '2tu.us', '3.ly',
-    '307.to', '4ms.me', '4sq.com', '4url.cc', '6url.com', '7.ly', 'a.gg', 
-    'a.nf', 'aa.cx', 'abcurl.net', 'ad.vu', 'adf.ly', 'adjix.com', 'afx.cc', 
-    'all.fuseurl.com', 'alturl.com', 'amzn.to', 'ar.gy', 'arst.ch', 'atu.ca', 
-    'azc.cc', 'b23.ru', 'b2l.me', 'bacn.me', 'bcool.bz', 'binged.it', 
-    'bit.ly', 'bizj.us', 'bloat.me', 'bravo.ly', 'bsa.ly', 'budurl.com', 
-    'canurl.com', 'chilp.it', 'chzb.gr', 'cl.lk', 'cl.ly', 'clck.ru', 
-    'cli.gs', 'cliccami.info', 'clickthru.ca', 'clop.in', 'conta.cc', 
-    'cort.as', 'cot.ag', 'crks.me', 'ctvr.us', 'cutt.us', 'dai.ly', 
-    'decenturl.com', 'dfl8.me', 'digbig.com', 'digg.com', 'disq.us', 'dld.bz',
-    'dlvr.it', 'do.my', 'doiop.com', 'dopen.us', 'easyuri.com', 'easyurl.net',
-    'eepurl.com', 'eweri.com', 'fa.by', 'fav.me', 'fb.me', 'fbshare.me', 
-    'ff.im', 'fff.to', 'fire.to', 'firsturl.de', 'firsturl.net', 'flic.kr', 
-    'flq.us', 'fly2.ws', 'fon.gs', 'freak.to', 'fuseurl.com', 'fuzzy.to', 
-    'fwd4.me', 'fwib.net', 'g.ro.lt', 'gizmo.do', 'gl.am', 'go.9nl.com', 
-    'go.ign.com', 'go.usa.gov', 'goo.gl', 'goshrink.com', 'gurl.es', 'hex.io',
-    'hiderefer.com', 'hmm.ph', 'href.in', 'hsblinks.com', 'htxt.it', 
-    'huff.to', 'hulu.com', 'hurl.me', 'hurl.ws', 'icanhaz.com', 'idek.net', 
-    'ilix.in', 'is.gd', 'its.my', 'ix.lt', 'j.mp', 'jijr.com', 'kl.am', 
-    'klck.me', 'korta.nu', 'krunchd.com', 'l9k.net', 'lat.ms', 'liip.to', 
-    'liltext.com', 'linkbee.com', 'linkbun.ch', 'liurl.cn', 
-    'ln-s.net', 'ln-s.ru', 'lnk.gd', 'lnk.ms', 'lnkd.in', 'lnkurl.com', 
-    'lru.jp', 'lt.tl', 'lurl.no', 'macte.ch', 'mash.to', 'merky.de', 
-    'migre.me', 'miniurl.com', 'minurl.fr', 'mke.mmke.by.to', 'moourl.com', 
-    'mrte.ch', 'myloc.mylocurl.in', 'n.pr', 'nbc.co', 'nblo.gs', 'nn.nf', 
-    'not.my', 'notlong.com', 'nsfw.in', 'nutshellurl.com', 'nxy.in', 
-    'nyti.ms', 'o-x.fr', 'oc1.us', 'om.ly', 'omf.gd', 'omoikane.net', 
-    'on.cnn.com', 'on.mktw.net', 'onforb.es', 'orz.se', 'ow.ly', 'ping.fm', 
-    'pli.gs', 'pnt.me', 'politi.co', 'post.ly', 'pp.gg', 'profile.to', 
-    'ptiturl.com', 'pub.vitrue.com', 'qlnk.net', 'qte.me', 'qu.tc', 'qy.fi', 
-    'r.im', 'rb6.me', 'read.bi', 'readthis.ca', 'reallytinyurl.com', 
-    'redir.ec', 'redirects.ca', 'redirx.com', 'retwt.me', 'ri.ms', 
-    'rickroll.it', 'riz.gd', 'rt.nu', 'ru.ly', 'rubyurl.com', 'rurl.org', 
-    'rww.tw', 's4c.in', 's7y.us', 'safe.mn', 'sameurl.com', 'sdut.us', 
-    'shar.es', 'shink.de', 'shorl.com', 'short.ie', 'short.to', 
-    'shortlinks.co.uk', 'shorturl.com', 'shout.to', 'show.my', 
-    'shrinkify.com', 'shrinkr.com', 'shrt.fr', 'shrt.st', 'shrten.com', 
-    'shrunkin.com', 'simurl.com', 'slate.me', 'smallr.com', 'smsh.me', 
-    'smurl.name', 'sn.im', 'snipr.sniprnipurl.com', 'snurl.com', 'sp2.ro', 
-    'spedr.com', 'srnk.net', 'srs.li', 'starturl.com', 'su.pr', 'surl.co.uk', 
-    'surl.hu', 't.t.t.t.t.t.lh.com', 'ta.gd', 'tbd.ly', 'tcrn.tcrn.tcme', 
-    'tgr.ph', 'tighturl.com', 'tiniuri.com', 'tiny.cc', 'tiny.ly', 'tiny.pl', 
-    'tinylink.in', 'tinyuri.ca', 'tinyurl.com', 'tk.', 'tl.gd', 'tmi.me', 
-    'tnij.org', 'tnw.to', 'tny.com', 'to.ly', 'togoto.us', 'totc.us', 
-    'toysr.us', 'tpm.ly', 'tr.im', 'tra.kz', 'trunc.it', 'twhub.com',
-    'twirl.at', 'twitclicks.com', 'twitterurl.net', 'twitterurl.org', 
-    'twiturl.de', 'twurl.cc', 'twurl.nl', 'u.mavrev.com', 'u.nu', 'u76.org', 
-    'ub0.cc', 'ulu.lu', 'updating.me', 'ur1.ca', 'url.az', 'url.co.uk', 
-    'url.ie', 'url360.me', 'url4.eu', 'urlborg.com', 'urlbrief.com', 
-    'urlcover.com', 'urlcut.com', 'urlenco.de', 'urli.nl', 'urls.im', 
-    'urlshorteningservicefortwitter.com', 'urlx.ie', 'urlzen.com', 'usat.ly', 
-    'use.my', 'vb.ly', 'vgn.am', 'vl.am', 'vm.lc', 'w55.de', 'wapo.st', 
-    'wapurl.co.uk', 'wipi.es', 'wp.me', 'x.vu', 'xr.com', 'xrl.in', 'xrl.us', 
-    'xurl.es', 'xurl.jp', 'y.ahoo.it', 'yatuc.com', 'ye.pe', 'yep.it',
-    'yfrog.com', 'yhoo.it', 'yiyd.com', 'youtu.be', 'yuarel.com', 'z0p.de', 
-    'zi.ma', 'zi.mu', 'zipmyurl.com', 'zud.me', 'zurl.ws', 'zz.gd', 'zzang.kr'
-    ))
-
-
-def extract(url, html=None):
+# Parts of a page that often differ between copies of it, such as tracking
+# code, ads and generation times
+FINGERPRINT_IGNORED = re.compile(
+    r'<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->', re.I | re.S)
+WHITESPACE = re.compile(r'\s+')
+# Tags and attributes a page names its own url with
+URL_TAG = re.compile(r'<(meta|link)\b([^>]*)>', re.I)
+ATTRIBUTE = re.compile(
+    r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+# Where to look for them on a page with no </head>
+HEAD_SCAN_CHARS = 64 * 1024
+
+provider_profiles = ProfileCache()
+
+
+def extract(url, html=None, resolved_url=None, redirect_urls=None):
     """
     Extract metadata from a URL, and return a dict result.
     
     Uses newspaper `<https://github.com/codelucas/newspaper/>`_,
     but overrides some defaults in favor of opengraph and twitter elements.
+    What is learned about the page's provider is kept in its profile, for
+    extracting its later pages.
 
     :arg html: if provided, skip downloading and go straight to parsing html.
+    :arg resolved_url: final URL after redirects, if already known. Saves a
+        request when the page has no usable canonical url.
+    :arg redirect_urls: URLs that redirected to this resource. These are
+        never treated as canonical.
+    """
+    host = provider_host(resolved_url or url)
+    kwargs = {
+        'html': html,
+        'resolved_url': resolved_url,
+        'redirect_urls': redirect_urls,
+        'profile': provider_profiles.get(host)
+    }
+    with metrics.timed('content.parse'):
+        if newspaper_article is not None:
+            f = NewspaperFetcher(url, **kwargs)
+        else:
+            f = DefaultFetcher(url, **kwargs)
+        f.parse()
+    with metrics.timed('content.metadata'):
+        result = get_result(f, url)
+    matched = f.get_selector_matched()
+    if matched is not None:
+        metrics.incr('content.profile.hit' if matched
+            else 'content.profile.miss')
+    provider_profiles.learn(host, selector=f.get_article_selector(),
+        matched=matched, favicon=f.get_page_favicon())
+    return result
+
+
+def html_fingerprint(html):
+    """
+    Hash of a page's HTML that ignores scripts, styles, comments and
+    whitespace, so that copies of a page served under different urls have
+    the same fingerprint without being parsed.
+    """
+    text = FINGERPRINT_IGNORED.sub('', html)
+    text = WHITESPACE.sub(' ', text).strip()
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+
+def declared_url(html, base_url=None):
+    """
+    The url a page declares as its own, from the tags the extractor prefers
+    for its canonical url: og:url, then twitter:url, then a canonical link.
+    Found without parsing the page. Returns None if there is none.
+
+    :arg base_url: url to resolve a relative url against.
     """
-    if newspaper_article is not None:
-        f = NewspaperFetcher(url, html=html)
-    else:
-        f = DefaultFetcher(url, html=html)
+    end = html.find('</head>')
+    head = html[:end] if end >= 0 else html[:HEAD_SCAN_CHARS]
+    urls = {}
+    for tag, attributes in URL_TAG.findall(head):
+        attributes = dict((name.lower(), ''.join(values))
+            for name, values in ((match[0], match[1:])
+            for match in ATTRIBUTE.findall(attributes)))
+        if tag.lower() == 'meta':
+            key = attributes.get('property') or attributes.get('name')
+            value = attributes.get('content')
+        else:
+            key = 'canonical' if 'canonical' in \
+                attributes.get('rel', '').lower().split() else None
+            value = attributes.get('href')
+        if key and value and value.strip():
+            urls.setdefault(key.lower(), value.strip())
+    url = urls.get('og:url') or urls.get('twitter:url') or \
+        urls.get('canonical')
+    if url and base_url:
+        url = urljoin(base_url, url)
+    return url
+
+
+def is_copy_of(html, url, base_url=None):
+    """Whether a page is a copy of the content at url, which was extracted
+    from a page with the same fingerprint. Pages that look the same but
+    don't declare the same url, like error pages, bot checks and login
+    walls of different articles, aren't copies."""
+    declared = declared_url(html, base_url)
+    return declared is not None and normalize_url(declared) == url
+
+
+def get_result(f, url):
+    """Build the content document from a fetcher's metadata."""
     img, img_h, img_w = f.get_image()
     result = {
-        'url': f.get_canonical_url() or url.rstrip('/'),
+        'url': normalize_url(f.get_canonical_url() or url),
         'provider': f.get_provider() or '',
         'title': f.get_title() or '',
         'description': f.get_description() or '',
@@ -107,13 +145,29 @@ def extract(url, html=None):
 
 class BaseFetcher(object):
 
+    def parse(self):
+        """Parse the document, if that has not been done already."""
+        pass
+
     def _get_resolved_url(self):
-        """Fallback in case newspaper can't find a good canonical url."""
+        """Fallback in case newspaper can't find a good canonical url.
+        Only requests the url if the fetcher was not given its resolution."""
         if not self.resolved_url:
             self.resolved_url = requests.head(self.extractor.url, 
                 timeout=7, allow_redirects=True).url
         return self.resolved_url.rstrip('/')
 
+    def _is_redirect(self, url):
+        """Check if a url is a short-url domain, or one of the urls that
+        redirected to this resource from another host, like a feed's
+        tracking redirector. A page's own url that redirects to a variant
+        of itself on the same host, e.g. with a tracking or cookie check
+        parameter, is still its canonical url."""
+        if is_short_url(url):
+            return True
+        return normalize_url(url) in self.redirect_urls and \
+            provider_host(url) != provider_host(self._get_resolved_url())
+
     def _add_domain(self, url):
         """Add the domain if the URL is relative."""
         if not url or url.startswith('http'):
@@ -126,6 +180,19 @@ class BaseFetcher(object):
         """A shim to help support using Newspaper's canonical_link."""
         return None
 
+    def get_article_selector(self):
+        """Selector of the article container, to add to the profile."""
+        return None
+
+    def get_selector_matched(self):
+        """Whether the profile's selector found the article container, or
+        None if it wasn't tried."""
+        return None
+
+    def get_page_favicon(self):
+        """Favicon url given by the page itself, or None."""
+        return None
+
     def get_canonical_url(self):
         """
         Main function for determining the canonical url. Check as follows:
@@ -133,15 +200,15 @@ class BaseFetcher(object):
             - twitter url (twitter:url)
             - newspaper's guess (usually from meta tags)
 
-        If none of these work or newspaper guesses a short-url domain,
-        it gives up and requests the url to get its final redirect.
+        If none of these work or newspaper guesses a short-url domain or a
+        redirect, it gives up and uses the final redirect of the url.
         """
         canonical_url = \
             self.get_metadata().get('og', {}).get('url', '').strip() or \
             self.get_metadata().get('twitter', {}).get('url', '').strip() or\
             self.get_canonical_link()
         # Make sure it's not a short-url domain
-        if not canonical_url or urlparse(canonical_url).netloc in SHORT_URLS:
+        if not canonical_url or self._is_redirect(canonical_url):
             canonical_url = self._get_resolved_url()
         return canonical_url
 
@@ -246,9 +313,16 @@ class DefaultFetcher(BaseFetcher):
     Class to fetch article from a URL.
     """
 
-    def __init__(self, url, html=None):
-        self.resolved_url = ''
-        self.extractor = ArticleExtractor(url=url, html=html)
+    def __init__(self, url, html=None, resolved_url=None, redirect_urls=None,
+                 profile=None):
+        self.resolved_url = resolved_url or ''
+        self.redirect_urls = set(normalize_url(u) for u in redirect_urls or [])
+        self.profile = profile
+        self.extractor = ArticleExtractor(url=url, html=html,
+            selector=profile.selector if profile else None)
+
+    def parse(self):
+        self.extractor.doc
 
     def get_metadata(self):
         return self.extractor.metadata
@@ -264,9 +338,20 @@ class DefaultFetcher(BaseFetcher):
         return self.extractor.get_article_text()
 
     def get_favicon(self):
-        """Retrieve favicon url from article tags or from
-        `<http://g.etfv.co>`_"""
-        return None
+        """Retrieve favicon url from the page, or from the provider's
+        profile."""
+        return self.get_page_favicon() or \
+            (self.profile.favicon if self.profile else None)
+
+    def get_page_favicon(self):
+        favicon = self.extractor.favicon
+        return self._add_domain(favicon) if favicon else None
+
+    def get_article_selector(self):
+        return self.extractor.article_selector
+
+    def get_selector_matched(self):
+        return self.extractor.selector_matched
 
     def get_top_image(self):
         return self.extractor.get_top_image()
@@ -286,8 +371,11 @@ class NewspaperFetcher(BaseFetcher):
     Smartly fetches metadata from a newspaper article, and cleans the results.
     """
 
-    def __init__(self, url, html=None):
-        self.resolved_url = ''
+    def __init__(self, url, html=None, resolved_url=None, redirect_urls=None,
+                 profile=None):
+        self.resolved_url = resolved_url or ''
+        self.redirect_urls = set(normalize_url(u) for u in redirect_urls or [])
+        self.profile = profile
         article = newspaper_article(url, language='en')
         if html is None:
             article.download()
@@ -321,12 +409,16 @@ class NewspaperFetcher(BaseFetcher):
         return descr
 
     def get_favicon(self):
-        """Retrieve favicon url from article tags or from
-        `<http://g.etfv.co>`_"""
-        favicon_url = self.extractor.meta_favicon or \
+        """Retrieve favicon url from article tags, the provider's profile,
+        or from `<http://g.etfv.co>`_"""
+        return self.get_page_favicon() or \
+            (self.profile.favicon if self.profile else None) or \
             'http://g.etfv.co/%s?defaulticon=none' % (
                 self.get_canonical_url())
-        return self._add_domain(favicon_url)
+
+    def get_page_favicon(self):
+        favicon = self.extractor.meta_favicon
+        return self._add_domain(favicon) if favicon else None
 
     def get_top_image(self):
         return self.extractor.top_image
@@ -1,9 +1,43 @@
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from functools import wraps
 
 TWITTER_TIME_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
 ELASTICSEARCH_TIME_FORMAT = 'EEE MMM d HH:mm:ss Z yyyy'
 DATETIMEPICKER_TIME_FORMAT = '%Y/%m/%d %H:%M'
+MONTHS = dict((month, i + 1) for i, month in enumerate((
+    'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+    'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')))
+DATE_CACHE_SIZE = 4096
+EPOCH = datetime(1970, 1, 1)
+MINUTE_MS = 60 * 1000
+DAY_MS = 24 * 60 * MINUTE_MS
+
+
+def lru_memoize(maxsize):
+    """Memoize a single-argument function, keeping the maxsize most
+    recently used results."""
+    def decorator(f):
+        cache = OrderedDict()
+        lock = threading.Lock()
+        @wraps(f)
+        def wrapper(arg):
+            with lock:
+                if arg in cache:
+                    value = cache.pop(arg)
+                    cache[arg] = value
+                    return value
+            value = f(arg)
+            with lock:
+                cache[arg] = value
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
 
 
 def now(stringify=False):
@@ -15,12 +49,17 @@ def now(stringify=False):
     return now
 
 
+def now_epoch():
+    """Return now as a unix timestamp in milliseconds."""
+    return datetime_to_epoch(now())
+
+
 def apply_offset(start_date, offset):
     """Apply an offset in minutes to a given date."""
     return start_date + timedelta(minutes=offset)
 
 
-def get_query_dates(start, end, hours=None, stringify=True):
+def get_query_dates(start, end, hours=None, stringify=True, epoch=False):
     """
     Gets the start and end dates for a query.
     :arg start: datetime to start with.
@@ -30,12 +69,17 @@ def get_query_dates(start, end, hours=None, stringify=True):
     :arg hours: number of hours since end to start with,
         if no start is specified.
     :arg stringify: return as formatted strings.
+    :arg epoch: return as unix timestamps in milliseconds.
+        Takes precedence over stringify.
     """
     if not end:
         end = now()
     if not start:
         start = end - timedelta(hours=hours)
-    if stringify:
+    if epoch:
+        start = datetime_to_epoch(start)
+        end = datetime_to_epoch(end)
+    elif stringify:
         start = stringify_date(start)
         end = stringify_date(end)
     return start, end
@@ -46,9 +90,29 @@ def stringify_date(dt):
     return dt.strftime(TWITTER_TIME_FORMAT) if dt else ''
 
 
+@lru_memoize(DATE_CACHE_SIZE)
+def parse_twitter_date(datestr):
+    """Convert a Twitter-formatted date string to a python datetime (UTC).
+    Splits the fixed format directly rather than going through strptime,
+    which is only used for strings that don't fit it."""
+    try:
+        _, month, day, clock, offset, year = datestr.split(' ')
+        hour, minute, second = clock.split(':')
+        if offset == '+0000':
+            return datetime(int(year), MONTHS[month], int(day),
+                int(hour), int(minute), int(second))
+    except (ValueError, KeyError):
+        pass
+    return datetime.strptime(datestr, TWITTER_TIME_FORMAT)
+
+
 def dateify_string(datestr, format=TWITTER_TIME_FORMAT):
     """Convert a date string to a python datetime (UTC)."""
-    return datetime.strptime(datestr, TWITTER_TIME_FORMAT) if datestr else None
+    if not datestr:
+        return None
+    if format == TWITTER_TIME_FORMAT:
+        return parse_twitter_date(datestr)
+    return datetime.strptime(datestr, format)
 
 
 def get_since_now(start_time, time_type=None, stringify=True):
@@ -95,7 +159,18 @@ def get_since_now(start_time, time_type=None, stringify=True):
 
 def epoch_to_datetime(epoch):
     """Converts unix timestamp to python datetime (UTC)."""
-    return datetime(*time.gmtime(epoch / 1000)[:7])
+    return datetime(*time.gmtime(epoch / 1000)[:6])
+
+
+def datetime_to_epoch(dt):
+    """Converts python datetime (UTC) to unix timestamp in milliseconds."""
+    return int((dt - EPOCH).total_seconds() * 1000)
+
+
+def datestring_to_epoch(datestr):
+    """Converts a Twitter-formatted datestring to unix timestamp in
+    milliseconds."""
+    return datetime_to_epoch(dateify_string(datestr)) if datestr else None
 
 
 def stringify_since_now(amt, time_type):
@@ -1,14 +1,32 @@
+import copy
 import logging
 import math
+import threading
 import time
+from collections import OrderedDict
 from elasticsearch import Elasticsearch
 from elasticsearch.exceptions import (
     NotFoundError,
     TransportError,
-    ConflictError)
-from elasticsearch.helpers import bulk
-from .config import get_elasticsearch_hosts
-from .dates import now, get_since_now, get_query_dates
+    ConflictError,
+    RequestError)
+from elasticsearch.helpers import bulk, reindex
+from .config import (
+    get_elasticsearch_hosts,
+    get_elasticsearch_maxsize,
+    get_mapping_profile,
+    get_score_half_life_hours)
+from .dates import (
+    now,
+    now_epoch,
+    get_since_now,
+    get_query_dates,
+    epoch_to_datetime,
+    datestring_to_epoch,
+    MINUTE_MS,
+    DAY_MS)
+from .metrics import timed
+from .urls import normalize_url
 
 def logger():
     return  logging.getLogger(__name__)
@@ -23,6 +41,18 @@ USER_DOCUMENT_TYPE = 'user'
 CONTENT_DOCUMENT_TYPE = 'content'
 TWEET_DOCUMENT_TYPE = 'tweet'
 UNPROCESSED_TWEET_DOCUMENT_TYPE = 'rawtweet'
+HEARTBEAT_DOCUMENT_TYPE = 'heartbeat'
+AUTHORITY_DOCUMENT_TYPE = 'authority'
+BUILD_DOCUMENT_TYPE = 'build'
+FIRST_SEEN_DOCUMENT_TYPE = 'first_seen'
+SCORE_STATS_DOCUMENT_TYPE = 'score_stats'
+FINGERPRINT_DOCUMENT_TYPE = 'fingerprint'
+WEIGHT_TABLE_CHECK_SECONDS = 60
+TOP_LINK_HOURS = 4
+TOP_LINK_DEVIATIONS = 2
+MIN_SCORE_SAMPLES = 20
+SCORE_SAMPLE_SECONDS = 60
+MAX_TOP_URLS = 10000
 from .mappings import (
     RESULTS_CACHE_MAPPING,
     CACHED_URL_MAPPING,
@@ -30,46 +60,83 @@ from .mappings import (
     USER_MAPPING,
     CONTENT_MAPPING,
     TWEET_MAPPING,
-    UNPROCESSED_TWEET_MAPPING)
+    UNPROCESSED_TWEET_MAPPING,
+    HEARTBEAT_MAPPING,
+    AUTHORITY_MAPPING,
+    BUILD_MAPPING,
+    FIRST_SEEN_MAPPING,
+    SCORE_STATS_MAPPING,
+    FINGERPRINT_MAPPING,
+    COMPACT_CONTENT_MAPPING,
+    COMPACT_TWEET_MAPPING,
+    COMPACT_RESULTS_CACHE_MAPPING)
+from .scorestats import DecayingStats
+from .weights import WeightTable
 
 
 _es_connections = {}
+_es_clients = {}
+_es_lock = threading.Lock()
 from .elastic import ESClient
 def es(universe):
-    """Return new-style Elasticsearch client connection for the universe"""
+    """Return new-style Elasticsearch client connection for the universe.
+    Universes on the same hosts share a client and its connection pool."""
     global _es_connections
     if not universe in _es_connections:
-        _es_connections[universe] = ESClient(
-            hosts=get_elasticsearch_hosts(universe))
+        with _es_lock:
+            hosts = get_elasticsearch_hosts(universe)
+            key = tuple(sorted(hosts))
+            if key not in _es_clients:
+                _es_clients[key] = ESClient(hosts=hosts,
+                    maxsize=get_elasticsearch_maxsize(universe))
+            _es_connections[universe] = _es_clients[key]
     return _es_connections[universe]
 
 
 
-def build_universe_mappings(universe, rebuild=False):
-    """Create and map the universe."""
-    # TODO: Can we rebuild without losing our data by using aliases and
-    # re-indexing? See here:
-    # http://www.elasticsearch.org/blog/changing-mapping-with-zero-downtime/
-    # Keys are the index names. 
-    # Values are key/value pairs of the doc types and doc mappings.
-    all_indices = {
+def universe_mappings(universe, profile=None):
+    """
+    Get the mappings of the indices the universe uses, for a mapping
+    profile. Keys are the index names. Values are key/value pairs of the doc
+    types and doc mappings.
+
+    :arg profile: 'default' or 'compact'. Defaults to the universe's
+        `mapping_profile`.
+    """
+    compact = (profile or get_mapping_profile(universe)) == 'compact'
+    return {
         universe: {
             USER_DOCUMENT_TYPE: USER_MAPPING,
-            CONTENT_DOCUMENT_TYPE: CONTENT_MAPPING,
-            TWEET_DOCUMENT_TYPE: TWEET_MAPPING,
-            UNPROCESSED_TWEET_DOCUMENT_TYPE: UNPROCESSED_TWEET_MAPPING
+            CONTENT_DOCUMENT_TYPE:
+                COMPACT_CONTENT_MAPPING if compact else CONTENT_MAPPING,
+            TWEET_DOCUMENT_TYPE:
+                COMPACT_TWEET_MAPPING if compact else TWEET_MAPPING,
+            UNPROCESSED_TWEET_DOCUMENT_TYPE: UNPROCESSED_TWEET_MAPPING,
+            HEARTBEAT_DOCUMENT_TYPE: HEARTBEAT_MAPPING,
+            AUTHORITY_DOCUMENT_TYPE: AUTHORITY_MAPPING,
+            BUILD_DOCUMENT_TYPE: BUILD_MAPPING,
+            FIRST_SEEN_DOCUMENT_TYPE: FIRST_SEEN_MAPPING,
+            SCORE_STATS_DOCUMENT_TYPE: SCORE_STATS_MAPPING,
+            FINGERPRINT_DOCUMENT_TYPE: FINGERPRINT_MAPPING
         },
         URL_CACHE_INDEX: {
             CACHED_URL_DOCUMENT_TYPE: CACHED_URL_MAPPING
         },
         RESULTS_CACHE_INDEX: {
-            RESULTS_CACHE_DOCUMENT_TYPE: RESULTS_CACHE_MAPPING
+            RESULTS_CACHE_DOCUMENT_TYPE: COMPACT_RESULTS_CACHE_MAPPING
+                if compact else RESULTS_CACHE_MAPPING
         },
         TOP_CONTENT_INDEX: {
             TOP_CONTENT_DOCUMENT_TYPE: TOP_CONTENT_MAPPING
         }
     }
-    for index_name, index_mapping in all_indices.items():
+
+
+def build_universe_mappings(universe, rebuild=False):
+    """Create and map the universe. A mapping that conflicts with the one
+    already in an index is logged and left as it is: use `remap_universe`
+    to change the universe's mapping profile."""
+    for index_name, index_mapping in universe_mappings(universe).items():
         if not es(universe).indices.exists(index_name):
             es(universe).indices.create(index=index_name)
         for doc_type, doc_mapping in index_mapping.items():
@@ -79,8 +146,55 @@ def build_universe_mappings(universe, rebuild=False):
                         index=index_name, doc_type=doc_type) 
                 except NotFoundError:
                     pass
-            es(universe).indices.put_mapping(
-                doc_type, doc_mapping, index=index_name)
+            try:
+                es(universe).indices.put_mapping(
+                    doc_type, doc_mapping, index=index_name)
+            except RequestError as e:
+                logger().warn('Keeping the existing mapping of %s/%s, which '
+                    'conflicts with the %s profile: %s' % (index_name,
+                    doc_type, get_mapping_profile(universe), e))
+
+
+@timed()
+def remap_universe(universe, profile=None, chunk_size=500):
+    """
+    Copy the universe's index into a new index with the mappings of a
+    profile, and make the universe's name an alias of the new index. The
+    old index is deleted. Stop collecting and processing first: documents
+    written to the old index during the copy are lost. Returns the name of
+    the new index.
+
+    The results cache and top content indices are shared between universes
+    and left as they are.
+
+    :arg profile: 'default' or 'compact'. Defaults to the universe's
+        `mapping_profile`.
+    """
+    profile = profile or get_mapping_profile(universe)
+    client = es(universe)
+    new_index = '%s_%s_%d' % (universe, profile, now_epoch())
+    client.indices.create(index=new_index,
+        body={'mappings': universe_mappings(universe, profile)[universe]})
+    # The scan helper needs the plain client's search results
+    reindex(Elasticsearch(hosts=get_elasticsearch_hosts(universe)),
+        universe, new_index, chunk_size=chunk_size)
+    client.indices.refresh(index=new_index)
+    if client.indices.exists_alias(name=universe):
+        old_indices = client.indices.get_alias(name=universe).keys()
+        actions = [{'remove': {'index': index, 'alias': universe}}
+            for index in old_indices]
+        actions.append({'add': {'index': new_index, 'alias': universe}})
+        client.indices.update_aliases(body={'actions': actions})
+        for index in old_indices:
+            client.indices.delete(index=index)
+    else:
+        # An alias can't have the name of an index, so the universe is
+        # missing until the alias is added
+        client.indices.delete(index=universe)
+        client.indices.put_alias(index=new_index, name=universe)
+    logger().info('Remapped %s to %s with the %s profile' % (
+        universe, new_index, profile))
+    return new_index
 
 
 def get_all_docs(universe, index, doc_type, body={}, size=None, field='_id'):
@@ -99,12 +213,12 @@ def get_all_docs(universe, index, doc_type, body={}, size=None, field='_id'):
     all_results = []
     while True:
         if field == '_id':
-            res = es(universe).search(index=universe, doc_type=doc_type,
+            res = es(universe).search(index=index, doc_type=doc_type,
                 body=body, size=chunk_size, from_=start,
                 _source=False)
             all_results.extend([u._id for u in res])
         else:
-            res = es(universe).search(index=universe, doc_type=doc_type,
+            res = es(universe).search(index=index, doc_type=doc_type,
                 body=body, size=chunk_size, from_=start,
                 _source_include=[field])
             all_results.extend([u[field] for u in res])
@@ -116,6 +230,7 @@ def get_all_docs(universe, index, doc_type, body={}, size=None, field='_id'):
     return all_results
 
 
+@timed()
 def cleanup(universe, days=30):
     """Delete everything in the universe that is more than days old.
     Does not apply to top content."""
@@ -125,8 +240,8 @@ def cleanup(universe, days=30):
     body = {
         'filter': {
             'range': {
-                'created': {
-                    'lt': 'now-%dd' % days
+                'created_ms': {
+                    'lt': now_epoch() - days * DAY_MS
                 }
             }
         }
@@ -146,7 +261,8 @@ def cleanup(universe, days=30):
         })
 
     # Delete old cached results and urls
-    body['filter']['range']['cached_at'] = body['filter']['range'].pop('created')
+    body['filter']['range']['cached_at_ms'] = \
+        body['filter']['range'].pop('created_ms')
     old_results_ids = get_all_docs(universe,
         index=RESULTS_CACHE_INDEX,
         doc_type=RESULTS_CACHE_DOCUMENT_TYPE,
@@ -169,6 +285,19 @@ def cleanup(universe, days=30):
             '_type': CACHED_URL_DOCUMENT_TYPE,
             '_id': url
         })
+    # Content is only deleted once its tweets are old, which are no newer
+    # than its fingerprint
+    old_fingerprints = get_all_docs(universe,
+        index=universe,
+        doc_type=FINGERPRINT_DOCUMENT_TYPE,
+        body=body)
+    for fingerprint in old_fingerprints:
+        actions.append({
+            '_op_type': 'delete',
+            '_index': universe,
+            '_type': FINGERPRINT_DOCUMENT_TYPE,
+            '_id': fingerprint
+        })
 
     # This actually deletes everything
     bulk(client, actions)
@@ -192,35 +321,106 @@ def cleanup(universe, days=30):
             '_type': CONTENT_DOCUMENT_TYPE,
             '_id': url
             })
+
+    # And when urls were first seen, once they have no tweets left
+    first_seen_urls = set(get_all_docs(universe,
+        index=universe,
+        doc_type=FIRST_SEEN_DOCUMENT_TYPE))
+    for url in first_seen_urls - tweeted_urls:
+        actions.append({
+            '_op_type': 'delete',
+            '_index': universe,
+            '_type': FIRST_SEEN_DOCUMENT_TYPE,
+            '_id': url
+            })
     bulk(client, actions)
     
 
+@timed()
 def get_cached_url(universe, url):
     """Get a resolved URL from the index.
     Returns None if URL doesn't exist."""
     try:
         return es(universe).get_source(index=URL_CACHE_INDEX, 
-            id=url.rstrip('/'), doc_type=CACHED_URL_DOCUMENT_TYPE)['resolved']
+            id=normalize_url(url), doc_type=CACHED_URL_DOCUMENT_TYPE)['resolved']
     except NotFoundError:
         return None
 
 
+@timed()
 def set_cached_url(universe, url, resolved_url):
     """Index a URL and its resolution in Elasticsearch"""
+    url = normalize_url(url)
     body = {
-        'url': url.rstrip('/'),
-        'resolved': resolved_url.rstrip('/'),
-        'cached_at': now(stringify=True)
+        'url': url,
+        'resolved': normalize_url(resolved_url),
+        'cached_at': now(stringify=True),
+        'cached_at_ms': now_epoch()
     }
     es(universe).index(index=URL_CACHE_INDEX,
         doc_type=CACHED_URL_DOCUMENT_TYPE, body=body, id=url)
 
 
+@timed()
+def get_tweeted_urls(universe, hours=24):
+    """Get the content urls tweeted in the last hours."""
+    body = {
+        'query': {
+            'filtered': {
+                'filter': {
+                    'range': {
+                        'created_ms': {
+                            'gte': now_epoch() - hours * 60 * MINUTE_MS
+                        }
+                    }
+                }
+            }
+        },
+        'aggregations': {
+            'urls': {
+                'terms': {
+                    'field': 'content_url',
+                    'size': 0
+                }
+            }
+        }
+    }
+    res = es(universe).search(index=universe, doc_type=TWEET_DOCUMENT_TYPE,
+        body=body, size=0)
+    return [bucket['key'] for bucket in res.aggregations['urls']['buckets']
+        if bucket['key']]
+
+
+@timed()
+def get_fingerprint_url(universe, fingerprint):
+    """Get the url of the content extracted from a page with the given
+    fingerprint. Returns None if no such page has been extracted."""
+    try:
+        return es(universe).get_source(index=universe,
+            id=fingerprint, doc_type=FINGERPRINT_DOCUMENT_TYPE)['url']
+    except NotFoundError:
+        return None
+
+
+@timed()
+def set_fingerprint_url(universe, fingerprint, url):
+    """Index the url of the content extracted from a page with the given
+    fingerprint."""
+    body = {
+        'url': normalize_url(url),
+        'cached_at_ms': now_epoch()
+    }
+    es(universe).index(index=universe,
+        doc_type=FINGERPRINT_DOCUMENT_TYPE, body=body, id=fingerprint)
+
 
+
+@timed()
 def add_to_results_cache(universe, hours, results):
     """Cache a set of results under certain number of hours."""
     body = {
         'cached_at': now(stringify=True),
+        'cached_at_ms': now_epoch(),
         'hours_since': hours,
         'results': results
     }
@@ -230,57 +430,168 @@ def add_to_results_cache(universe, hours, results):
         body=body)
 
 
-def get_score_stats(universe, hours=4):
-    """Get extended stats on the scores returned from the results cache.
-    :arg hours: type of query to search for."""
-    body = {
-        'aggregations': {
-            'fresh_queries': {
-                'filter': {
-                    'term': {
-                        'hours_since': hours
-                    }
-                },
-                'aggregations': {
-                    'scores': {
-                        'extended_stats': {
-                            'field': 'score'
-                        }
-                    }
-                }
-            }
+@timed()
+def add_all_to_results_cache(universe, results_by_hours):
+    """Cache the results of several windows in one bulk request.
+
+    :arg results_by_hours: dict of numbers of hours to their results.
+    """
+    cached_at, cached_at_ms = now(stringify=True), now_epoch()
+    bulk(es(universe), ({
+        '_index': RESULTS_CACHE_INDEX,
+        '_type': RESULTS_CACHE_DOCUMENT_TYPE,
+        '_source': {
+            'cached_at': cached_at,
+            'cached_at_ms': cached_at_ms,
+            'hours_since': hours,
+            'results': results
         }
-    }
-    res = es(universe).search(
-        index=RESULTS_CACHE_INDEX, 
-        doc_type=RESULTS_CACHE_DOCUMENT_TYPE, 
+    } for hours, results in results_by_hours.items()))
+
+
+@timed()
+def load_score_stats(universe, hours=TOP_LINK_HOURS):
+    """Get the stored running statistics of the scores of a window, or empty
+    ones if there are none yet.
+    :arg hours: the window the scores are from."""
+    half_life = get_score_half_life_hours(universe) * 60 * 60
+    try:
+        doc = es(universe).get(index=universe,
+            doc_type=SCORE_STATS_DOCUMENT_TYPE, id=hours)
+    except NotFoundError:
+        return DecayingStats(half_life)
+    return DecayingStats.from_dict(half_life, doc)
+
+
+@timed()
+def save_score_stats(universe, hours, stats):
+    """Store the running statistics of the scores of a window."""
+    body = stats.to_dict()
+    body['hours_since'] = hours
+    es(universe).index(index=universe,
+        doc_type=SCORE_STATS_DOCUMENT_TYPE,
+        id=hours,
         body=body)
-    return res.aggregations['fresh_queries']['scores']
 
 
-def get_top_link(universe, hours=4, quantity=5):
+_score_stats = {}
+_score_stats_sampled = {}
+_score_lock = threading.Lock()
+def get_score_stats(universe, hours=TOP_LINK_HOURS):
+    """Return the in-memory running statistics of the scores of a window,
+    loading them the first time."""
+    key = (universe, hours)
+    if key not in _score_stats:
+        with _score_lock:
+            if key not in _score_stats:
+                _score_stats[key] = load_score_stats(universe, hours)
+    return _score_stats[key]
+
+
+def sample_scores(universe, hours, links):
+    """Add the scores of a window's links to its running statistics, and
+    store them. Scores are sampled at most every SCORE_SAMPLE_SECONDS, so
+    windows that are scored more often don't weigh more."""
+    key = (universe, hours)
+    stats = get_score_stats(universe, hours)
+    with _score_lock:
+        sampled = time.time()
+        if sampled - _score_stats_sampled.get(key, 0) < SCORE_SAMPLE_SECONDS:
+            return
+        _score_stats_sampled[key] = sampled
+        for link in links:
+            stats.update(link['score'], now=sampled)
+    save_score_stats(universe, hours, stats)
+
+
+@timed()
+def get_top_link(universe, hours=TOP_LINK_HOURS, quantity=5, items=None):
     """Search for any links in the current set that are a high enough score
-    to get into top links. Return one (and only one) if so."""
-    try:
-        top_links = get_items(universe, hours=hours, quantity=quantity)
-    except IndexError:
-        return None
-    score_stats = get_score_stats(universe, hours=hours)
-    # Treat a link as a top link if it's > 2 standard devs above the average
-    if score_stats['avg'] is None:
-        return None
-    cutoff = score_stats['avg'] + (2 * score_stats['std_deviation'])
-    link_is_already_top = lambda link: es(universe).exists(
-        index=TOP_CONTENT_INDEX, 
-        doc_type=TOP_CONTENT_DOCUMENT_TYPE, 
-        id=link['url'])
-    for link in top_links:
-        if link['score'] >= cutoff and not link_is_already_top(link):
-            # We only want one at a time even if more than 1 are in the results
-            return link
-    return None
+    to get into top links. Return one (and only one) if so. The scores are
+    added to the window's running statistics after they are compared.
+
+    :arg items: results of get_items for the hours, if already fetched.
+    """
+    if items is None:
+        try:
+            items = get_items(universe, hours=hours, quantity=quantity)
+        except IndexError:
+            return None
+    stats = get_score_stats(universe, hours)
+    # Treat a link as a top link if it's > 2 standard devs above the
+    # average of recent scores, once there are enough of them
+    top_link = None
+    if stats.weight >= MIN_SCORE_SAMPLES:
+        cutoff = stats.cutoff(TOP_LINK_DEVIATIONS)
+        candidates = [link for link in items[:quantity]
+            if link['score'] >= cutoff
+            and link['url'] not in _top_urls.get(universe, ())]
+        if candidates:
+            res = es(universe).mget(
+                {'ids': [link['url'] for link in candidates]},
+                index=TOP_CONTENT_INDEX,
+                doc_type=TOP_CONTENT_DOCUMENT_TYPE,
+                _source=False)
+            already_top = set(doc._id for doc in res if doc._found)
+            remember_top_urls(universe, already_top)
+            for link in candidates:
+                # We only want one at a time even if more than 1 are in
+                # the results
+                if link['url'] not in already_top:
+                    top_link = link
+                    break
+    sample_scores(universe, hours, items)
+    return top_link
+
+
+_top_link_handlers = {}
+# Urls known to be top links, most recently seen last, so that candidates
+# aren't looked up again
+_top_urls = {}
+_top_urls_lock = threading.Lock()
+def remember_top_urls(universe, urls):
+    """Note urls as top links, forgetting the least recently noted beyond
+    MAX_TOP_URLS."""
+    with _top_urls_lock:
+        known = _top_urls.setdefault(universe, OrderedDict())
+        for url in urls:
+            known.pop(url, None)
+            known[url] = True
+        while len(known) > MAX_TOP_URLS:
+            known.popitem(last=False)
+
+
+def watch_top_links(universe, handler=None):
+    """
+    Detect top links whenever the last TOP_LINK_HOURS of the universe are
+    scored in this process, rather than in a separate pass. Each new top
+    link is added to the top links as soon as it's found.
+
+    :arg handler: function called with the universe and each new top link
+        after it's added, e.g. to tweet it.
+    """
+    _top_link_handlers[universe] = handler
+
+
+def detect_top_link(universe, items):
+    """Add the top link among the scored items of the last TOP_LINK_HOURS
+    of a watched universe, if there is one, and pass it to the handler."""
+    top_link = get_top_link(universe, items=items)
+    if top_link is not None and add_new_top_link(universe, top_link):
+        logger().info('New top link in %s: %s' % (universe, top_link['url']))
+        handler = _top_link_handlers.get(universe)
+        if handler is not None:
+            # The link is already added, so a failing handler, e.g. a Twitter
+            # error, mustn't stop the results it was found in from caching
+            try:
+                handler(universe, top_link)
+            except Exception:
+                logger().exception('Failed to handle top link %s' % (
+                    top_link['url'],))
+    return top_link
 
 
+@timed()
 def add_to_top_links(universe, link):
     """Index a new top link to the given universe."""
     es(universe).index(
@@ -288,48 +599,83 @@ def add_to_top_links(universe, link):
         doc_type=TOP_CONTENT_DOCUMENT_TYPE,
         id=link['url'],
         body=link)
+    remember_top_urls(universe, [link['url']])
 
 
-def get_recent_top_links(universe, quantity=20):
-    """Get the most recently added top links in the given universe."""
+@timed()
+def add_new_top_link(universe, link):
+    """Index a top link unless it already is one. Returns whether it was
+    new, so that only one process announces it."""
+    try:
+        es(universe).create(
+            index=TOP_CONTENT_INDEX,
+            doc_type=TOP_CONTENT_DOCUMENT_TYPE,
+            id=link['url'],
+            body=link)
+    except ConflictError:
+        new = False
+    else:
+        new = True
+    remember_top_urls(universe, [link['url']])
+    return new
+
+
+@timed()
+def get_recent_top_links(universe, quantity=20, fields=None):
+    """Get the most recently added top links in the given universe.
+
+    :arg fields: fields of the links to get, as for `get_window_items`.
+    """
     body = {
         'sort': [{
-            'tweets.created': {
+            'tweets.created_ms': {
                 'order': 'desc'
             }
         }]
     }
+    content_fields, tweet_fields = projection(fields)
+    if content_fields is not None:
+        # Top links hold their tweets, so both are filtered at once
+        body['_source'] = source_filter(content_fields + (['tweets']
+            if tweet_fields is None else
+            ['tweets.' + field for field in tweet_fields]))
     return es(universe).search(index=TOP_CONTENT_INDEX, 
         doc_type=TOP_CONTENT_DOCUMENT_TYPE, body=body, size=quantity)
 
 
+@timed()
 def save_content(universe, content):
     """Save the content of a URL to the index."""
+    content['url'] = normalize_url(content['url'])
     es(universe).index(index=universe,
         doc_type=CONTENT_DOCUMENT_TYPE,
         id=content['url'],
         body=content)
 
 
+@timed()
 def delete_user(universe, user_id):
     """Delete a user from the universe index by their id."""
     es(universe).delete(index=universe, 
         doc_type=USER_DOCUMENT_TYPE, id=user_id)
 
 
+@timed()
 def delete_content_by_url(universe, url):
     """Delete the content specified by url."""
     es(universe).delete(index=universe,
-        doc_type=CONTENT_DOCUMENT_TYPE, id=url)
+        doc_type=CONTENT_DOCUMENT_TYPE, id=normalize_url(url))
 
 
+@timed()
 def delete_tweets_by_url(universe, url):
     """Delete tweets specified by url."""
     es(universe).delete_by_query(index=universe,
         doc_type=TWEET_DOCUMENT_TYPE,
-        body={'query': { 'term': { 'content_url': url }}})
+        body={'query': { 'term': { 'content_url': normalize_url(url) }}})
 
 
+@timed()
 def save_user(universe, user):
     """Check if a user exists in the database. If not, create it.
     If so, update it."""
@@ -346,6 +692,34 @@ def save_user(universe, user):
         es(universe).index(**kwargs)
 
 
+@timed()
+def save_user_weights(universe, users):
+    """Bulk update the weights of users, creating users that don't exist.
+
+    :arg users: user documents, each with an `id` and a `weight`.
+    """
+    bulk(es(universe), ({
+        '_op_type': 'update',
+        '_index': universe,
+        '_type': USER_DOCUMENT_TYPE,
+        '_id': user['id'],
+        'doc': user,
+        'doc_as_upsert': True
+    } for user in users))
+
+
+@timed()
+def delete_users(universe, user_ids):
+    """Bulk delete users from the universe index by their ids."""
+    bulk(es(universe), ({
+        '_op_type': 'delete',
+        '_index': universe,
+        '_type': USER_DOCUMENT_TYPE,
+        '_id': user_id
+    } for user_id in user_ids), raise_on_error=False)
+
+
+@timed()
 def get_user_ids(universe, size=None):
     """Get top users for the universe by weight.
     :arg size: number of users to get. Defaults to all users."""
@@ -364,6 +738,7 @@ def get_user_ids(universe, size=None):
     return user_ids
 
 
+@timed()
 def enqueue_tweet(universe, tweet):
     """Save a tweet to the universe index as an unprocessed tweet document.
     """
@@ -373,6 +748,14 @@ def enqueue_tweet(universe, tweet):
         body=tweet)
 
 
+@timed()
+def get_queue_depth(universe):
+    """Get the number of raw tweets waiting to be processed."""
+    return es(universe).count(index=universe,
+        doc_type=UNPROCESSED_TWEET_DOCUMENT_TYPE)['count']
+
+
+@timed()
 def next_unprocessed_tweet(universe, not_ids=None):
     """Get the next unprocessed tweet and delete it from the index."""
     # TODO: redo this so it is an efficient queue. Currently for
@@ -422,14 +805,40 @@ def next_unprocessed_tweet(universe, not_ids=None):
     return result
 
 
+@timed()
 def save_tweet(universe, tweet):
     """Save a tweet to the universe index, fully processed."""
     es(universe).index(index=universe,
         doc_type=TWEET_DOCUMENT_TYPE,
         id=tweet['id'],
         body=tweet)
+    if tweet.get('content_url'):
+        set_first_seen(universe, tweet['content_url'], tweet['created_ms'])
+
+
+@timed()
+def set_first_seen(universe, url, seen_ms):
+    """Record when a url was first tweeted, unless it was already seen
+    earlier."""
+    client = es(universe)
+    body = {'url': url, 'first_seen_ms': seen_ms}
+    try:
+        client.create(index=universe, doc_type=FIRST_SEEN_DOCUMENT_TYPE,
+            id=url, body=body)
+    except ConflictError:
+        first_seen = client.get(index=universe,
+            doc_type=FIRST_SEEN_DOCUMENT_TYPE, id=url)
+        if seen_ms < first_seen['first_seen_ms']:
+            try:
+                client.index(index=universe,
+                    doc_type=FIRST_SEEN_DOCUMENT_TYPE, id=url, body=body,
+                    version=first_seen._version)
+            except ConflictError:
+                # Changed since we read it; an earlier time may have won
+                pass
 
 
+@timed()
 def get_universe_tweets(universe, query=None, quantity=20, 
                         hours=24, start=None, end=None):
     """
@@ -446,7 +855,7 @@ def get_universe_tweets(universe, query=None, quantity=20,
     :arg size: number of tweets to return
     """
 
-    start, end = get_query_dates(start, end, hours)
+    start, end = get_query_dates(start, end, hours, epoch=True)
 
     # Build query based on what was in the input
     if query is None:
@@ -459,7 +868,7 @@ def get_universe_tweets(universe, query=None, quantity=20,
     # Now add date range filter
     body['filter'] = {
         'range': {
-            'created': {
+            'created_ms': {
                 'gte': start,
                 'lte': end
             }
@@ -469,6 +878,7 @@ def get_universe_tweets(universe, query=None, quantity=20,
         body=body, size=quantity)
 
 
+@timed()
 def search_content(universe, query, size=100):
     """
     Search fulltext of all content across universes for a given string, 
@@ -492,14 +902,17 @@ def search_content(universe, query, size=100):
         body=body, size=size)
 
 
-def search_items(universe, term, quantity=100):
+@timed()
+def search_items(universe, term, quantity=100, fields=None):
     """
     Search the text of both tweets and content for a given term and universe,
     and return some items matching one or the other.
 
     :arg term: search term to use for querying both tweets and content
     :arg quantity: number of items to return
+    :arg fields: fields of the items to get, as for `get_window_items`.
     """
+    content_fields, tweet_fields = projection(fields)
 
     # Search tweets and content for the given term
     body = {
@@ -511,6 +924,11 @@ def search_items(universe, term, quantity=100):
             }
         }
     }
+    if content_fields is not None and tweet_fields is not None:
+        # Content and tweets share the filter, with the fields that match
+        # them up. Whole tweets can't be filtered from the content here.
+        body['_source'] = source_filter(sorted(set(content_fields +
+            tweet_fields + ['content_url', 'created'])))
     res = es(universe).search(
         index=universe, 
         doc_type=','.join((CONTENT_DOCUMENT_TYPE, TWEET_DOCUMENT_TYPE)), 
@@ -549,18 +967,130 @@ def search_items(universe, term, quantity=100):
         if result['tweets']:
             result['first_tweeted'] = get_since_now(
                 result['tweets'][0]['created'])
+        if content_fields is not None:
+            project(result, content_fields,
+                ('type', 'rank', 'first_tweeted', 'tweets'))
+            if tweet_fields == []:
+                del result['tweets']
+            for tweet in result.get('tweets', []):
+                project(tweet, tweet_fields)
         formatted_results.append(result)
     return formatted_results
 
 
+@timed()
+def get_all_user_weights(universe, chunk_size=5000):
+    """Get (id, weight) pairs for every user in the universe."""
+    start = 0
+    while True:
+        res = es(universe).search(index=universe,
+            doc_type=USER_DOCUMENT_TYPE, size=chunk_size, from_=start,
+            _source_include=['weight'])
+        for user in res:
+            yield user._id, user.get('weight', 0.0)
+        start += chunk_size
+        if start >= res.total_hits:
+            break
+
+
+@timed()
+def save_build_version(universe):
+    """Mark the user weights of the universe as changed."""
+    es(universe).index(index=universe,
+        doc_type=BUILD_DOCUMENT_TYPE,
+        id='latest',
+        body={'version': now_epoch()})
+
+
+@timed()
+def get_build_version(universe):
+    """Get the version of the last build of the universe, or None."""
+    try:
+        return es(universe).get(index=universe,
+            doc_type=BUILD_DOCUMENT_TYPE, id='latest')['version']
+    except NotFoundError:
+        return None
+
+
+_weight_tables = {}
+_weight_tables_checked = {}
+_weight_lock = threading.Lock()
+def get_weight_table(universe):
+    """Return the in-memory user weight table for the universe. The build
+    version is checked at most every WEIGHT_TABLE_CHECK_SECONDS, and the
+    table reloaded when it has changed."""
+    if time.time() - _weight_tables_checked.get(universe, 0) \
+            < WEIGHT_TABLE_CHECK_SECONDS:
+        return _weight_tables[universe]
+    with _weight_lock:
+        if time.time() - _weight_tables_checked.get(universe, 0) \
+                < WEIGHT_TABLE_CHECK_SECONDS:
+            return _weight_tables[universe]
+        version = get_build_version(universe)
+        table = _weight_tables.get(universe)
+        if table is None or table.version != version:
+            logger().info('Loading user weights of %s version %s' % (
+                universe, version))
+            with timed('db.load_weight_table'):
+                table = WeightTable(version, get_all_user_weights(universe))
+            _weight_tables[universe] = table
+        _weight_tables_checked[universe] = time.time()
+        return table
+
+
 def get_user_weights(universe, user_ids):
     """Takes a list of user ids and returns a dict 
     with their weighted influence."""
-    res = es(universe).mget({'ids': list(set(user_ids))}, 
-        index=universe, doc_type=USER_DOCUMENT_TYPE)
-    users = filter(lambda u: u._found, res)
-    user_weights = dict([ (user.id, user.weight) for user in users])
-    return user_weights
+    return get_weight_table(universe).lookup(user_ids)
+
+
+def projection(fields):
+    """
+    Split a projection of item fields into the content fields and the tweet
+    fields to get from Elasticsearch. An item's tweets are projected with
+    fields like 'tweets.text', or kept whole with 'tweets'.
+
+    Returns a (content fields, tweet fields) pair of lists, where None
+    means every field. The content fields always include the url.
+    """
+    if fields is None:
+        return None, None
+    content_fields, tweet_fields, whole_tweets = set(['url']), set(), False
+    for field in fields:
+        if field == 'tweets':
+            whole_tweets = True
+        elif field.startswith('tweets.'):
+            tweet_fields.add(field[len('tweets.'):])
+        else:
+            content_fields.add(field)
+    return sorted(content_fields), \
+        None if whole_tweets else sorted(tweet_fields)
+
+
+def source_filter(fields):
+    """The `_source` of a search body for a list of fields, or None."""
+    if fields is None:
+        return None
+    return {'include': fields} if fields else False
+
+
+def project(doc, fields, keep=()):
+    """Drop the fields of a document that aren't in fields or keep. None
+    keeps every field."""
+    if fields is not None:
+        for field in doc.keys():
+            if field not in fields and field not in keep:
+                del doc[field]
+    return doc
+
+
+def get_first_tweeted(link):
+    """Get the datetime a link from the aggregation was first tweeted.
+    The conversion is stored on the link so it happens only once."""
+    if 'first_tweeted_at' not in link:
+        link['first_tweeted_at'] = epoch_to_datetime(
+            link['first_tweets']['hits']['hits'][0]['sort'][0])
+    return link['first_tweeted_at']
 
 
 def score_link(link, user_weights, time_decay=True, hours=24):
@@ -589,9 +1119,8 @@ def score_link(link, user_weights, time_decay=True, hours=24):
         # Longer-range searches mean less hourly decay
         DECAY_FACTOR = 1.0 - (1 / float(hours))
 
-        first_tweeted = link['first_tweets']['hits']['hits'][0]['sort'][0]
-        minutes_since = get_since_now(first_tweeted, 
-            time_type='minute', stringify=False)[0]
+        first_tweeted_ms = link['first_tweets']['hits']['hits'][0]['sort'][0]
+        minutes_since = (now_epoch() - first_tweeted_ms) // MINUTE_MS
         hours_since = minutes_since / 60
 
         orig_score = score
@@ -606,8 +1135,166 @@ def score_link(link, user_weights, time_decay=True, hours=24):
     return score, score_explanation
 
 
+def tweet_window_aggregation(start, end, search_limit, tweet_fields=None):
+    """Aggregation of the most tweeted links between start and end, in
+    epoch milliseconds, with their tweeters and first tweets, which have
+    only the given tweet_fields if any."""
+    first_tweets = {
+        'size': 3,
+        'sort': [{
+            'created_ms': {
+                'order': 'asc'
+            }
+        }]
+    }
+    if tweet_fields is not None:
+        first_tweets['_source'] = source_filter(tweet_fields)
+    return {
+        'filter': {
+            'range': {
+                'created_ms': {
+                    'gte': start,
+                    'lte': end
+                }
+            }
+        },
+        'aggregations': {
+            CONTENT_DOCUMENT_TYPE: {
+                'terms': {
+                    'field': 'content_url',
+                    # This orders by doc count, but we want the
+                    # number of (unique) users tweeting it, weighted
+                    # by influence. Is there any way to sub-aggregate
+                    # that data and order it here?
+                    'order': {
+                        '_count': 'desc'
+                    },
+                    # Get extra docs because we need to reorder them
+                    'size': search_limit,
+                    'min_doc_count': 2,
+                },
+                'aggregations': {
+                    'tweeters': {
+                        'terms': {
+                            'field': 'user_id',
+                            'size': 1000
+                        }
+                    },
+                    'first_tweets': {
+                        'top_hits': first_tweets
+                    }
+                }
+            }
+        }
+    }
+
+
+@timed()
+def get_first_tweeted_ms(universe, urls):
+    """Get a dict of the time each url was first tweeted, in epoch
+    milliseconds. Urls that were never seen are left out."""
+    res = es(universe).mget({'ids': list(urls)},
+        index=universe, doc_type=FIRST_SEEN_DOCUMENT_TYPE)
+    return dict((doc._id, doc['first_seen_ms']) for doc in res if doc._found)
+
+
+def get_window_items(universe, windows, quantity=20, time_decay=True,
+                     fields=None):
+    """
+    Get the most popular links of several time windows at once. The windows
+    share one aggregation request, one check for links tweeted before each
+    window, and one lookup of the links' content.
+
+    :arg windows: dict of keys to (start, end, hours) tuples, where start and
+        end are in epoch milliseconds and hours sets the time decay.
+    :arg quantity: number of links to return for each window.
+    :arg time_decay: whether or not to decay the score based on the time
+        of its first tweet.
+    :arg fields: fields of the links' content and tweets to get, as for
+        `projection`, or None for all of them. Links without 'tweets' in
+        their fields have no tweets. Their rank, score and first tweet time
+        are always included.
+
+    Returns a dict of the same keys to lists of links.
+    """
+    search_limit = quantity * 5 if time_decay else quantity * 2
+    content_fields, tweet_fields = projection(fields)
+
+    # Get the top links in each time frame, and some extra agg metadata
+    body = {
+        'aggregations': dict(('window_%s' % key,
+            tweet_window_aggregation(start, end, search_limit, tweet_fields))
+            for key, (start, end, hours) in windows.items())
+    }
+    res = es(universe).search(index=universe, doc_type=TWEET_DOCUMENT_TYPE,
+        body=body, size=0)
+    links_by_window = dict((key, res.aggregations['window_%s' % key][
+        CONTENT_DOCUMENT_TYPE]['buckets']) for key in windows)
+
+    # Drop the links that were tweeted before their time frame.
+    urls = set(link['key'] for links in links_by_window.values()
+        for link in links)
+    first_tweeted = get_first_tweeted_ms(universe, urls) if urls else {}
+    for key, (start, end, hours) in windows.items():
+        links_by_window[key] = [link for link in links_by_window[key]
+            if first_tweeted.get(link['key'], end) > start]
+
+    # Score each link based on its tweeters' relative influences, and time since
+    tweeter_ids = set(tweeter['key'] for links in links_by_window.values()
+        for link in links for tweeter in link['tweeters']['buckets'])
+    user_weights = get_user_weights(universe, tweeter_ids)
+    top_by_window = {}
+    for key, (start, end, hours) in windows.items():
+        for link in links_by_window[key]:
+            link['score'], link['score_explanation'] = score_link(
+                link, user_weights, time_decay=time_decay, hours=hours)
+        top_by_window[key] = sorted(links_by_window[key],
+            key=lambda link: link['score'], reverse=True)[:quantity]
+
+    # Get the full metadata for these urls.
+    top_urls = list(set(link['key'] for links in top_by_window.values()
+        for link in links))
+    content_by_url = {}
+    if top_urls:
+        source = {}
+        if content_fields is not None:
+            source['_source_include'] = content_fields
+        link_res = es(universe).mget({'ids': top_urls},
+            index=universe, doc_type=CONTENT_DOCUMENT_TYPE, **source)
+        content_by_url = dict((c._id, c) for c in link_res if c._found)
+
+    # Add some metadata, including the tweet
+    items = {}
+    for key, sorted_links in top_by_window.items():
+        top_links = []
+        for link_match in sorted_links:
+            if link_match['key'] not in content_by_url:
+                continue
+            link = copy.copy(content_by_url[link_match['key']])
+            # Add the link's rank
+            link['rank'] = len(top_links) + 1
+
+            # Add the first time the link was tweeted, and the score
+            link['score'] = link_match['score']
+            link['score_explanation'] = link_match['score_explanation']
+
+            tweets = link_match['first_tweets']['hits']['hits']
+            link['first_tweeted'] = get_since_now(
+                get_first_tweeted(link_match))
+            if tweet_fields != []:
+                link['tweets'] = [tweet['_source'] for tweet in tweets]
+            top_links.append(link)
+        items[key] = top_links
+        # Top links are indexed whole, so only detect them among whole links
+        if fields is None and windows[key][2] == TOP_LINK_HOURS and \
+                universe in _top_link_handlers:
+            detect_top_link(universe, top_links)
+    return items
+
+
+@timed()
 def get_items(universe, quantity=20, hours=24, 
-              start=None, end=None, time_decay=True):
+              start=None, end=None, time_decay=True, fields=None):
     """
     The default function: gets the most popular links shared 
     from a given universe and time frame.
@@ -618,55 +1305,122 @@ def get_items(universe, quantity=20, hours=24,
     :arg end: end datetime in UTC. Defaults to now.
     :arg time_decay: whether or not to decay the score based on the time
         of its first tweet.
+    :arg fields: fields of the links to get, as for `get_window_items`.
     """
+    start, end = get_query_dates(start, end, hours, epoch=True)
+    return get_window_items(universe, {hours: (start, end, hours)},
+        quantity=quantity, time_decay=time_decay, fields=fields)[hours]
+
+
+@timed()
+def get_items_by_hours(universe, hours, quantity=20, time_decay=True):
+    """
+    Get the most popular links for several windows ending now, in one pass.
+
+    :arg hours: list of numbers of hours since now to search through.
+
+    Returns a dict of each number of hours to its links.
+    """
+    windows = {}
+    for h in hours:
+        start, end = get_query_dates(None, None, h, epoch=True)
+        windows[h] = (start, end, h)
+    return get_window_items(universe, windows, quantity=quantity,
+        time_decay=time_decay)
+
+
+def backfill_epoch_field(universe, index, doc_type, field, epoch_field,
+                         chunk_size=1000):
+    """
+    Add a unix timestamp in milliseconds to documents that only have the
+    Twitter-formatted date. Returns the number of documents updated.
+
+    :arg field: the Twitter-formatted date field to convert.
+    :arg epoch_field: the millisecond field to set.
+    """
+    client = es(universe)
+    body = {
+        'filter': {
+            'and': [
+                {'missing': {'field': epoch_field}},
+                {'exists': {'field': field}}
+            ]
+        }
+    }
+    updated = 0
+    while True:
+        res = client.search(index=index, doc_type=doc_type, body=body,
+            size=chunk_size, _source_include=[field])
+        actions = [{
+            '_op_type': 'update',
+            '_index': index,
+            '_type': doc_type,
+            '_id': doc._id,
+            'doc': {epoch_field: datestring_to_epoch(doc[field])}
+        } for doc in res]
+        if not actions:
+            break
+        bulk(client, actions)
+        client.indices.refresh(index=index)
+        updated += len(actions)
+    return updated
 
-    start, end = get_query_dates(start, end, hours)
-    search_limit = quantity * 5 if time_decay else quantity * 2
 
-    # Get the top links in the given time frame, and some extra agg metadata
+def backfill_top_link_times(universe, chunk_size=500):
+    """
+    Add epoch milliseconds to the tweets of top links added before they
+    had them, so that top links sort by their tweets' times. Returns the
+    number of top links updated.
+    """
+    client = es(universe)
+    body = {
+        'filter': {
+            'missing': {'field': 'tweets.created_ms'}
+        }
+    }
+    updated = 0
+    while True:
+        res = client.search(index=TOP_CONTENT_INDEX,
+            doc_type=TOP_CONTENT_DOCUMENT_TYPE, body=body, size=chunk_size,
+            _source_include=['tweets'])
+        actions = []
+        for link in res:
+            tweets = link.get('tweets') or []
+            for tweet in tweets:
+                tweet['created_ms'] = datestring_to_epoch(tweet['created'])
+            actions.append({
+                '_op_type': 'update',
+                '_index': TOP_CONTENT_INDEX,
+                '_type': TOP_CONTENT_DOCUMENT_TYPE,
+                '_id': link._id,
+                'doc': {'tweets': tweets}
+            })
+        # Links without tweets can't be given times, and would be found again
+        actions = [a for a in actions if a['doc']['tweets']]
+        if not actions:
+            break
+        bulk(client, actions)
+        client.indices.refresh(index=TOP_CONTENT_INDEX)
+        updated += len(actions)
+    return updated
+
+
+def backfill_first_seen(universe):
+    """
+    Record when every tweeted url was first seen, from the earliest of its
+    tweets. Returns the number of urls.
+    """
     body = {
         'aggregations': {
-            'recent_tweets': {
-                'filter': {
-                    'range': {
-                        'created': {
-                            'gte': start,
-                            'lte': end
-                        }
-                    }
+            'urls': {
+                'terms': {
+                    'field': 'content_url',
+                    'size': 0
                 },
                 'aggregations': {
-                    CONTENT_DOCUMENT_TYPE: {
-                        'terms': {
-                            'field': 'content_url',
-                            # This orders by doc count, but we want the
-                            # number of (unique) users tweeting it, weighted
-                            # by influence. Is there any way to sub-aggregate
-                            # that data and order it here?
-                            'order': {
-                                '_count': 'desc'
-                            },
-                            # Get extra docs because we need to reorder them
-                            'size': search_limit,
-                            'min_doc_count': 2,
-                        },
-                        'aggregations': {
-                            'tweeters': {
-                                'terms': {
-                                    'field': 'user_id',
-                                    'size': 1000
-                                }
-                            },
-                            'first_tweets': {
-                                'top_hits': {
-                                    'size': 3,
-                                    'sort': [{
-                                        'created': {
-                                            'order': 'asc'
-                                        }
-                                    }]
-                                }
-                            }
+                    'first_seen': {
+                        'min': {
+                            'field': 'created_ms'
                         }
                     }
                 }
@@ -675,69 +1429,39 @@ def get_items(universe, quantity=20, hours=24,
     }
     res = es(universe).search(index=universe, doc_type=TWEET_DOCUMENT_TYPE,
         body=body, size=0)
-    links = res.aggregations['recent_tweets'][CONTENT_DOCUMENT_TYPE]['buckets']
-    # There's no content in the given time frame
-    if not links:
-        return []
-    # Do another filter query to figure out which of these links were tweeted before
-    # the given time range.
-    body2 = {
-        'filter': {
-            'and': [{
-                'terms': {
-                    'content_url': [link['key'] for link in links]
-                    }
-                }, {
-                'range': {
-                    'created': {
-                        'lte': start
-                    }
-                }
-            }]
+    buckets = res.aggregations['urls']['buckets']
+    bulk(es(universe), ({
+        '_index': universe,
+        '_type': FIRST_SEEN_DOCUMENT_TYPE,
+        '_id': bucket['key'],
+        '_source': {
+            'url': bucket['key'],
+            'first_seen_ms': int(bucket['first_seen']['value'])
         }
+    } for bucket in buckets))
+    return len(buckets)
+
+
+def migrate_epoch_times(universe):
+    """Map the epoch millisecond fields and backfill them on tweets,
+    cached urls, cached results and top links indexed before they existed,
+    then record when each tweeted url was first seen."""
+    build_universe_mappings(universe)
+    counts = {
+        'tweets': backfill_epoch_field(universe, universe,
+            TWEET_DOCUMENT_TYPE, 'created', 'created_ms'),
+        'cached urls': backfill_epoch_field(universe, URL_CACHE_INDEX,
+            CACHED_URL_DOCUMENT_TYPE, 'cached_at', 'cached_at_ms'),
+        'cached results': backfill_epoch_field(universe, RESULTS_CACHE_INDEX,
+            RESULTS_CACHE_DOCUMENT_TYPE, 'cached_at', 'cached_at_ms'),
+        'top links': backfill_top_link_times(universe),
     }
-    res2 = es(universe).search(index=universe, doc_type=TWEET_DOCUMENT_TYPE,
-        body=body2, size=1000)
-    outside_of_range = set([h.content_url for h in res2])
-    links = filter(lambda link: link['key'] not in outside_of_range, links)
-    if not links:
-        return []
-
-    # Score each link based on its tweeters' relative influences, and time since
-    tweeter_ids = [item for sublist in 
-        [[i['key'] for i in link['tweeters']['buckets']] for link in links] 
-        for item in sublist]
-    user_weights = get_user_weights(universe, tweeter_ids)
-    for link in links:
-        link['score'], link['score_explanation'] = score_link(
-                link, user_weights, time_decay=time_decay, hours=hours)
-    sorted_links = sorted(links, 
-        key=lambda link: link['score'], reverse=True)[:quantity]
-
-    # Get the full metadata for these urls.
-    top_urls = [url['key'] for url in sorted_links]
-    link_res = es(universe).mget({'ids': top_urls}, 
-        index=universe, doc_type=CONTENT_DOCUMENT_TYPE)
-    matching_links = filter(lambda c: c._found, link_res)
-
-    # Add some metadata, including the tweet
-    top_links = []
-    for index, link in enumerate(matching_links):
-        # Add the link's rank
-        link['rank'] = index + 1
-
-        # Add the first time the link was tweeted, and the score
-        link_match = filter(lambda l: l['key'] == link['url'], links)[0]
-        link['score'] = link_match['score']
-        link['score_explanation'] = link_match['score_explanation']
-        
-        tweets = link_match['first_tweets']['hits']['hits']
-        link['first_tweeted'] = get_since_now(tweets[0]['sort'][0])
-        link['tweets'] = [tweet['_source'] for tweet in tweets]
-        top_links.append(link)
-    return top_links
+    es(universe).indices.refresh(index=universe)
+    counts['first seen urls'] = backfill_first_seen(universe)
+    return counts
 
 
+@timed()
 def get_top_providers(universe, size=2000):
     """
     Get a list of all providers (i.e. domains) in order of popularity.
@@ -761,9 +1485,10 @@ def get_top_providers(universe, size=2000):
     return [i['key'] for i in res.aggregations['providers']]
 
 
+@timed()
 def get_latest_tweet(universe):
     body = {
-        'sort': { 'created': { 'order': 'desc' }}
+        'sort': { 'created_ms': { 'order': 'desc' }}
     }
     res = es(universe).search(
         index=universe,
@@ -775,6 +1500,7 @@ def get_latest_tweet(universe):
         return None
         
 
+@timed()
 def get_latest_raw_tweet(universe):
     body = {
         'sort': { 'created_at': { 'order': 'desc' }}
@@ -787,5 +1513,76 @@ def get_latest_raw_tweet(universe):
         return res.next()
     except StopIteration:
         return None
-       
 
+
+@timed()
+def get_oldest_raw_tweet(universe):
+    """Get the unprocessed tweet that has been queued the longest."""
+    body = {
+        'sort': { 'created_at': { 'order': 'asc' }}
+    }
+    res = es(universe).search(
+        index=universe,
+        doc_type=UNPROCESSED_TWEET_DOCUMENT_TYPE,
+        body = body,
+        size=1)
+    try:
+        return res.next()
+    except StopIteration:
+        return None
+
+
+@timed()
+def save_heartbeat(universe, component, **info):
+    """Record that a component of the universe is alive."""
+    body = dict(info, component=component, beat_ms=now_epoch())
+    es(universe).index(index=universe,
+        doc_type=HEARTBEAT_DOCUMENT_TYPE,
+        id=component,
+        body=body)
+
+
+@timed()
+def get_heartbeat(universe, component):
+    """Get the last heartbeat of a component. Returns None if the component
+    has never reported one."""
+    try:
+        return es(universe).get(index=universe,
+            doc_type=HEARTBEAT_DOCUMENT_TYPE, id=component)
+    except NotFoundError:
+        return None
+
+
+@timed()
+def save_authority(universe, authority_id, friend_ids, friends_count):
+    """Store the friend ids of an authority as of now, for incremental
+    builds of the universe."""
+    es(universe).index(index=universe,
+        doc_type=AUTHORITY_DOCUMENT_TYPE,
+        id=authority_id,
+        body={
+            'id': authority_id,
+            'friend_ids': list(friend_ids),
+            'friends_count': friends_count,
+            'fetched_ms': now_epoch()
+        })
+
+
+@timed()
+def get_authorities(universe):
+    """Get the stored authorities of the universe, keyed by id."""
+    ids = get_all_docs(universe,
+        index=universe,
+        doc_type=AUTHORITY_DOCUMENT_TYPE)
+    if not ids:
+        return {}
+    res = es(universe).mget({'ids': ids},
+        index=universe, doc_type=AUTHORITY_DOCUMENT_TYPE)
+    return dict((a._id, a) for a in res if a._found)
+
+
+@timed()
+def delete_authority(universe, authority_id):
+    """Delete an authority that is no longer in the seed."""
+    es(universe).delete(index=universe,
+        doc_type=AUTHORITY_DOCUMENT_TYPE, id=authority_id)
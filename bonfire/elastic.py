@@ -18,6 +18,7 @@ took, timed_out, total_shards, successful_shards, failed_shards. No need for
 on an mget operation.
 """
 from elasticsearch import Elasticsearch
+from . import metrics
 
 
 class ESCollection(object):
@@ -130,6 +131,8 @@ class ESClient(Elasticsearch):
 
     def search(self, *args, **kwargs):
         res = super(ESClient, self).search(*args, **kwargs)
+        if res.get('took') is not None:
+            metrics.timing('es.search.took', res['took'])
         return ESCollection(res)
 
     def get(self, *args, **kwargs):
@@ -5,11 +5,16 @@ import re
 import requests
 from bs4 import BeautifulSoup
 from delorean import parse as parse_date
+from .charset import decode_html
+from .profiles import node_selector
 
 ATTRIBUTION_REX = re.compile('^\s*[Bb][Yy]\s+(\w+\.? ?){1,4}\.?\s*$')
 WORD = re.compile('\w+')
 DEFAULT_CONTENT_NODE_TYPES = ['p']
 HEADER_NODE_TYPES = ['h1', 'h2', 'h3']
+# Words of text, less links, a container found by a profile's selector
+# must have to be taken for the article
+MIN_SELECTED_SCORE = 50
 USER_AGENT = 'Mozilla/5.0 (iPad; U; CPU OS 3_2_1 like Mac OS X; en-us) AppleWebKit/531.21.10 (KHTML, like Gecko) Mobile/7B405'
 
 
@@ -73,13 +78,21 @@ class InstantiationError(Exception): pass
 
 class ArticleExtractor(object):
 
-    def __init__(self, url=None, html=None):
+    def __init__(self, url=None, html=None, selector=None):
+        """
+        :arg selector: CSS selector of the article container on pages like
+            this one, e.g. from a provider profile. Every paragraph's parent
+            is only scored when it finds no container with enough text.
+        """
         if url is None and html is None:
             raise InstantiationError(
                 'ArticleExtractor must be instantiated with '\
                 'a URL or HTML content.')
         self._url = url
         self._html = html
+        self.selector = selector
+        # Whether the selector found the article, once it has been tried
+        self.selector_matched = None
         self._densities = {}
         self._article_node = None
         self._doc = None
@@ -95,7 +108,7 @@ class ArticleExtractor(object):
         r = requests.get(url, headers=headers)
         if r.status_code >= 400:
             raise requests.exceptions.HTTPError(r.status_code)
-        return r.text
+        return decode_html(r.content, r.headers.get('content-type'))[0]
 
     @property
     def url(self):
@@ -149,10 +162,36 @@ class ArticleExtractor(object):
             self._meta = self._extract_metadata()
         return self._meta
 
+    def _score_nodes(self, nodes):
+        """Score the parents of content nodes by their words, less links,
+        and note each node's link density."""
+        scores = {}
+        for node in nodes:
+            parent = node.parent
+            if not parent in scores:
+                scores[parent] = 0.0
+            density = link_density(node)
+            wc = word_count(clean_whitespace(node.get_text()))
+            scores[parent] += wc - wc * density
+            self._densities[node] = density
+        return scores
+
+    def _selected_node(self):
+        """The container found by the selector with the most text, or None
+        if none has enough."""
+        best, best_score = None, MIN_SELECTED_SCORE
+        for node in self.doc.select(self.selector):
+            score = sum(self._score_nodes(content_nodes(node)).values())
+            if score >= best_score:
+                best, best_score = node, score
+        return best
+
     @property
     def article_node(self):
+        if self._article_node is None and self.selector:
+            self._article_node = self._selected_node()
+            self.selector_matched = self._article_node is not None
         if self._article_node is None:
-            scores = {}
             nodes = None
             article = self.doc.select('article')
             if not article:
@@ -161,14 +200,7 @@ class ArticleExtractor(object):
                 nodes = content_nodes(article[0])
             if not nodes:
                 nodes = content_nodes(self.doc)
-            for node in nodes:
-                parent = node.parent
-                if not parent in scores:
-                    scores[parent] = 0.0
-                density = link_density(node)
-                wc = word_count(clean_whitespace(node.get_text()))
-                scores[parent] += wc - wc * density
-                self._densities[node] = density
+            scores = self._score_nodes(nodes)
             if scores:
                 self._article_node = sorted(
                     scores, key=scores.get, reverse=True)[0]
@@ -176,6 +208,22 @@ class ArticleExtractor(object):
                 self._article_node = self.doc
         return self._article_node
 
+    @property
+    def article_selector(self):
+        """CSS selector of the article container, for finding it on other
+        pages like this one. None if there is none."""
+        if self.article_node is self.doc:
+            return None
+        return node_selector(self.article_node)
+
+    @property
+    def favicon(self):
+        """Url of the favicon given by the page, or None."""
+        for link in self.doc.find_all('link', href=True):
+            if 'icon' in [rel.lower() for rel in link.get('rel') or []]:
+                return link['href']
+        return None
+
     def get_article_text(self):
         r = []
         for n in content_nodes(self.article_node):
@@ -0,0 +1,105 @@
+"""
+Health and lag of the collector and processor of each universe.
+
+Collector lag is the time since the newest tweet was seen, queued or
+processed. Processor lag is the time the oldest queued tweet has been
+waiting, and is zero when the queue is empty. Both components write a
+heartbeat while they are running, so a quiet stream or an empty queue is
+not mistaken for a stalled component: a component is only stalled when
+its lag is over the threshold and its heartbeat is also stale.
+"""
+import os
+import socket
+import time
+from .config import get_stall_seconds
+from .dates import datestring_to_epoch, now_epoch
+from .db import (
+    get_heartbeat,
+    get_latest_raw_tweet,
+    get_latest_tweet,
+    get_oldest_raw_tweet,
+    get_queue_depth,
+    save_heartbeat)
+
+COMPONENTS = ('collector', 'processor')
+HEARTBEAT_INTERVAL = 30
+
+
+class Heartbeat(object):
+    """Writes a component's heartbeat, at most once per interval."""
+
+    def __init__(self, universe, component, interval=HEARTBEAT_INTERVAL):
+        self.universe = universe
+        self.component = component
+        self.interval = interval
+        self.last_beat = 0
+
+    def beat(self):
+        if time.time() - self.last_beat >= self.interval:
+            save_heartbeat(self.universe, self.component,
+                host=socket.gethostname(), pid=os.getpid())
+            self.last_beat = time.time()
+
+
+def age(epoch_ms):
+    """Seconds since a unix timestamp in milliseconds, or None."""
+    if epoch_ms is None:
+        return None
+    return max(now_epoch() - epoch_ms, 0) / 1000
+
+
+def is_stalled(lag, heartbeat_age, stall_seconds):
+    if lag is None or lag <= stall_seconds:
+        return False
+    return heartbeat_age is None or heartbeat_age > stall_seconds
+
+
+def heartbeat_age(universe, component):
+    heartbeat = get_heartbeat(universe, component)
+    return age(heartbeat['beat_ms']) if heartbeat else None
+
+
+def collector_status(universe, stall_seconds):
+    latest = [datestring_to_epoch(t.created_at) for t in
+        [get_latest_raw_tweet(universe)] if t is not None]
+    latest += [t.get('created_ms') or datestring_to_epoch(t.created)
+        for t in [get_latest_tweet(universe)] if t is not None]
+    lag = age(max(latest)) if latest else None
+    heartbeat = heartbeat_age(universe, 'collector')
+    return {
+        'lag': lag,
+        'heartbeat_age': heartbeat,
+        'stalled': is_stalled(lag, heartbeat, stall_seconds)
+    }
+
+
+def processor_status(universe, stall_seconds):
+    depth = get_queue_depth(universe)
+    lag = 0
+    if depth:
+        oldest = get_oldest_raw_tweet(universe)
+        if oldest is not None:
+            lag = age(datestring_to_epoch(oldest.created_at))
+    heartbeat = heartbeat_age(universe, 'processor')
+    return {
+        'lag': lag,
+        'queue_depth': depth,
+        'heartbeat_age': heartbeat,
+        'stalled': is_stalled(lag, heartbeat, stall_seconds)
+    }
+
+
+def universe_status(universe, stall_seconds=None):
+    """
+    Get lag and heartbeat age, in seconds, and stalled state for the
+    collector and processor of a universe.
+
+    :arg stall_seconds: lag and heartbeat age past which a component is
+        considered stalled. Defaults to the universe's configuration.
+    """
+    if stall_seconds is None:
+        stall_seconds = get_stall_seconds(universe)
+    return {
+        'collector': collector_status(universe, stall_seconds),
+        'processor': processor_status(universe, stall_seconds)
+    }
@@ -0,0 +1,180 @@
+"""
+Per-host limits on fetching pages.
+
+Every request the processor makes, including each redirect, goes through a
+HostScheduler for the host it is sent to. The scheduler keeps a circuit
+breaker for each host: after FAILURE_THRESHOLD timeouts or connection errors
+in a row, requests to the host fail at once for COOLDOWN_SECONDS, rather
+than each waiting for the timeout. After the cooldown one request is let through to try the host
+again, and the circuit closes if it succeeds.
+
+The scheduler also caps the number of requests in flight to one host, for
+callers that share a session between threads. The processor fetches one
+url at a time, so the cap never makes it wait.
+
+The latency and failures of each host are kept too, and reported, slowest
+hosts first, in the `hosts` section of the metrics.
+"""
+import logging
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+import requests
+from requests.adapters import BaseAdapter
+from .metrics import percentile
+from .urls import get_host
+
+MAX_PER_HOST = 4
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 300
+# Hosts to keep state for, dropping the least recently used
+MAX_HOSTS = 10000
+RECENT_LATENCIES = 32
+FAILURES = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class HostUnavailable(requests.exceptions.RequestException):
+    """A request wasn't sent because the host's circuit is open."""
+
+
+class HostState(object):
+
+    def __init__(self, max_requests):
+        self.slots = threading.BoundedSemaphore(max_requests)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent_ms = deque([], RECENT_LATENCIES)
+        self.open_until = None
+        self.trying = False
+        self.last_error = None
+
+    def snapshot(self, now):
+        recent = sorted(self.recent_ms)
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'total_ms': round(self.total_ms, 1),
+            'max_ms': round(self.max_ms, 1),
+            'p50_ms': percentile(recent, 50),
+            'open_seconds': max(int(self.open_until - now), 0)
+                if self.open_until else 0,
+            'last_error': self.last_error,
+        }
+
+
+class HostScheduler(object):
+
+    def __init__(self, max_per_host=MAX_PER_HOST,
+                 failure_threshold=FAILURE_THRESHOLD,
+                 cooldown=COOLDOWN_SECONDS):
+        """
+        :arg max_per_host: requests in flight to a host at once, from
+            concurrent callers. More wait.
+        :arg failure_threshold: failures in a row that open a host's circuit.
+        :arg cooldown: seconds a host's circuit stays open.
+        """
+        self.max_per_host = max_per_host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hosts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def state(self, host):
+        """Get a host's state, as the most recently used. Called with the
+        lock held."""
+        state = self.hosts.pop(host, None)
+        if state is None:
+            state = HostState(self.max_per_host)
+            if len(self.hosts) >= MAX_HOSTS:
+                self.hosts.popitem(last=False)
+        self.hosts[host] = state
+        return state
+
+    def admit(self, host):
+        """Get the state of a host that may be sent a request, or raise
+        HostUnavailable."""
+        with self.lock:
+            state = self.state(host)
+            if state.open_until is not None:
+                if time.time() < state.open_until or state.trying:
+                    raise HostUnavailable(host)
+                # The cooldown is over: let one request try the host
+                state.trying = True
+            return state
+
+    def record(self, host, state, ms, error):
+        with self.lock:
+            state.requests += 1
+            state.total_ms += ms
+            state.max_ms = max(state.max_ms, ms)
+            state.recent_ms.append(ms)
+            state.trying = False
+            if error is None:
+                state.consecutive_failures = 0
+                state.open_until = None
+                return
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = '%s: %s' % (type(error).__name__, error)
+            if state.consecutive_failures >= self.failure_threshold:
+                state.open_until = time.time() + self.cooldown
+                logger().warn('Not fetching from %s for %d seconds after %d '
+                    'failures. Last error: %s' % (host, self.cooldown,
+                    state.consecutive_failures, state.last_error))
+
+    @contextmanager
+    def slot(self, url):
+        """Hold one of the slots of the url's host for a request, timing
+        it. Raises HostUnavailable if the host's circuit is open."""
+        host = get_host(url)
+        state = self.admit(host)
+        state.slots.acquire()
+        start, error = time.time(), None
+        try:
+            yield
+        except FAILURES as e:
+            error = e
+            raise
+        finally:
+            state.slots.release()
+            self.record(host, state, (time.time() - start) * 1000, error)
+
+    def stats(self, size=50):
+        """Get the stats of the hosts that have taken the most time, and of
+        every host whose circuit is open."""
+        now = time.time()
+        with self.lock:
+            hosts = self.hosts.items()
+            slowest = sorted(hosts, key=lambda item: -item[1].total_ms)[:size]
+            shown = dict(slowest)
+            shown.update((host, state) for host, state in hosts
+                if state.open_until is not None)
+            return dict((host, state.snapshot(now))
+                for host, state in shown.items())
+
+
+class HostLimitedAdapter(BaseAdapter):
+    """Sends requests through another adapter, within the limits of a
+    HostScheduler. Requests are timed until their response headers
+    arrive."""
+
+    def __init__(self, adapter, scheduler):
+        super(HostLimitedAdapter, self).__init__()
+        self.adapter = adapter
+        self.scheduler = scheduler
+
+    def send(self, request, **kwargs):
+        with self.scheduler.slot(request.url):
+            return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
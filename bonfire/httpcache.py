@@ -0,0 +1,219 @@
+"""
+HTTP cache for fetched pages, kept on disk under the processor's requests
+session.
+
+Pages served with an ETag or Last-Modified header are stored compressed,
+with their validators, one file per url. Fetching a stored url again sends a
+conditional request, and a 304 Not Modified response is answered with the
+stored page, so the page is neither downloaded again nor, if its fingerprint
+is known, parsed. When the cache grows past its size limit, the least
+recently used pages are deleted.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from . import metrics
+
+CHUNK_SIZE = 16 * 1024
+CACHED_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# Fraction of the size limit to shrink the cache to when it is exceeded
+EVICT_TO = 0.9
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class DiskCache(object):
+    """Stored pages, as files named by the hash of their url. Each file
+    holds a line of JSON metadata followed by the zlib compressed body."""
+
+    def __init__(self, directory, max_bytes):
+        """
+        :arg directory: directory to store pages in, created if missing.
+        :arg max_bytes: size of the stored files to evict pages beyond.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Size and last use of each file, to evict by without listing the
+        # directory again
+        self.files = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            self.files[name] = (stat.st_size, stat.st_mtime)
+        self.size = sum(size for size, used in self.files.values())
+
+    def key(self, url):
+        return hashlib.sha1(url.encode('utf-8')
+            if isinstance(url, unicode) else url).hexdigest()
+
+    def get(self, url):
+        """Get the metadata and body stored for a url, or None."""
+        name = self.key(url)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = zlib.decompress(f.read())
+        except (IOError, OSError, ValueError, zlib.error):
+            return None
+        if meta.get('url') != url:
+            return None
+        self.touch(name)
+        return meta, body
+
+    def touch(self, name):
+        now = time.time()
+        try:
+            os.utime(os.path.join(self.directory, name), (now, now))
+        except OSError:
+            return
+        with self.lock:
+            if name in self.files:
+                self.files[name] = (self.files[name][0], now)
+
+    def set(self, url, meta, body):
+        """Store a page's metadata and body, evicting old pages if the
+        cache is too big."""
+        name = self.key(url)
+        meta = dict(meta, url=url)
+        data = json.dumps(meta) + '\n' + zlib.compress(body)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, os.path.join(self.directory, name))
+        with self.lock:
+            old_size = self.files.get(name, (0, 0))[0]
+            self.files[name] = (len(data), time.time())
+            self.size += len(data) - old_size
+            if self.size > self.max_bytes:
+                self.evict(self.max_bytes * EVICT_TO)
+
+    def evict(self, max_bytes):
+        """Delete the least recently used pages until the cache is no larger
+        than max_bytes. Called with the lock held."""
+        by_use = sorted(self.files.items(), key=lambda item: item[1][1])
+        for name, (size, used) in by_use:
+            if self.size <= max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            del self.files[name]
+            self.size -= size
+            metrics.incr('http_cache.evicted')
+
+
+def validators(headers):
+    """The validators in a response's headers, as a dict."""
+    return dict((name, headers[name]) for name in ('etag', 'last-modified')
+        if headers.get(name))
+
+
+def is_cacheable(response):
+    if response.request.method != 'GET' or response.status_code != 200:
+        return False
+    if 'no-store' in response.headers.get('cache-control', '').lower():
+        return False
+    content_type = response.headers.get('content-type', '')
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type in CACHED_CONTENT_TYPES and \
+        bool(validators(response.headers))
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that stores pages in a DiskCache and revalidates them
+    with conditional requests. A page answered from the cache has the
+    `from_cache` attribute set.
+    """
+
+    def __init__(self, cache, max_body, **kwargs):
+        """
+        :arg cache: DiskCache to store pages in.
+        :arg max_body: size of the largest body to store, in bytes. Bodies
+            are read up to here as they are stored, so it should be no
+            less than the most that will be read of a page anyway.
+        """
+        self.cache = cache
+        self.max_body = max_body
+        super(CachingHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        cached = None
+        if request.method == 'GET':
+            cached = self.cache.get(request.url)
+        if cached is not None:
+            meta, body = cached
+            if 'etag' in meta['validators']:
+                request.headers['If-None-Match'] = meta['validators']['etag']
+            if 'last-modified' in meta['validators']:
+                request.headers['If-Modified-Since'] = \
+                    meta['validators']['last-modified']
+        response = super(CachingHTTPAdapter, self).send(request, **kwargs)
+        response.from_cache = False
+        if cached is not None and response.status_code == 304:
+            metrics.incr('http_cache.revalidated')
+            return self.cached_response(response, meta, body)
+        metrics.incr('http_cache.miss')
+        if is_cacheable(response):
+            self.store(response)
+        return response
+
+    def cached_response(self, response, meta, body):
+        """Turn a 304 response into the stored page, with any headers the
+        304 updated."""
+        headers = CaseInsensitiveDict(meta['headers'])
+        headers.update(response.headers)
+        response.close()
+        response.status_code = meta['status']
+        response.reason = meta['reason']
+        response.headers = headers
+        response._content = body
+        response._content_consumed = True
+        response.from_cache = True
+        if validators(response.headers) != meta['validators']:
+            self.cache.set(response.url, self.metadata(response), body)
+        return response
+
+    def metadata(self, response):
+        return {
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'validators': validators(response.headers),
+        }
+
+    def store(self, response):
+        """Read the body of a response and store it, unless it is longer
+        than max_body. The body read is kept on the response either way."""
+        chunks, length, complete = [], 0, True
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                chunks.append(chunk)
+                length += len(chunk)
+                if length > self.max_body:
+                    complete = False
+                    break
+        finally:
+            response.close()
+        body = ''.join(chunks)
+        response._content = body
+        response._content_consumed = True
+        if complete:
+            self.cache.set(response.url, self.metadata(response), body)
@@ -0,0 +1,116 @@
+"""
+What each field of a universe's index costs.
+
+For every field, reports how it is mapped, the number of terms it indexes
+for documents (`sum_doc_freq`) and positions (`sum_total_term_freq`) from
+Elasticsearch's field stats, and the heap its field data takes, with the
+size of the whole index. A report saved before `bonfire remap` can be
+compared with one taken after.
+"""
+from elasticsearch.exceptions import TransportError
+from .db import es
+
+FIELD_STATS = ('doc_count', 'sum_doc_freq', 'sum_total_term_freq')
+
+
+def field_mode(mapping):
+    """How a field is indexed, e.g. 'analyzed' or 'not_analyzed+doc_values'."""
+    index = mapping.get('index')
+    if index == 'no':
+        mode = 'not indexed'
+    elif mapping.get('type', 'string') == 'string':
+        mode = index or 'analyzed'
+    else:
+        mode = mapping.get('type')
+    if mapping.get('doc_values'):
+        mode += '+doc_values'
+    return mode
+
+
+def field_modes(properties, prefix=''):
+    """Flatten the properties of a mapping into a dict of field paths to
+    how they are indexed."""
+    modes = {}
+    for name, mapping in properties.items():
+        path = prefix + name
+        if mapping.get('enabled') is False:
+            modes[path] = 'not indexed'
+        elif 'properties' in mapping:
+            modes.update(field_modes(mapping['properties'], path + '.'))
+        else:
+            modes[path] = field_mode(mapping)
+    return modes
+
+
+def index_cost(universe):
+    """Get the cost of the universe's index, as a dict with the 'index'
+    totals and the costs of its 'fields'."""
+    client = es(universe)
+    modes = {}
+    for index in client.indices.get_mapping(index=universe).values():
+        for mapping in index['mappings'].values():
+            for path, mode in field_modes(
+                    mapping.get('properties', {})).items():
+                # The same field can be mapped by several doc types
+                modes.setdefault(path, set()).add(mode)
+    stats = client.indices.stats(index=universe,
+        metric='docs,store,segments,fielddata', fielddata_fields='*')
+    total = stats['_all']['total']
+    fielddata = total['fielddata'].get('fields', {})
+    try:
+        field_stats = client.field_stats(index=universe,
+            fields=','.join(sorted(modes)))['indices']['_all']['fields']
+    except TransportError:
+        # Field stats are only in Elasticsearch 1.6 and later
+        field_stats = {}
+    fields = {}
+    for path, path_modes in modes.items():
+        cost = {'mode': '/'.join(sorted(path_modes))}
+        for stat in FIELD_STATS:
+            cost[stat] = field_stats.get(path, {}).get(stat, 0)
+        cost['fielddata_bytes'] = fielddata.get(path, {}).get(
+            'memory_size_in_bytes', 0)
+        fields[path] = cost
+    return {
+        'index': {
+            'docs': total['docs']['count'],
+            'store_bytes': total['store']['size_in_bytes'],
+            'segments_memory_bytes': total['segments']['memory_in_bytes'],
+            'fielddata_bytes': total['fielddata']['memory_size_in_bytes'],
+        },
+        'fields': fields,
+    }
+
+
+def change(before, after):
+    if not before:
+        return ''
+    return '%+.0f%%' % ((after - before) * 100.0 / before)
+
+
+def format_cost(cost, before=None):
+    """Lines of a readable report of an index cost, with the changes from
+    an earlier report if given."""
+    lines = ['%-24s %14s' % ('index', 'now') +
+        (' %14s %8s' % ('before', 'change') if before else '')]
+    for name in sorted(cost['index']):
+        value = cost['index'][name]
+        line = '%-24s %14d' % (name, value)
+        if before:
+            old = before['index'].get(name, 0)
+            line += ' %14d %8s' % (old, change(old, value))
+        lines.append(line)
+    lines.append('')
+    lines.append('%-36s %-28s %14s %14s' % ('field', 'mapping',
+        'sum_doc_freq', 'fielddata'))
+    fields = cost['fields']
+    for path in sorted(fields, key=lambda p: -fields[p]['sum_doc_freq']):
+        field = fields[path]
+        line = '%-36s %-28s %14d %14d' % (path, field['mode'],
+            field['sum_doc_freq'], field['fielddata_bytes'])
+        if before and path in before['fields']:
+            old = before['fields'][path]
+            line += '  was %s %d %d' % (old['mode'], old['sum_doc_freq'],
+                old['fielddata_bytes'])
+        lines.append(line)
+    return lines
@@ -7,6 +7,9 @@ RESULTS_CACHE_MAPPING = {
             'type': 'date',
             'format': ELASTICSEARCH_TIME_FORMAT
         },
+        'cached_at_ms': {
+            'type': 'long'
+        },
         'hours_since': {
             'type': 'integer',
         },
@@ -34,6 +37,9 @@ CACHED_URL_MAPPING = {
         'resolved': {
             'type': 'string',
             'index': 'not_analyzed'
+        },
+        'cached_at_ms': {
+            'type': 'long'
         }
     }
 }
@@ -49,6 +55,9 @@ TOP_CONTENT_MAPPING = {
                 'created': {
                     'type': 'date',
                     'format': ELASTICSEARCH_TIME_FORMAT
+                },
+                'created_ms': {
+                    'type': 'long'
                 }
             }
         }
@@ -90,6 +99,9 @@ TWEET_MAPPING = {
             'type': 'date',
             'format': ELASTICSEARCH_TIME_FORMAT
         },
+        'created_ms': {
+            'type': 'long'
+        },
         'provider': {
             'type': 'string',
             'index': 'not_analyzed'
@@ -113,3 +125,217 @@ UNPROCESSED_TWEET_MAPPING = {
         },
     }
 }
+
+HEARTBEAT_MAPPING = {
+    'properties': {
+        'component': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'beat_ms': {
+            'type': 'long'
+        }
+    }
+}
+
+AUTHORITY_MAPPING = {
+    'properties': {
+        'id': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'friend_ids': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'friends_count': {
+            'type': 'long'
+        },
+        'fetched_ms': {
+            'type': 'long'
+        }
+    }
+}
+
+BUILD_MAPPING = {
+    'properties': {
+        'version': {
+            'type': 'long'
+        }
+    }
+}
+
+FIRST_SEEN_MAPPING = {
+    'properties': {
+        'url': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'first_seen_ms': {
+            'type': 'long'
+        }
+    }
+}
+
+SCORE_STATS_MAPPING = {
+    'properties': {
+        'hours_since': {
+            'type': 'integer'
+        },
+        'weight': {
+            'type': 'double',
+            'index': 'no'
+        },
+        'mean': {
+            'type': 'double',
+            'index': 'no'
+        },
+        'm2': {
+            'type': 'double',
+            'index': 'no'
+        },
+        'updated': {
+            'type': 'double',
+            'index': 'no'
+        }
+    }
+}
+
+FINGERPRINT_MAPPING = {
+    'properties': {
+        'url': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'cached_at_ms': {
+            'type': 'long'
+        }
+    }
+}
+
+# The compact mapping profile, for high-volume universes. Fields that are
+# aggregated, sorted or filtered on keep their values on disk as doc values,
+# rather than in memory as field data. Fields that are only displayed are
+# kept in _source without being indexed, and can't be searched. Full text
+# that is searched stays analyzed.
+COMPACT_CONTENT_MAPPING = {
+    'properties': {
+        'url': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'provider': {
+            'type': 'string',
+            'index': 'not_analyzed',
+            'doc_values': True
+        },
+        'authors': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'img': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'img_h': {
+            'type': 'integer',
+            'index': 'no'
+        },
+        'img_w': {
+            'type': 'integer',
+            'index': 'no'
+        },
+        'player': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'favicon': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'opengraph_type': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'twitter_type': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'twitter_creator': {
+            'type': 'string',
+            'index': 'no'
+        }
+    }
+}
+
+COMPACT_TWEET_MAPPING = {
+    'properties': {
+        'id': {
+            'type': 'string',
+            'index': 'not_analyzed'
+        },
+        'content_url': {
+            'type': 'string',
+            'index': 'not_analyzed',
+            'doc_values': True
+        },
+        'user_id': {
+            'type': 'string',
+            'index': 'not_analyzed',
+            'doc_values': True
+        },
+        'created': {
+            'type': 'date',
+            'format': ELASTICSEARCH_TIME_FORMAT,
+            'doc_values': True
+        },
+        'created_ms': {
+            'type': 'long',
+            'doc_values': True
+        },
+        'provider': {
+            'type': 'string',
+            'index': 'not_analyzed',
+            'doc_values': True
+        },
+        'retweet_count': {
+            'type': 'long',
+            'index': 'no'
+        },
+        'user_name': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'user_screen_name': {
+            'type': 'string',
+            'index': 'no'
+        },
+        'user_profile_image_url': {
+            'type': 'string',
+            'index': 'no'
+        }
+    }
+}
+
+# Cached results are only read back whole, so the results aren't indexed
+COMPACT_RESULTS_CACHE_MAPPING = {
+    'properties': {
+        'cached_at': {
+            'type': 'date',
+            'format': ELASTICSEARCH_TIME_FORMAT,
+            'index': 'no'
+        },
+        'cached_at_ms': {
+            'type': 'long',
+            'doc_values': True
+        },
+        'hours_since': {
+            'type': 'integer',
+            'doc_values': True
+        },
+        'results': {
+            'type': 'object',
+            'enabled': False
+        }
+    }
+}
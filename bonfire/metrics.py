@@ -0,0 +1,272 @@
+"""
+In-process instrumentation for the collector, processor and queries.
+
+Counters, gauges, timers and meters are kept in a registry that can be read
+as JSON from a local HTTP endpoint, and can also be forwarded as they happen
+to a statsd-compatible server over UDP. Both are configured in an optional
+[metrics] section of the config file:
+
+::
+
+    [metrics]
+    http_port=9100
+    statsd_host=localhost
+    statsd_port=8125
+    prefix=bonfire
+
+Timer values are in milliseconds. Counters named `<name>.hit` and
+`<name>.miss` are reported together as a `<name>.hit_ratio`.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from collections import deque
+from functools import wraps
+from .config import get_metrics_config
+
+RESERVOIR_SIZE = 1024
+METER_WINDOW = 60
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list of values."""
+    if not values:
+        return None
+    rank = int(round(p / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+
+class Timer(object):
+    """Timing statistics, with percentiles over the most recent values."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.recent = deque([], RESERVOIR_SIZE)
+
+    def update(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': percentile(recent, 50),
+            'p99': percentile(recent, 99),
+        }
+
+
+class Meter(object):
+    """Event count with a rate per second over the last minute."""
+
+    def __init__(self):
+        self.count = 0
+        self.started = time.time()
+        self.seconds = deque([], METER_WINDOW)
+
+    def mark(self, n=1):
+        self.count += n
+        second = int(time.time())
+        if self.seconds and self.seconds[-1][0] == second:
+            self.seconds[-1][1] += n
+        else:
+            self.seconds.append([second, n])
+
+    def rate(self):
+        now = time.time()
+        window = max(min(METER_WINDOW, now - self.started), 1)
+        return float(sum(n for second, n in self.seconds
+            if second > now - METER_WINDOW)) / window
+
+    def snapshot(self):
+        return {'count': self.count, 'rate': self.rate()}
+
+
+class StatsdClient(object):
+    """Fire-and-forget statsd UDP client."""
+
+    def __init__(self, host, port=8125, prefix='bonfire'):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, name, value, kind):
+        stat = '%s.%s:%s|%s' % (self.prefix, name, value, kind)
+        try:
+            self.socket.sendto(stat, self.address)
+        except socket.error:
+            pass
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.statsd = None
+        self.sources = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.timers = {}
+            self.meters = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.statsd:
+            self.statsd.send(name, value, 'c')
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+        if self.statsd:
+            self.statsd.send(name, value, 'g')
+
+    def timing(self, name, ms):
+        with self._lock:
+            self.timers.setdefault(name, Timer()).update(ms)
+        if self.statsd:
+            self.statsd.send(name, '%.3f' % ms, 'ms')
+
+    def mark(self, name, n=1):
+        with self._lock:
+            self.meters.setdefault(name, Meter()).mark(n)
+        if self.statsd:
+            self.statsd.send(name, n, 'c')
+
+    def add_source(self, name, f):
+        """Include the result of calling f in snapshots, under name."""
+        self.sources[name] = f
+
+    def snapshot(self):
+        extra = dict((name, f()) for name, f in self.sources.items())
+        with self._lock:
+            counters = dict(self.counters)
+            for name in counters.keys():
+                if name.endswith('.hit'):
+                    base = name[:-len('.hit')]
+                    hits = counters[name]
+                    total = hits + counters.get(base + '.miss', 0)
+                    counters[base + '.hit_ratio'] = float(hits) / total
+            return dict({
+                'counters': counters,
+                'gauges': dict(self.gauges),
+                'timers': dict((k, v.snapshot())
+                    for k, v in self.timers.items()),
+                'meters': dict((k, v.snapshot())
+                    for k, v in self.meters.items()),
+            }, **extra)
+
+
+registry = Registry()
+incr = registry.incr
+gauge = registry.gauge
+timing = registry.timing
+mark = registry.mark
+add_source = registry.add_source
+snapshot = registry.snapshot
+
+
+class timed(object):
+    """
+    Time a block or a function into a timer. As a decorator with no name,
+    the timer is named for the function's module and name, e.g.
+    `db.get_items`.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        timing(self.name, (time.time() - self.start) * 1000)
+
+    def __call__(self, f):
+        name = self.name or '%s.%s' % (f.__module__.split('.')[-1],
+            f.__name__)
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return f(*args, **kwargs)
+        return wrapper
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = json.dumps(snapshot(), indent=2, sort_keys=True)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger().debug(format % args)
+
+
+def serve_http(port, host='127.0.0.1'):
+    """Serve the metrics snapshot as JSON from a background thread."""
+    server = HTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+_configured = False
+def configure(http_port=None, ports=1):
+    """
+    Start the exporters set up in the [metrics] config section.
+    Only has an effect the first time it is called in a process.
+
+    :arg http_port: port to serve metrics on, instead of the configured
+        http_port. Each process on a host needs its own.
+    :arg ports: number of ports from the http port on to try, serving on
+        the first free one, e.g. one for each of several workers.
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    conf = get_metrics_config()
+    if conf.get('statsd_host'):
+        registry.statsd = StatsdClient(conf['statsd_host'],
+            conf.get('statsd_port') or 8125,
+            conf.get('prefix') or 'bonfire')
+    http_port = http_port or conf.get('http_port')
+    if http_port:
+        http_port = int(http_port)
+        for port in range(http_port, http_port + ports):
+            try:
+                serve_http(port)
+            except socket.error as e:
+                error = e
+            else:
+                logger().info('Serving metrics on port %d' % port)
+                return
+        logger().warn('Could not serve metrics on port %s: %s' % (
+            http_port if ports == 1 else
+            '%d-%d' % (http_port, http_port + ports - 1), error))
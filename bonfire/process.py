@@ -4,34 +4,118 @@ from collections import deque
 import requests
 from elasticsearch.exceptions import ConnectionError, TransportError
 from .db import build_universe_mappings, next_unprocessed_tweet, \
-                save_tweet, save_content, get_cached_url, set_cached_url
-from .content import extract
-from .dates import get_since_now
+                save_tweet, save_content, get_cached_url, set_cached_url, \
+                get_fingerprint_url, set_fingerprint_url, get_queue_depth, \
+                get_tweeted_urls
+from .charset import decode_html
+from .content import extract, html_fingerprint, declared_url, is_copy_of
+from .config import get_max_content_length, get_http_cache, maybe_reload
+from .dates import get_since_now, datestring_to_epoch
+from .health import Heartbeat
+from .hosts import HostLimitedAdapter, HostScheduler, HostUnavailable
+from .httpcache import CachingHTTPAdapter, DiskCache
+from .urls import normalize_url
+from . import metrics
 
 USER_AGENT = 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+CHUNK_SIZE = 16 * 1024
+QUEUE_DEPTH_INTERVAL = 30
+
+# Shared by every session, so that a host's circuit outlasts a session
+host_scheduler = HostScheduler()
 
 def logger():
     return logging.getLogger(__name__)
 
 
-def create_session():
-    """Create a requests session optimized for many connections."""
+def create_session(cache=None, max_body=None, hosts=None):
+    """Create a requests session optimized for many connections.
+
+    :arg cache: httpcache.DiskCache to keep fetched pages in, if any.
+    :arg max_body: size of the largest page to cache, in bytes.
+    :arg hosts: hosts.HostScheduler to limit requests to each host with,
+        if any.
+    """
     session = requests.Session()
     session.headers['User-Agent'] = USER_AGENT
     session.max_redirects = 5
-    http_adapter = requests.adapters.HTTPAdapter()
-    https_adapter = requests.adapters.HTTPAdapter()
+    if cache is not None:
+        http_adapter = CachingHTTPAdapter(cache, max_body)
+        https_adapter = CachingHTTPAdapter(cache, max_body)
+    else:
+        http_adapter = requests.adapters.HTTPAdapter()
+        https_adapter = requests.adapters.HTTPAdapter()
     http_adapter.pool_connections = 20
     http_adapter.pool_maxsize = 20
     http_adapter.max_retries = 1
     https_adapter.pool_connections = 20
     https_adapter.pool_maxsize = 20
     https_adapter.max_retries = 1
+    if hosts is not None:
+        http_adapter = HostLimitedAdapter(http_adapter, hosts)
+        https_adapter = HostLimitedAdapter(https_adapter, hosts)
     session.mount('http://', http_adapter)
     session.mount('https://', https_adapter)
     return session
 
 
+def create_universe_session(universe):
+    """Create a session for fetching a universe's pages, within the
+    process's per-host limits, and caching them if the universe has an
+    `http_cache_dir`."""
+    metrics.add_source('hosts', host_scheduler.stats)
+    http_cache = get_http_cache(universe)
+    if http_cache is None:
+        return create_session(hosts=host_scheduler)
+    directory, size = http_cache
+    return create_session(cache=DiskCache(directory, size),
+        max_body=get_max_content_length(universe), hosts=host_scheduler)
+
+
+class UnsupportedContentType(Exception): pass
+
+
+def is_success(response):
+    return 200 <= response.status_code < 300
+
+
+def fetch_html(session, url, max_length, timeout=7):
+    """
+    Stream the HTML body of a URL, reading no more than max_length bytes.
+    Anything but HTML is rejected from the headers before the body is read.
+    The document head is at the start of the body, so a truncated page still
+    carries its meta tags. The body is decoded as described in `charset`.
+    Returns a tuple of (response, html).
+
+    :arg session: requests session to fetch with.
+    :arg max_length: maximum number of bytes to read from the body.
+    :arg timeout: seconds to wait for the server to respond.
+    """
+    start = time.time()
+    response = session.get(url, timeout=timeout, stream=True)
+    try:
+        content_type = response.headers.get('content-type', '')
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise UnsupportedContentType(content_type)
+        chunks, length = [], 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            length += len(chunk)
+            if length >= max_length:
+                logger().debug('Truncated %s at %d bytes' % (
+                    response.url, max_length))
+                break
+    finally:
+        response.close()
+        metrics.timing('process.fetch', (time.time() - start) * 1000)
+    body = ''.join(chunks)[:max_length]
+    html, source = decode_html(body, response.headers.get('content-type'))
+    metrics.incr('charset.%s' % source)
+    return response, html
+
+
 def process_universe_rawtweets(universe, build_mappings=True):
     """
     Take all unprocessed tweets in given universe, extract and process their
@@ -42,9 +126,16 @@ def process_universe_rawtweets(universe, build_mappings=True):
         logger().info('Building the universe.')
         build_universe_mappings(universe)
     recent_tweets = deque([], 5)
-    session = create_session()
+    session = create_universe_session(universe)
+    queue_depth_checked = 0
+    heartbeat = Heartbeat(universe, 'processor')
     while True:
         try:
+            heartbeat.beat()
+            maybe_reload()
+            if time.time() - queue_depth_checked > QUEUE_DEPTH_INTERVAL:
+                metrics.gauge('process.queue_depth', get_queue_depth(universe))
+                queue_depth_checked = time.time()
             logger().debug('Looking for new tweet.')
             raw_tweet = next_unprocessed_tweet(universe, not_ids=list(recent_tweets))
             if raw_tweet:
@@ -53,11 +144,13 @@ def process_universe_rawtweets(universe, build_mappings=True):
                     raw_tweet.created_at, 'second', stringify=False)[0]
                 logger().debug(
                     'New tweet %d seconds ago. Processing.' % seconds_ago)
+                metrics.gauge('process.lag', seconds_ago)
                 if seconds_ago > 300:
                     logger().warn(
                         'Processor is %d seconds behind collector.' % \
                         seconds_ago)
                 process_rawtweet(universe, raw_tweet, session=session)
+                metrics.mark('process.tweets')
             else:
                 session.close()
                 logger().debug('No new tweet. Waiting.')
@@ -80,53 +173,84 @@ def process_rawtweet(universe, raw_tweet, session=None):
     then save as a processed tweet.
     """
     if session is None:
-        session = create_session()
+        session = create_universe_session(universe)
+    max_length = get_max_content_length(universe)
     # First extract content
     urls = [u['expanded_url'] for u in raw_tweet.entities['urls']]
     for url in urls:
         # Is ths url in our cache?
         resolved_url = get_cached_url(universe, url)
+        metrics.incr('url_cache.miss' if resolved_url is None else 'url_cache.hit')
         if resolved_url is None:
             # No-- go extract it
             try:
-                response = session.get(url, timeout=7)
+                response, html = fetch_html(session, url, max_length)
+                redirect_urls = [r.url for r in response.history]
+            except UnsupportedContentType as e:
+                logger().debug('Skipping url %s with content type %s' % (
+                    url, e))
+                continue
+            except HostUnavailable as e:
+                logger().debug('Skipping url %s on unavailable host %s' % (
+                    url, e))
+                metrics.incr('process.host_unavailable')
+                continue
             except Exception as e:
                 logger().info("Failed to access url %s due to %s, message %s" % (
                     url, e, e.message))
                 continue
-            try:
-                article = extract(response.url, html=response.text)
-            except requests.exceptions.Timeout:
-                continue
-            except requests.exceptions.TooManyRedirects:
-                continue
-            except requests.exceptions.ConnectionError:
-                continue
-            except requests.exceptions.HTTPError:
-                continue
-            except RuntimeError as e:
-                # Not sure why this recursion error is happening
-                if e.message == 'maximum recursion depth exceeded':
-                    response.connection.close()
+            # Copies of a page under other urls have the same fingerprint,
+            # and declare the same url as their own
+            fingerprint = None
+            if is_success(response) and declared_url(html, response.url):
+                fingerprint = html_fingerprint(html)
+                resolved_url = get_fingerprint_url(universe, fingerprint)
+                if resolved_url is not None and \
+                        not is_copy_of(html, resolved_url, response.url):
+                    metrics.incr('fingerprint.rejected')
+                    resolved_url = None
+                metrics.incr('fingerprint.miss' if resolved_url is None
+                    else 'fingerprint.hit')
+            if resolved_url is None:
+                try:
+                    article = extract(response.url, html=html,
+                        resolved_url=response.url, redirect_urls=redirect_urls)
+                except requests.exceptions.Timeout:
+                    continue
+                except requests.exceptions.TooManyRedirects:
+                    continue
+                except requests.exceptions.ConnectionError:
                     continue
-                else:
+                except requests.exceptions.HTTPError:
+                    continue
+                except RuntimeError as e:
+                    # Not sure why this recursion error is happening
+                    if e.message == 'maximum recursion depth exceeded':
+                        response.connection.close()
+                        continue
+                    else:
+                        logger().info("Failed to process url %s due to %s, message %s" % (
+                            url, e, e.message))
+                        continue
+                except Exception as e:
                     logger().info("Failed to process url %s due to %s, message %s" % (
                         url, e, e.message))
+                    response.connection.close()
                     continue
-            except Exception as e:
-                logger().info("Failed to process url %s due to %s, message %s" % (
-                    url, e, e.message))
-                response.connection.close()
-                continue
-            resolved_url = article['url']
-            # Add it to the URL cache and save it
-            set_cached_url(universe, url, resolved_url)
-            save_content(universe, article)
+                resolved_url = article['url']
+                save_content(universe, article)
+                if fingerprint is not None:
+                    set_fingerprint_url(universe, fingerprint, resolved_url)
+            # Add it, and every url that redirected to it, to the URL cache
+            cached_urls = [url, response.url] + redirect_urls
+            for cached_url in set(map(normalize_url, cached_urls)):
+                set_cached_url(universe, cached_url, resolved_url)
 
     tweet = {
         'id': raw_tweet.id_str,
         'text': raw_tweet.text,
         'created': raw_tweet.created_at,
+        'created_ms': datestring_to_epoch(raw_tweet.created_at),
         'retweet_count': raw_tweet.retweet_count,
         #'retweeted_status': raw_tweet.retweeted_status,
         'user_id': raw_tweet.user['id_str'],
@@ -135,5 +259,44 @@ def process_rawtweet(universe, raw_tweet, session=None):
         'user_profile_image_url': raw_tweet.user['profile_image_url']
     }
     # Add the resolved URL from the extracted content. Only adds tweet's LAST URL.
-    tweet['content_url'] = resolved_url
+    tweet['content_url'] = normalize_url(resolved_url)
     save_tweet(universe, tweet)
+
+
+def refresh_content(universe, hours=24, session=None):
+    """
+    Fetch the pages of the content tweeted in the last hours again, and
+    extract the ones that have changed. With an HTTP cache, an unchanged
+    page costs a 304 Not Modified response and no parsing. Returns the
+    numbers of pages 'refreshed', 'unchanged' and 'failed'.
+    """
+    if session is None:
+        session = create_universe_session(universe)
+    max_length = get_max_content_length(universe)
+    counts = {'refreshed': 0, 'unchanged': 0, 'failed': 0}
+    for url in get_tweeted_urls(universe, hours=hours):
+        try:
+            response, html = fetch_html(session, url, max_length)
+            if not is_success(response):
+                counts['failed'] += 1
+                continue
+            fingerprint = html_fingerprint(html)
+            if getattr(response, 'from_cache', False) or \
+                    get_fingerprint_url(universe, fingerprint) == url:
+                counts['unchanged'] += 1
+                continue
+            article = extract(response.url, html=html,
+                resolved_url=response.url,
+                redirect_urls=[r.url for r in response.history])
+        except Exception as e:
+            logger().info("Failed to refresh url %s due to %s, message %s" % (
+                url, e, e.message))
+            counts['failed'] += 1
+            continue
+        # Keep the content where its tweets point
+        article['url'] = url
+        save_content(universe, article)
+        set_fingerprint_url(universe, fingerprint, url)
+        counts['refreshed'] += 1
+    session.close()
+    return counts
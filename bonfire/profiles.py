@@ -0,0 +1,112 @@
+"""
+Profiles of providers, learned from the pages extracted from them.
+
+Most pages come from a handful of providers, whose pages share a layout. A
+profile records the CSS selector of the container that held the article
+text on the provider's pages, once CONFIRMATIONS pages in a row agree on it,
+and the provider's favicon. The extractor tries the selector first, and only
+scores every paragraph's parent on the page when it doesn't match. After
+MAX_MISSES misses in a row the selector is forgotten and learned again.
+"""
+import re
+import threading
+from collections import OrderedDict
+from .urls import get_host
+
+MAX_PROFILES = 1000
+CONFIRMATIONS = 2
+MAX_MISSES = 2
+SELECTOR_DEPTH = 3
+# Ids and classes with digits in them tend to be different on every page
+STABLE_NAME = re.compile(r'^[A-Za-z_-]+$')
+UNSELECTABLE = (None, '[document]', 'html', 'body')
+
+
+def provider_host(url):
+    """The host of a url without www, which profiles are kept by."""
+    host = get_host(url)
+    return host[4:] if host.startswith('www.') else host
+
+
+def node_selector(node, depth=SELECTOR_DEPTH):
+    """
+    A CSS selector for a BeautifulSoup node that should find the same node
+    on other pages with the same layout: its tag with a stable id or classes,
+    under up to depth - 1 of its ancestors if it has neither. Returns None if
+    there is no such selector.
+    """
+    parts = []
+    while node is not None and node.name not in UNSELECTABLE \
+            and len(parts) < depth:
+        node_id = node.get('id')
+        if node_id and STABLE_NAME.match(node_id):
+            parts.insert(0, '%s#%s' % (node.name, node_id))
+            return ' > '.join(parts)
+        classes = [c for c in node.get('class') or [] if STABLE_NAME.match(c)]
+        if classes:
+            parts.insert(0, node.name + ''.join('.' + c for c in classes))
+            return ' > '.join(parts)
+        parts.insert(0, node.name)
+        node = node.parent
+    return None
+
+
+class ProviderProfile(object):
+
+    def __init__(self):
+        self.selector = None
+        self.misses = 0
+        self.candidate = None
+        self.confirmations = 0
+        self.favicon = None
+
+
+class ProfileCache(object):
+    """Profiles of the most recently seen providers."""
+
+    def __init__(self, size=MAX_PROFILES):
+        self.size = size
+        self.profiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, host):
+        """Get the profile of a provider, or None."""
+        with self.lock:
+            profile = self.profiles.pop(host, None)
+            if profile is not None:
+                self.profiles[host] = profile
+            return profile
+
+    def learn(self, host, selector=None, matched=None, favicon=None):
+        """
+        Update a provider's profile from a page extracted from it.
+
+        :arg selector: selector of the page's article container, if any.
+        :arg matched: whether the profile's selector found the container,
+            or None if it wasn't tried.
+        :arg favicon: favicon url given by the page, if any.
+        """
+        with self.lock:
+            profile = self.profiles.pop(host, None) or ProviderProfile()
+            if len(self.profiles) >= self.size:
+                self.profiles.popitem(last=False)
+            self.profiles[host] = profile
+            if favicon:
+                profile.favicon = favicon
+            if matched:
+                profile.misses = 0
+                return
+            if matched is False:
+                profile.misses += 1
+                if profile.misses < MAX_MISSES:
+                    return
+                profile.selector = None
+                profile.misses = 0
+            if selector is None:
+                profile.candidate, profile.confirmations = None, 0
+            elif selector == profile.candidate:
+                profile.confirmations += 1
+            else:
+                profile.candidate, profile.confirmations = selector, 1
+            if profile.confirmations >= CONFIRMATIONS:
+                profile.selector = selector
@@ -0,0 +1,69 @@
+"""
+Running statistics of link scores, for detecting top links.
+
+Scores are summarized with a weighted version of Welford's online mean and
+variance, where older scores lose weight exponentially with time: a score
+counts half as much after each half life. This keeps the statistics in a few
+numbers, tracking what recent scores look like, without rereading them.
+"""
+import math
+import time
+
+
+class DecayingStats(object):
+
+    def __init__(self, half_life, weight=0.0, mean=0.0, m2=0.0,
+                 updated=None):
+        """
+        :arg half_life: seconds for the weight of a score to halve.
+        :arg weight: total weight of the scores seen, which is their number
+            if none has decayed.
+        :arg mean: weighted mean of the scores.
+        :arg m2: weighted sum of squared differences from the mean.
+        :arg updated: unix time of the last update.
+        """
+        self.half_life = half_life
+        self.weight = weight
+        self.mean = mean
+        self.m2 = m2
+        self.updated = updated
+
+    def decay(self, now):
+        if self.updated is not None and now > self.updated:
+            factor = 0.5 ** ((now - self.updated) / float(self.half_life))
+            self.weight *= factor
+            self.m2 *= factor
+        self.updated = now
+
+    def update(self, value, now=None):
+        """Add a score, after decaying the weight of previous ones."""
+        self.decay(time.time() if now is None else now)
+        self.weight += 1.0
+        delta = value - self.mean
+        self.mean += delta / self.weight
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / self.weight if self.weight else 0.0
+
+    @property
+    def std_deviation(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+    def cutoff(self, deviations=2):
+        """Score that is the given number of standard deviations above the
+        mean."""
+        return self.mean + deviations * self.std_deviation
+
+    def to_dict(self):
+        return {
+            'weight': self.weight,
+            'mean': self.mean,
+            'm2': self.m2,
+            'updated': self.updated,
+        }
+
+    @classmethod
+    def from_dict(cls, half_life, d):
+        return cls(half_life, d['weight'], d['mean'], d['m2'], d['updated'])
@@ -3,7 +3,9 @@ import logging
 from elasticsearch.exceptions import ConnectionError, TransportError
 from birdy.twitter import UserClient, StreamClient
 from . import config
+from . import metrics
 from .db import get_user_ids, enqueue_tweet
+from .health import Heartbeat
 
 
 def logger():
@@ -51,21 +53,41 @@ def get_friends(universe, user_id):
         user_id=user_id, stringify_ids=True).data.ids
 
 
+def stream_tweets(response, heartbeat):
+    """
+    Tweets from a birdy streaming response, beating the heartbeat on every
+    line received. Twitter sends a blank keep-alive line every 30 seconds,
+    so a quiet stream keeps beating and isn't mistaken for a stall, while
+    a stream that stops sending anything stops beating.
+    """
+    # birdy reads the lines from here and drops the blank ones
+    lines = response._stream_iter
+    def beating_lines():
+        for line in lines():
+            heartbeat.beat()
+            yield line
+    response._stream_iter = beating_lines
+    return response.stream()
+
+
 def collect_seeded_universe_tweets(universe):
     """Connects to the streaming API and enqueues tweets from universe users.
     Limited to the top 5000 users by API limitation."""
     client = stream_client(universe)
+    heartbeat = Heartbeat(universe, 'collector')
     try:
         users = set(get_user_ids(universe, size=5000))
         logger().info('Connecting to universe %s with %d users' % (
             universe, len(users)))
         response = client.stream.statuses.filter.post(follow=','.join(users))
-        for tweet in response.stream():
+        for tweet in stream_tweets(response, heartbeat):
+            config.maybe_reload()
             if 'entities' in tweet \
                     and tweet['entities']['urls'] \
                     and tweet['user']['id_str'] in users:
                 logger().debug('Enqueuing new tweet %s' % tweet['id_str'])
                 enqueue_tweet(universe, tweet)
+                metrics.mark('collect.tweets')
     except (ConnectionError, TransportError) as err:
         logger().warn(
             "Collector's connection to Elasticsearch failed: %s %s. Retrying." % 
@@ -77,7 +99,10 @@ def collect_seeded_universe_tweets(universe):
 def collect_list_universe_tweets(universe):
     since_id = 0
     client_ = client(universe)
+    heartbeat = Heartbeat(universe, 'collector')
     while True:
+        heartbeat.beat()
+        config.maybe_reload()
         logger().debug('Checking for %s list update since ID: %d' % (
             universe, since_id))
         kw = config.get_list_config(universe)
@@ -91,6 +116,7 @@ def collect_list_universe_tweets(universe):
             if 'entities' in tweet and tweet['entities']['urls']:
                 logger().debug('Enqueuing new tweet %s' % tweet['id_str'])
                 enqueue_tweet(universe, tweet)
+                metrics.mark('collect.tweets')
                 if tweet['id'] > since_id:
                     since_id = tweet['id']
         time.sleep(10)  # 10 seconds seems reasonable -- this should only use
@@ -101,7 +127,7 @@ class UnsupportedUniverseType(Exception): pass
 
 
 def collect_universe_tweets(universe): 
-    type_ = config.get('universe:%s' % universe, 'type', default='seeded')
+    type_ = config.universe_config(universe).type
     if type_ == 'seeded':
         collect_seeded_universe_tweets(universe)
     elif type_ == 'list':
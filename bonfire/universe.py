@@ -1,23 +1,41 @@
+import logging
 import os
 import sys
+import time
 from collections import Counter
-from .twitter import lookup_users, get_friends, tweet_link
+from elasticsearch.exceptions import ConnectionError, TransportError
 from .db import (
     build_universe_mappings,
     get_user_ids,
     save_user,
+    save_user_weights,
     delete_user,
-    get_items,
-    get_top_link,
-    add_to_top_links,
-    add_to_results_cache,
-    cleanup )
-from .config import get_universe_seed
+    delete_users,
+    get_authorities,
+    save_authority,
+    delete_authority,
+    save_build_version,
+    get_items_by_hours,
+    watch_top_links,
+    add_all_to_results_cache,
+    cleanup,
+    TOP_LINK_HOURS )
+from .config import (
+    get_universe_seed,
+    get_authority_refresh_hours,
+    get_cache_interval,
+    maybe_reload)
+from .dates import now_epoch, MINUTE_MS
+from . import metrics
 
 CACHE_HOURS = (4, 24, 168)
 
 
-def build_universe(universe, build_mappings=True):
+def logger():
+    return logging.getLogger(__name__)
+
+
+def build_universe(universe, build_mappings=True, incremental=False):
     """Expand the universe from the seed user list in the universe file.
     Should only be called once every 15 minutes.
 
@@ -27,24 +45,33 @@ def build_universe(universe, build_mappings=True):
     limit is 15 calls per 15 minutes, and we need an extra call for
     the initial request for seed user IDs. If we want a seed > 14, we will
     need to be sure not to exceed 15 hits/15 min.
+
+    :arg incremental: only refetch the friends of authorities whose friend
+        count changed, or that were last fetched more than
+        `authority_refresh_hours` ago, and only write users whose weight
+        changed. Falls back to a full build if no authorities are stored.
+
+    Returns a dict with the number of authorities whose friends were
+    fetched, and of users updated and deleted.
     """
+    # Twitter is imported here so that caching doesn't need to load it
+    from .twitter import lookup_users, get_friends
     if build_mappings:
         build_universe_mappings(universe)
     seed_usernames = get_universe_seed(universe)
 
     authorities = lookup_users(universe, seed_usernames[:14])
+    stored = get_authorities(universe)
+    if incremental and stored:
+        return update_universe(universe, authorities, stored)
     authorities_ids = set([a.id_str for a in authorities])
-    # Make a flat list of all the authorities and their friends for tallying weights
-    all_citizens = list(authorities_ids) + [item for sublist in
-        [get_friends(universe, authority_id) for authority_id in authorities_ids]
-        for item in sublist]
+    friends = dict((authority_id, get_friends(universe, authority_id))
+        for authority_id in authorities_ids)
 
     # Now run the weight tally
     # Weight is determined by the percentage of authorities who follow the user
-    counter = Counter()
-    for citizen_id in all_citizens:
-        counter[citizen_id] += 1
-    for citizen_id, num_follows in counter.items():
+    weights = tally_weights(friends)
+    for citizen_id, weight in weights.items():
         if citizen_id in authorities_ids:
             # we want to save the full user object since we have it
             user = filter(lambda a: a.id_str == citizen_id, authorities)[0]
@@ -54,30 +81,147 @@ def build_universe(universe, build_mappings=True):
         else:
             user = {'id': citizen_id}
 
-        user['weight'] = float(num_follows) / float(len(authorities_ids))
+        user['weight'] = weight
         save_user(universe, user)
 
     # Clean up any users that used to be in the universe.
-    obsolete_users = set(get_user_ids(universe)) - set(all_citizens)
+    obsolete_users = set(get_user_ids(universe)) - set(weights)
     for user in obsolete_users:
         delete_user(universe, user)
 
+    # Store each authority's friends for the next incremental build
+    for authority in authorities:
+        save_authority(universe, authority.id_str, friends[authority.id_str],
+            authority.friends_count)
+    for authority_id in set(stored) - authorities_ids:
+        delete_authority(universe, authority_id)
+    save_build_version(universe)
+    return {
+        'fetched': len(authorities_ids),
+        'updated': len(weights),
+        'deleted': len(obsolete_users)
+    }
+
+
+def tally_weights(friends):
+    """
+    Weigh each user in the universe by the fraction of authorities who follow
+    them. Authorities count as following themselves.
+
+    :arg friends: dict of each authority's id to the ids of their friends.
+    """
+    counter = Counter()
+    for authority_id, friend_ids in friends.items():
+        counter[authority_id] += 1
+        for friend_id in friend_ids:
+            counter[friend_id] += 1
+    return dict((citizen_id, float(num_follows) / float(len(friends)))
+        for citizen_id, num_follows in counter.items())
+
+
+def weight_changes(old_weights, new_weights):
+    """Compare two weight tallies. Returns a dict of the users whose weight
+    is new or changed, and a set of the users no longer in the universe."""
+    changed = dict((citizen_id, weight) for citizen_id, weight in
+        new_weights.items() if old_weights.get(citizen_id) != weight)
+    removed = set(old_weights) - set(new_weights)
+    return changed, removed
+
+
+def update_universe(universe, authorities, stored):
+    """
+    Incrementally rebuild the universe from its stored authorities. Only
+    authorities whose friend count changed, or that are due for a refresh,
+    have their friends fetched, and only users whose weight changed are
+    written.
+
+    :arg authorities: current authority users, looked up from the seed.
+    :arg stored: stored authority documents keyed by id, with the friend
+        ids of each as of the last build.
+    """
+    from .twitter import get_friends
+    refresh_ms = get_authority_refresh_hours(universe) * 60 * MINUTE_MS
+    old_friends = dict((authority_id, set(authority['friend_ids']))
+        for authority_id, authority in stored.items())
+    new_friends = {}
+    fetched = []
+    for authority in authorities:
+        authority_id = authority.id_str
+        known = stored.get(authority_id)
+        if known is None \
+                or known['friends_count'] != authority.friends_count \
+                or now_epoch() - known['fetched_ms'] > refresh_ms:
+            new_friends[authority_id] = set(
+                get_friends(universe, authority_id))
+            fetched.append(authority)
+        else:
+            new_friends[authority_id] = old_friends[authority_id]
+
+    changed, removed = weight_changes(
+        tally_weights(old_friends), tally_weights(new_friends))
+    authorities_by_id = dict((a.id_str, a) for a in authorities)
+    users = []
+    for citizen_id, weight in changed.items():
+        if citizen_id in authorities_by_id:
+            user = dict(authorities_by_id[citizen_id])
+            user['id'] = user['id_str']
+        else:
+            user = {'id': citizen_id}
+        user['weight'] = weight
+        users.append(user)
+    save_user_weights(universe, users)
+    delete_users(universe, removed)
+
+    # Only store new friends once the users are written, so that an
+    # interrupted build is picked up again next time
+    for authority in fetched:
+        save_authority(universe, authority.id_str,
+            new_friends[authority.id_str], authority.friends_count)
+    for authority_id in set(stored) - set(new_friends):
+        delete_authority(universe, authority_id)
+    if users or removed:
+        save_build_version(universe)
+    return {
+        'fetched': len(fetched),
+        'updated': len(users),
+        'deleted': len(removed)
+    }
+
 
 def cleanup_universe(universe, days=30):
     cleanup(universe, days=days)
 
 
 def cache_queries(universe, top_links=False, tweet=False):
-    for hours in CACHE_HOURS:
-        results = get_items(universe, hours=hours)
-        add_to_results_cache(universe, hours, results)
+    """Cache the results of every CACHE_HOURS window, computed together.
+    With top_links, a new top link is added as soon as the last
+    TOP_LINK_HOURS are scored, and tweeted too with tweet."""
     if top_links:
-        update_top_links(universe, tweet=tweet)
+        watch_top_links(universe, tweet_top_link if tweet else None)
+    results = get_items_by_hours(universe, CACHE_HOURS)
+    add_all_to_results_cache(universe, results)
+
+
+def cache_queries_forever(universe, interval=None, top_links=False,
+                          tweet=False):
+    """Cache queries every interval seconds, or every `cache_interval` in
+    the universe's config, as it is when each run ends. Elasticsearch
+    connection errors are logged and retried on the next run."""
+    logger().info('Caching universe %s' % universe)
+    while True:
+        maybe_reload()
+        started = time.time()
+        try:
+            cache_queries(universe, top_links=top_links, tweet=tweet)
+            metrics.mark('cache.runs')
+        except (ConnectionError, TransportError) as err:
+            logger().warn(
+                "Cache's connection to Elasticsearch failed: %s %s. "
+                "Retrying." % (type(err), err))
+        seconds = interval or get_cache_interval(universe)
+        time.sleep(max(seconds - (time.time() - started), 0))
 
 
-def update_top_links(universe, tweet=False):
-    top_link = get_top_link(universe)
-    if top_link is not None:
-        add_to_top_links(universe, top_link)
-        if tweet:
-            tweet_link(universe, top_link)
+def tweet_top_link(universe, link):
+    from .twitter import tweet_link
+    tweet_link(universe, link)
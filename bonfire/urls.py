@@ -0,0 +1,177 @@
+"""
+URL canonicalization: short-url domain matching, tracking parameter
+stripping, and scheme/host normalization. URLs are normalized before they
+are used as URL cache keys, content ids and tweet content urls, so variants
+of the same link share a single document.
+"""
+from urlparse import urlsplit, urlunsplit
+
+# Known url shortening domains.
+# Newspaper sometimes assumes that shortened domains are canonical, so this
+# list is here to catch any that shouldn't be included.
+SHORT_URLS = set((
+    '0rz.tw', '1link.in', '1url.com', '2.gp', '2big.at', '2tu.us', '3.ly',
+    '307.to', '4ms.me', '4sq.com', '4url.cc', '6url.com', '7.ly', 'a.gg', 
+    'a.nf', 'aa.cx', 'abcurl.net', 'ad.vu', 'adf.ly', 'adjix.com', 'afx.cc', 
+    'all.fuseurl.com', 'alturl.com', 'amzn.to', 'ar.gy', 'arst.ch', 'atu.ca', 
+    'azc.cc', 'b23.ru', 'b2l.me', 'bacn.me', 'bcool.bz', 'binged.it', 
+    'bit.ly', 'bizj.us', 'bloat.me', 'bravo.ly', 'bsa.ly', 'budurl.com', 
+    'canurl.com', 'chilp.it', 'chzb.gr', 'cl.lk', 'cl.ly', 'clck.ru', 
+    'cli.gs', 'cliccami.info', 'clickthru.ca', 'clop.in', 'conta.cc', 
+    'cort.as', 'cot.ag', 'crks.me', 'ctvr.us', 'cutt.us', 'dai.ly', 
+    'decenturl.com', 'dfl8.me', 'digbig.com', 'digg.com', 'disq.us', 'dld.bz',
+    'dlvr.it', 'do.my', 'doiop.com', 'dopen.us', 'easyuri.com', 'easyurl.net',
+    'eepurl.com', 'eweri.com', 'fa.by', 'fav.me', 'fb.me', 'fbshare.me', 
+    'ff.im', 'fff.to', 'fire.to', 'firsturl.de', 'firsturl.net', 'flic.kr', 
+    'flq.us', 'fly2.ws', 'fon.gs', 'freak.to', 'fuseurl.com', 'fuzzy.to', 
+    'fwd4.me', 'fwib.net', 'g.ro.lt', 'gizmo.do', 'gl.am', 'go.9nl.com', 
+    'go.ign.com', 'go.usa.gov', 'goo.gl', 'goshrink.com', 'gurl.es', 'hex.io',
+    'hiderefer.com', 'hmm.ph', 'href.in', 'hsblinks.com', 'htxt.it', 
+    'huff.to', 'hulu.com', 'hurl.me', 'hurl.ws', 'icanhaz.com', 'idek.net', 
+    'ilix.in', 'is.gd', 'its.my', 'ix.lt', 'j.mp', 'jijr.com', 'kl.am', 
+    'klck.me', 'korta.nu', 'krunchd.com', 'l9k.net', 'lat.ms', 'liip.to', 
+    'liltext.com', 'linkbee.com', 'linkbun.ch', 'liurl.cn', 
+    'ln-s.net', 'ln-s.ru', 'lnk.gd', 'lnk.ms', 'lnkd.in', 'lnkurl.com', 
+    'lru.jp', 'lt.tl', 'lurl.no', 'macte.ch', 'mash.to', 'merky.de', 
+    'migre.me', 'miniurl.com', 'minurl.fr', 'mke.mmke.by.to', 'moourl.com', 
+    'mrte.ch', 'myloc.mylocurl.in', 'n.pr', 'nbc.co', 'nblo.gs', 'nn.nf', 
+    'not.my', 'notlong.com', 'nsfw.in', 'nutshellurl.com', 'nxy.in', 
+    'nyti.ms', 'o-x.fr', 'oc1.us', 'om.ly', 'omf.gd', 'omoikane.net', 
+    'on.cnn.com', 'on.mktw.net', 'onforb.es', 'orz.se', 'ow.ly', 'ping.fm', 
+    'pli.gs', 'pnt.me', 'politi.co', 'post.ly', 'pp.gg', 'profile.to', 
+    'ptiturl.com', 'pub.vitrue.com', 'qlnk.net', 'qte.me', 'qu.tc', 'qy.fi', 
+    'r.im', 'rb6.me', 'read.bi', 'readthis.ca', 'reallytinyurl.com', 
+    'redir.ec', 'redirects.ca', 'redirx.com', 'retwt.me', 'ri.ms', 
+    'rickroll.it', 'riz.gd', 'rt.nu', 'ru.ly', 'rubyurl.com', 'rurl.org', 
+    'rww.tw', 's4c.in', 's7y.us', 'safe.mn', 'sameurl.com', 'sdut.us', 
+    'shar.es', 'shink.de', 'shorl.com', 'short.ie', 'short.to', 
+    'shortlinks.co.uk', 'shorturl.com', 'shout.to', 'show.my', 
+    'shrinkify.com', 'shrinkr.com', 'shrt.fr', 'shrt.st', 'shrten.com', 
+    'shrunkin.com', 'simurl.com', 'slate.me', 'smallr.com', 'smsh.me', 
+    'smurl.name', 'sn.im', 'snipr.sniprnipurl.com', 'snurl.com', 'sp2.ro', 
+    'spedr.com', 'srnk.net', 'srs.li', 'starturl.com', 'su.pr', 'surl.co.uk', 
+    'surl.hu', 't.t.t.t.t.t.lh.com', 'ta.gd', 'tbd.ly', 'tcrn.tcrn.tcme', 
+    'tgr.ph', 'tighturl.com', 'tiniuri.com', 'tiny.cc', 'tiny.ly', 'tiny.pl', 
+    'tinylink.in', 'tinyuri.ca', 'tinyurl.com', 'tk.', 'tl.gd', 'tmi.me', 
+    'tnij.org', 'tnw.to', 'tny.com', 'to.ly', 'togoto.us', 'totc.us', 
+    'toysr.us', 'tpm.ly', 'tr.im', 'tra.kz', 'trunc.it', 'twhub.com',
+    'twirl.at', 'twitclicks.com', 'twitterurl.net', 'twitterurl.org', 
+    'twiturl.de', 'twurl.cc', 'twurl.nl', 'u.mavrev.com', 'u.nu', 'u76.org', 
+    'ub0.cc', 'ulu.lu', 'updating.me', 'ur1.ca', 'url.az', 'url.co.uk', 
+    'url.ie', 'url360.me', 'url4.eu', 'urlborg.com', 'urlbrief.com', 
+    'urlcover.com', 'urlcut.com', 'urlenco.de', 'urli.nl', 'urls.im', 
+    'urlshorteningservicefortwitter.com', 'urlx.ie', 'urlzen.com', 'usat.ly', 
+    'use.my', 'vb.ly', 'vgn.am', 'vl.am', 'vm.lc', 'w55.de', 'wapo.st', 
+    'wapurl.co.uk', 'wipi.es', 'wp.me', 'x.vu', 'xr.com', 'xrl.in', 'xrl.us', 
+    'xurl.es', 'xurl.jp', 'y.ahoo.it', 'yatuc.com', 'ye.pe', 'yep.it',
+    'yfrog.com', 'yhoo.it', 'yiyd.com', 'youtu.be', 'yuarel.com', 'z0p.de', 
+    'zi.ma', 'zi.mu', 'zipmyurl.com', 'zud.me', 'zurl.ws', 'zz.gd', 'zzang.kr'
+    ))
+
+# Query parameters that only track where a click came from.
+TRACKING_PARAMS = set((
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid',
+    '_ga', '_hsenc', '_hsmi', 'mkt_tok', 'ocid', 'ncid', 'cmpid', 'smid',
+    'smtyp', 'partner', 'wt.mc_id', 'yclid', 'spm', 'ref_src', 'ref_url',
+    ))
+TRACKING_PARAM_PREFIXES = ('utm_', 'pk_', 'hmb_')
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+class DomainTrie(object):
+    """
+    Matches hostnames against a set of domains. Domains are stored label by
+    label from the top level down, so a lookup costs one step per label of
+    the hostname, and an entry also matches all of its subdomains. An entry
+    like `tk.` matches every host under the `tk` top-level domain.
+    """
+
+    def __init__(self, domains=()):
+        self._root = {}
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain):
+        node = self._root
+        for label in reversed(domain.lower().strip('.').split('.')):
+            node = node.setdefault(label, {})
+        node[None] = True
+
+    def match(self, host):
+        """Return the matching domain entry for host, or None."""
+        if not host:
+            return None
+        labels = host.lower().strip('.').split('.')
+        node = self._root
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[i])
+            if node is None:
+                return None
+            if None in node:
+                return '.'.join(labels[i:])
+        return None
+
+    def __contains__(self, host):
+        return self.match(host) is not None
+
+
+SHORT_URL_DOMAINS = DomainTrie(SHORT_URLS)
+
+
+def get_host(url):
+    """Return the lowercased hostname of a url, without port."""
+    return (urlsplit(url).hostname or '').rstrip('.')
+
+
+def is_short_url(url):
+    """Check if the url is on a known url shortening domain."""
+    return get_host(url) in SHORT_URL_DOMAINS
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def strip_tracking_params(query):
+    """Remove tracking parameters from a query string. Remaining parameters
+    keep their order and encoding."""
+    return '&'.join(param for param in query.split('&')
+        if param and not is_tracking_param(param.split('=', 1)[0]))
+
+
+def normalize_netloc(scheme, netloc):
+    """Lowercase the host and drop default ports and trailing dots."""
+    userinfo, _, hostport = netloc.rpartition('@')
+    if hostport.startswith('['):
+        # IPv6 literal
+        host, _, port = hostport.partition(']')
+        host, port = host + ']', port.lstrip(':')
+    else:
+        host, _, port = hostport.partition(':')
+    host = host.lower().rstrip('.')
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = '%s:%s' % (host, port)
+    return '%s@%s' % (userinfo, host) if userinfo else host
+
+
+def normalize_url(url):
+    """
+    Return the canonical form of a url:
+        - lowercase scheme and host
+        - no default port
+        - no tracking parameters
+        - no fragment, except for hashbang (#!) urls
+        - no trailing slash
+    """
+    if not url:
+        return url
+    scheme, netloc, path, query, fragment = urlsplit(url.strip())
+    scheme = scheme.lower()
+    netloc = normalize_netloc(scheme, netloc)
+    query = strip_tracking_params(query)
+    if not fragment.startswith('!'):
+        fragment = ''
+    if not query and not fragment:
+        path = path.rstrip('/')
+    return urlunsplit((scheme, netloc, path, query, fragment)).rstrip('/')
@@ -0,0 +1,34 @@
+"""
+In-memory table of user weights, so that scoring doesn't have to look up
+every tweeter in Elasticsearch.
+
+Weights only change when the universe is built, so a table is loaded once
+and kept until the build version stored with the universe changes.
+"""
+
+
+class WeightTable(object):
+
+    def __init__(self, version, user_weights):
+        """
+        :arg version: build version the weights were loaded from.
+        :arg user_weights: iterable of (user id, weight) pairs.
+        """
+        self.version = version
+        self.weights = dict(user_weights)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __contains__(self, user_id):
+        return user_id in self.weights
+
+    def get(self, user_id, default=None):
+        return self.weights.get(user_id, default)
+
+    def lookup(self, user_ids):
+        """Get a dict of the weights of the given users that are in the
+        table."""
+        weights = self.weights
+        return dict((user_id, weights[user_id])
+            for user_id in user_ids if user_id in weights)
@@ -1,14 +1,41 @@
-import subprocess
+"""
+Restart stalled bonfire components. Run periodically from cron, e.g.:
+
+    */5 * * * * python monitor.py
+
+The restart command is formatted with the universe and the bonfire command
+of the stalled component (collect or process).
+"""
 import datetime
-from bonfire.db import get_latest_raw_tweet
-
-def main():
-        if get_latest_raw_tweet('journotech'):
-            pass
-            # print 'bonfire collect queue not empty'
-        else:
-            print '%s restarting bonfire collect' % datetime.datetime.utcnow().isoformat()
-            subprocess.call('service bonfire-collect restart', shell=True)
+import subprocess
+import click
+from bonfire.config import get_universes
+from bonfire.health import universe_status
+
+COMMANDS = {
+    'collector': 'collect',
+    'processor': 'process'
+}
+
+
+@click.command()
+@click.argument('universes', nargs=-1)
+@click.option('--restart', default='service bonfire-%(command)s restart',
+    help='Restart command. May use %(universe)s and %(command)s.')
+def main(universes, restart):
+    """Restart the stalled collectors and processors of the given
+    universes, or of all configured universes."""
+    for universe in universes or get_universes():
+        for component, info in universe_status(universe).items():
+            if info['stalled']:
+                command = restart % {
+                    'universe': universe,
+                    'command': COMMANDS[component]
+                }
+                print '%s %s %s stalled (lag %ss), running: %s' % (
+                    datetime.datetime.utcnow().isoformat(), universe,
+                    component, info['lag'], command)
+                subprocess.call(command, shell=True)
 
 
 if __name__=='__main__':
@@ -10,7 +10,7 @@ from setuptools import setup, find_packages
 setup(
     name='bonfire',
     version='0.1',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     install_requires=[
         'Click',
@@ -0,0 +1,34 @@
+import unittest
+from bonfire.content import DefaultFetcher
+
+PAGE = """<html><head><title>Story</title>
+<meta property="og:url" content="%s">
+</head><body><p>The story.</p></body></html>"""
+
+
+def canonical_url(og_url, resolved_url, redirect_urls):
+    return DefaultFetcher(redirect_urls[0], html=PAGE % og_url,
+        resolved_url=resolved_url,
+        redirect_urls=redirect_urls).get_canonical_url()
+
+
+class CanonicalUrlTestCase(unittest.TestCase):
+
+    def test_canonical_redirecting_to_tracking_variant(self):
+        story = 'http://www.nytimes.com/2014/09/04/story.html'
+        self.assertEqual(canonical_url(story, story + '?_r=0',
+            ['http://nyti.ms/1abc', story]), story)
+
+    def test_canonical_redirector_on_another_host(self):
+        feed = 'http://feeds.example.com/~r/news/~3/abc'
+        story = 'http://news.example.com/story'
+        self.assertEqual(canonical_url(feed, story, [feed]), story)
+
+    def test_short_url_canonical(self):
+        story = 'http://news.example.com/story'
+        self.assertEqual(canonical_url('http://bit.ly/1abc', story,
+            ['http://bit.ly/1abc']), story)
+
+
+if __name__ == '__main__':
+    unittest.main()
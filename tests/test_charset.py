@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import codecs
+import unittest
+from bonfire import charset
+from bonfire.charset import decode_html, detect_encoding
+
+TEXT = u'Caf\xe9 – na\xefve'
+
+
+class TestDetectEncoding(unittest.TestCase):
+
+    def test_bom(self):
+        body = codecs.BOM_UTF8 + TEXT.encode('utf-8')
+        self.assertEqual(detect_encoding(body, 'text/html; charset=latin-1'),
+            ('utf-8', 'bom'))
+        self.assertEqual(decode_html(body)[0], TEXT)
+
+    def test_header(self):
+        self.assertEqual(detect_encoding('', 'text/html; charset="UTF-8"'),
+            ('utf-8', 'header'))
+        self.assertEqual(detect_encoding('', 'text/html; charset=iso-8859-1'),
+            ('cp1252', 'header'))
+
+    def test_unknown_header_charset_is_ignored(self):
+        self.assertEqual(detect_encoding('abc', 'text/html; charset=bogus'),
+            ('utf-8', 'utf-8'))
+
+    def test_meta_charset(self):
+        body = '<html><head><meta charset="windows-1251"></head>'
+        self.assertEqual(detect_encoding(body, 'text/html'),
+            ('cp1251', 'meta'))
+
+    def test_meta_http_equiv(self):
+        body = ('<meta http-equiv="Content-Type" '
+            'content="text/html; charset=Shift_JIS">')
+        self.assertEqual(detect_encoding(body), ('shift_jis', 'meta'))
+
+    def test_meta_utf16_is_utf8(self):
+        self.assertEqual(detect_encoding('<meta charset="utf-16">'),
+            ('utf-8', 'meta'))
+
+    def test_meta_past_scan_is_ignored(self):
+        body = ' ' * charset.META_SCAN_BYTES + '<meta charset="koi8-r">'
+        self.assertEqual(detect_encoding(body), ('utf-8', 'utf-8'))
+
+    def test_truncated_utf8(self):
+        body = TEXT.encode('utf-8')[:-1]
+        self.assertEqual(detect_encoding(body), ('utf-8', 'utf-8'))
+
+    def test_undeclared_legacy(self):
+        body = TEXT.encode('cp1252', 'replace')
+        encoding, source = detect_encoding(body)
+        self.assertIn(source, ('chardet', 'default'))
+        self.assertNotEqual(encoding, 'utf-8')
+
+    def test_default_without_chardet(self):
+        detector, charset.chardet = charset.chardet, None
+        try:
+            self.assertEqual(detect_encoding('caf\xe9 au lait'),
+                ('cp1252', 'default'))
+        finally:
+            charset.chardet = detector
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from bonfire import config
+
+CONFIG = """
+[universe:news]
+elasticsearch_hosts=es1, es2
+seed=
+    alice, bob,
+    carol
+max_content_length=%s
+
+[universe:tweeting]
+twitter_consumer_key=ck
+twitter_consumer_secret=cs
+twitter_access_token=at
+twitter_access_token_secret=ats
+"""
+
+
+class ConfigTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'bonfire.cfg')
+        self.write(1000)
+        self.env = os.environ.get(config.BONFIRE_CONFIG_ENV_VAR)
+        os.environ[config.BONFIRE_CONFIG_ENV_VAR] = self.path
+        config._settings = None
+
+    def tearDown(self):
+        config._settings = None
+        if self.env is None:
+            del os.environ[config.BONFIRE_CONFIG_ENV_VAR]
+        else:
+            os.environ[config.BONFIRE_CONFIG_ENV_VAR] = self.env
+        shutil.rmtree(self.dir)
+
+    def write(self, max_content_length, mtime=None):
+        with open(self.path, 'w') as f:
+            f.write(CONFIG % max_content_length)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_universe_config(self):
+        universe = config.universe_config('news')
+        self.assertEqual(universe.elasticsearch_hosts, ('es1', 'es2'))
+        self.assertEqual(universe.seed, ('alice', 'bob', 'carol'))
+        self.assertEqual(universe.max_content_length, 1000)
+        self.assertEqual(universe.stall_seconds, config.DEFAULT_STALL_SECONDS)
+        self.assertEqual(config.get_universes(), ['news', 'tweeting'])
+
+    def test_twitter_keys(self):
+        self.assertEqual(config.get_twitter_keys('tweeting'),
+            config.TwitterKeys('ck', 'cs', 'at', 'ats'))
+        self.assertEqual(config.universe_config('news').twitter_keys, None)
+
+    def test_reload_on_change(self):
+        config.settings()
+        self.write(2000, time.time() + 10)
+        config._last_checked = 0
+        self.assertTrue(config.maybe_reload())
+        self.assertEqual(config.get_max_content_length('news'), 2000)
+
+    def test_bad_reload_keeps_settings(self):
+        config.settings()
+        self.write('lots', time.time() + 10)
+        config._last_checked = 0
+        self.assertFalse(config.maybe_reload())
+        self.assertEqual(config.get_max_content_length('news'), 1000)
@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+from bonfire.dates import (
+    TWITTER_TIME_FORMAT,
+    dateify_string,
+    datestring_to_epoch,
+    datetime_to_epoch,
+    epoch_to_datetime,
+    lru_memoize,
+    parse_twitter_date,
+    stringify_date)
+
+
+class TwitterDateTestCase(unittest.TestCase):
+
+    def test_parse_matches_strptime(self):
+        for datestr in (
+                'Wed Aug 27 13:08:45 +0000 2008',
+                'Sat Jan 01 00:00:00 +0000 2000',
+                'Mon Dec 31 23:59:59 +0000 2012'):
+            self.assertEqual(parse_twitter_date(datestr),
+                datetime.strptime(datestr, TWITTER_TIME_FORMAT))
+
+    def test_round_trip(self):
+        dt = datetime(2014, 7, 4, 9, 5, 3)
+        self.assertEqual(dateify_string(stringify_date(dt)), dt)
+
+    def test_invalid_dates(self):
+        self.assertRaises(ValueError, parse_twitter_date, 'not a date')
+        self.assertRaises(ValueError, parse_twitter_date,
+            'Fri Feb 30 00:00:00 +0000 2014')
+        self.assertIsNone(dateify_string(''))
+
+    def test_other_formats(self):
+        self.assertEqual(dateify_string('2014/07/04 09:05', '%Y/%m/%d %H:%M'),
+            datetime(2014, 7, 4, 9, 5))
+
+
+class EpochTestCase(unittest.TestCase):
+
+    def test_epoch_round_trip(self):
+        dt = datetime(2014, 7, 4, 9, 5, 3)
+        self.assertEqual(datetime_to_epoch(dt), 1404464703000)
+        self.assertEqual(epoch_to_datetime(datetime_to_epoch(dt)), dt)
+
+    def test_datestring_to_epoch(self):
+        self.assertEqual(datestring_to_epoch('Fri Jul 04 09:05:03 +0000 2014'),
+            1404464703000)
+        self.assertIsNone(datestring_to_epoch(None))
+
+
+class LRUMemoizeTestCase(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        calls = []
+        @lru_memoize(2)
+        def double(x):
+            calls.append(x)
+            return x * 2
+        double(1)
+        double(2)
+        double(1)
+        double(3)
+        self.assertEqual(list(double.cache), [1, 3])
+        self.assertEqual(double(1), 2)
+        self.assertEqual(calls, [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import ConfigParser
+import io
+import unittest
+import requests
+from requests.structures import CaseInsensitiveDict
+from benchmarks.fakes import FakeES
+from bonfire import config, db
+from bonfire.content import declared_url, html_fingerprint, is_copy_of
+from bonfire.elastic import ESDocument
+from bonfire.process import process_rawtweet
+
+PAGE = u"""<html><head><title>Story</title>
+<script>var pageview = '%s';</script></head>
+<!-- generated %s -->
+<body><p>The  story.</p></body></html>"""
+
+ARTICLE = """<html><head><title>Story</title>
+<meta property="og:url" content="http://news.example.com/story">
+</head><body><p>The story.</p></body></html>"""
+
+INTERSTITIAL = """<html><head><title>Just a moment...</title>
+<link rel="canonical" href="/">
+</head><body><p>Checking your browser.</p></body></html>"""
+
+UNIVERSE = 'test_fingerprint'
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_ignores_scripts_comments_and_whitespace(self):
+        self.assertEqual(html_fingerprint(PAGE % ('a', '10:01')),
+            html_fingerprint((PAGE % ('b', '10:02')).replace('  ', '\n')))
+
+    def test_differs_with_content(self):
+        self.assertNotEqual(html_fingerprint(PAGE % ('a', '10:01')),
+            html_fingerprint((PAGE % ('a', '10:01')).replace('The', 'A')))
+
+
+class DeclaredUrlTestCase(unittest.TestCase):
+
+    def test_prefers_og_url(self):
+        html = ('<link href="http://a.com/c" rel="canonical">'
+            '<meta content="http://a.com/og" property="og:url">')
+        self.assertEqual(declared_url(html), 'http://a.com/og')
+
+    def test_relative_canonical(self):
+        self.assertEqual(declared_url(INTERSTITIAL, 'http://a.com/x/y'),
+            'http://a.com/')
+
+    def test_none(self):
+        self.assertEqual(declared_url(PAGE), None)
+
+    def test_is_copy_of(self):
+        self.assertTrue(is_copy_of(ARTICLE, 'http://news.example.com/story'))
+        self.assertFalse(is_copy_of(ARTICLE, 'http://news.example.com/other'))
+        self.assertFalse(is_copy_of(PAGE, 'http://news.example.com/story'))
+
+
+class PageSession(object):
+    """Serves a body for each url."""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get(self, url, **kwargs):
+        status, body = self.pages[url]
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({'Content-Type': 'text/html'})
+        response.raw = io.BytesIO(body)
+        return response
+
+
+def raw_tweet(id_str, url):
+    return ESDocument({
+        '_index': UNIVERSE,
+        '_type': db.UNPROCESSED_TWEET_DOCUMENT_TYPE,
+        '_id': id_str,
+        '_source': {
+            'id_str': id_str,
+            'text': 'Read %s' % url,
+            'created_at': 'Thu Sep 04 12:00:00 +0000 2014',
+            'retweet_count': 0,
+            'entities': {'urls': [{'expanded_url': url}]},
+            'user': {'id_str': '1', 'name': 'A', 'screen_name': 'a',
+                'profile_image_url': 'http://example.com/a.jpg'},
+        }
+    })
+
+
+class ProcessFingerprintTestCase(unittest.TestCase):
+
+    def setUp(self):
+        parser = ConfigParser.SafeConfigParser()
+        parser.add_section('universe:%s' % UNIVERSE)
+        self.settings = config._settings
+        config.use_settings(parser)
+        self.es = db._es_connections[UNIVERSE] = FakeES()
+
+    def tearDown(self):
+        del db._es_connections[UNIVERSE]
+        config._settings = self.settings
+
+    def content_url(self, id_str):
+        return self.es.docs[(UNIVERSE, db.TWEET_DOCUMENT_TYPE, id_str)][
+            'content_url']
+
+    def process(self, pages):
+        session = PageSession(pages)
+        for i, url in enumerate(sorted(pages)):
+            process_rawtweet(UNIVERSE, raw_tweet(str(i), url), session)
+
+    def test_copies_share_content(self):
+        self.process({
+            'http://news.example.com/story?ref=a': (200, ARTICLE),
+            'http://mirror.example.com/story': (200, ARTICLE),
+        })
+        self.assertEqual(self.content_url('0'), self.content_url('1'))
+
+    def test_identical_interstitials_dont_share_content(self):
+        self.process({
+            'http://news.example.com/one': (200, INTERSTITIAL),
+            'http://other.example.com/two': (200, INTERSTITIAL),
+            'http://news.example.com/three': (200, INTERSTITIAL),
+        })
+        self.assertEqual(len(set(self.content_url(str(i))
+            for i in range(3))), 3)
+
+    def test_error_pages_arent_fingerprinted(self):
+        self.process({
+            'http://news.example.com/gone': (404, ARTICLE),
+        })
+        self.assertFalse([key for key in self.es.docs
+            if key[1] == db.FINGERPRINT_DOCUMENT_TYPE])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import time
+import unittest
+import requests
+from bonfire.hosts import HostScheduler, HostUnavailable
+
+URL = 'http://slow.example.com/story'
+
+
+class HostSchedulerTestCase(unittest.TestCase):
+
+    def time_out(self, scheduler, url=URL):
+        try:
+            with scheduler.slot(url):
+                raise requests.exceptions.Timeout()
+        except requests.exceptions.Timeout:
+            pass
+
+    def test_circuit_opens_and_closes(self):
+        scheduler = HostScheduler(failure_threshold=2, cooldown=60)
+        self.time_out(scheduler)
+        with scheduler.slot(URL):
+            pass
+        self.time_out(scheduler)
+        self.time_out(scheduler)
+        with self.assertRaises(HostUnavailable):
+            with scheduler.slot(URL):
+                pass
+        # Other hosts are unaffected
+        with scheduler.slot('http://fast.example.com/'):
+            pass
+        # After the cooldown, one request tries the host again
+        scheduler.hosts['slow.example.com'].open_until = time.time() - 1
+        with scheduler.slot(URL):
+            pass
+        with scheduler.slot(URL):
+            pass
+
+    def test_stats(self):
+        scheduler = HostScheduler(failure_threshold=1)
+        self.time_out(scheduler)
+        with scheduler.slot('http://fast.example.com/'):
+            pass
+        stats = scheduler.stats()
+        self.assertEqual(stats['slow.example.com']['failures'], 1)
+        self.assertTrue(stats['slow.example.com']['open_seconds'] > 0)
+        self.assertEqual(stats['fast.example.com']['requests'], 1)
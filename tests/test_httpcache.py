@@ -0,0 +1,87 @@
+import BaseHTTPServer
+import shutil
+import tempfile
+import threading
+import unittest
+import requests
+from bonfire.httpcache import CachingHTTPAdapter, DiskCache
+
+PAGE = '<html><body><p>Hello</p></body></html>'
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_set(self):
+        cache = DiskCache(self.dir, 1024 * 1024)
+        cache.set('http://a/', {'status': 200}, PAGE)
+        meta, body = DiskCache(self.dir, 1024 * 1024).get('http://a/')
+        self.assertEqual(meta['status'], 200)
+        self.assertEqual(body, PAGE)
+        self.assertEqual(cache.get('http://b/'), None)
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskCache(self.dir, 1024 * 1024)
+        for url in ('http://a/', 'http://b/', 'http://c/'):
+            cache.set(url, {}, PAGE)
+        cache.files[cache.key('http://a/')] = (
+            cache.files[cache.key('http://a/')][0], 0)
+        cache.max_bytes = cache.size - 1
+        cache.set('http://b/', {}, PAGE)
+        self.assertEqual(cache.get('http://a/'), None)
+        self.assertNotEqual(cache.get('http://c/'), None)
+
+
+class CachingHTTPAdapterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        Handler.requests = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def test_revalidates(self):
+        session = requests.Session()
+        session.mount('http://', CachingHTTPAdapter(
+            DiskCache(self.dir, 1024 * 1024), max_body=1024))
+        url = 'http://127.0.0.1:%d/page' % self.server.server_port
+        first = session.get(url, stream=True)
+        second = session.get(url, stream=True)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(''.join(second.iter_content(16)), PAGE)
+        self.assertEqual(second.headers['etag'], '"v1"')
+        self.assertEqual(Handler.requests, [None, '"v1"'])
@@ -0,0 +1,17 @@
+import unittest
+from bonfire.indexcost import field_modes
+from bonfire.mappings import COMPACT_RESULTS_CACHE_MAPPING, TWEET_MAPPING
+
+
+class IndexCostTestCase(unittest.TestCase):
+
+    def test_field_modes(self):
+        modes = field_modes(TWEET_MAPPING['properties'])
+        self.assertEqual(modes['content_url'], 'not_analyzed')
+        self.assertEqual(modes['created_ms'], 'long')
+        modes = field_modes(COMPACT_RESULTS_CACHE_MAPPING['properties'])
+        self.assertEqual(modes['results'], 'not indexed')
+        self.assertEqual(modes['cached_at'], 'not indexed')
+        self.assertEqual(modes['hours_since'], 'integer+doc_values')
+        self.assertEqual(field_modes({'title': {'type': 'string'}}),
+            {'title': 'analyzed'})
@@ -0,0 +1,53 @@
+import unittest
+from bs4 import BeautifulSoup
+from bonfire.extract import ArticleExtractor
+from bonfire.profiles import (
+    CONFIRMATIONS,
+    MAX_MISSES,
+    ProfileCache,
+    node_selector,
+    provider_host)
+
+STORY = ' '.join(['word'] * 40)
+PAGE = """<html><head><link rel="shortcut icon" href="/icon.png"></head>
+<body><div id="nav"><p><a href="/">Home</a></p></div>
+<div class="story-body post-1234"><h1>Title</h1>
+<p>%s</p><p>%s</p></div></body></html>""" % (STORY, STORY)
+
+
+class ProfilesTestCase(unittest.TestCase):
+
+    def test_node_selector(self):
+        doc = BeautifulSoup('<div id="main"><section><div>'
+            '<p>Text</p></div></section></div>', 'html.parser')
+        self.assertEqual(node_selector(doc.p.parent),
+            'div#main > section > div')
+        self.assertEqual(node_selector(doc.p.parent, depth=2), None)
+        self.assertEqual(provider_host('http://www.example.com/a'),
+            'example.com')
+
+    def test_learn(self):
+        cache = ProfileCache()
+        for i in range(CONFIRMATIONS):
+            self.assertEqual(getattr(cache.get('a.com'), 'selector', None),
+                None)
+            cache.learn('a.com', selector='div.story', favicon='/i.png')
+        profile = cache.get('a.com')
+        self.assertEqual(profile.selector, 'div.story')
+        self.assertEqual(profile.favicon, '/i.png')
+        for i in range(MAX_MISSES):
+            self.assertEqual(profile.selector, 'div.story')
+            cache.learn('a.com', selector='div.other', matched=False)
+        self.assertEqual(profile.selector, None)
+        self.assertEqual(profile.candidate, 'div.other')
+
+    def test_extractor_selector(self):
+        full = ArticleExtractor(html=PAGE)
+        self.assertEqual(full.article_selector, 'div.story-body')
+        self.assertEqual(full.favicon, '/icon.png')
+        fast = ArticleExtractor(html=PAGE, selector=full.article_selector)
+        self.assertEqual(fast.get_article_text(), full.get_article_text())
+        self.assertTrue(fast.selector_matched)
+        missed = ArticleExtractor(html=PAGE, selector='div.gone')
+        self.assertEqual(missed.get_article_text(), full.get_article_text())
+        self.assertFalse(missed.selector_matched)
@@ -0,0 +1,34 @@
+import unittest
+from bonfire.db import projection, project, source_filter
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_no_projection(self):
+        self.assertEqual(projection(None), (None, None))
+
+    def test_content_fields_include_url(self):
+        self.assertEqual(projection(['title']), (['title', 'url'], []))
+
+    def test_tweet_fields(self):
+        self.assertEqual(projection(['title', 'tweets.text']),
+            (['title', 'url'], ['text']))
+
+    def test_whole_tweets(self):
+        self.assertEqual(projection(['tweets', 'tweets.text']),
+            (['url'], None))
+
+    def test_source_filter(self):
+        self.assertEqual(source_filter(None), None)
+        self.assertEqual(source_filter([]), False)
+        self.assertEqual(source_filter(['url']), {'include': ['url']})
+
+    def test_project(self):
+        doc = {'url': 'u', 'title': 't', 'text': 'long', 'rank': 1}
+        self.assertEqual(project(doc, ['url', 'title'], ('rank',)),
+            {'url': 'u', 'title': 't', 'rank': 1})
+        self.assertEqual(project({'text': 'long'}, None), {'text': 'long'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from bonfire.scorestats import DecayingStats
+
+
+class DecayingStatsTestCase(unittest.TestCase):
+
+    def test_without_decay(self):
+        stats = DecayingStats(half_life=3600)
+        for score in [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]:
+            stats.update(score, now=1000)
+        self.assertEqual(stats.weight, 8.0)
+        self.assertAlmostEqual(stats.mean, 5.0)
+        self.assertAlmostEqual(stats.std_deviation, 2.0)
+        self.assertAlmostEqual(stats.cutoff(2), 9.0)
+
+    def test_decay(self):
+        stats = DecayingStats(half_life=3600)
+        stats.update(1.0, now=0)
+        stats.update(1.0, now=0)
+        # The two old scores now weigh as much as the new one
+        stats.update(4.0, now=3600)
+        self.assertAlmostEqual(stats.weight, 2.0)
+        self.assertAlmostEqual(stats.mean, 2.5)
+        self.assertAlmostEqual(stats.variance, 2.25)
+
+    def test_round_trip(self):
+        stats = DecayingStats(half_life=60)
+        stats.update(3.0, now=10)
+        stats.update(5.0, now=20)
+        copy = DecayingStats.from_dict(60, stats.to_dict())
+        self.assertEqual(copy.to_dict(), stats.to_dict())
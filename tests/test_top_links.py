@@ -0,0 +1,52 @@
+import logging
+import unittest
+from benchmarks.fakes import FakeES
+from bonfire import db
+
+UNIVERSE = 'test_top_links'
+
+
+class TestTopUrls(unittest.TestCase):
+
+    def setUp(self):
+        self.max_top_urls = db.MAX_TOP_URLS
+        db.MAX_TOP_URLS = 3
+
+    def tearDown(self):
+        db.MAX_TOP_URLS = self.max_top_urls
+        db._top_urls.pop('test', None)
+
+    def test_least_recently_noted_are_forgotten(self):
+        db.remember_top_urls('test', ['a', 'b', 'c'])
+        db.remember_top_urls('test', ['a', 'd'])
+        self.assertEqual(list(db._top_urls['test']), ['c', 'a', 'd'])
+
+
+
+class TestDetectTopLink(unittest.TestCase):
+
+    def setUp(self):
+        self.es = db._es_connections[UNIVERSE] = FakeES()
+        self.get_top_link = db.get_top_link
+        db.get_top_link = lambda universe, items: items[0]
+        logging.disable(logging.ERROR)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        db.get_top_link = self.get_top_link
+        del db._es_connections[UNIVERSE]
+        db._top_link_handlers.pop(UNIVERSE, None)
+        db._top_urls.pop(UNIVERSE, None)
+
+    def test_failing_handler(self):
+        def handler(universe, link):
+            raise RuntimeError('Rate limit exceeded')
+        db.watch_top_links(UNIVERSE, handler)
+        link = {'url': 'http://example.com/story', 'score': 10.0}
+        self.assertEqual(db.detect_top_link(UNIVERSE, [link]), link)
+        self.assertIn((db.TOP_CONTENT_INDEX, db.TOP_CONTENT_DOCUMENT_TYPE,
+            link['url']), self.es.docs)
+
+
+if __name__ == '__main__':
+    unittest.main()
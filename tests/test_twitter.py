@@ -0,0 +1,47 @@
+import unittest
+from birdy.twitter import JSONObject, StreamResponse
+from bonfire.twitter import stream_tweets
+
+
+class CountingHeartbeat(object):
+
+    def __init__(self):
+        self.beats = 0
+
+    def beat(self):
+        self.beats += 1
+
+
+class LinesResponse(object):
+
+    def __init__(self, lines):
+        self.url = 'https://stream.twitter.com/1.1/statuses/filter.json'
+        self.headers = {}
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def stream_response(lines):
+    return StreamResponse(LinesResponse(lines), 'POST', JSONObject)
+
+
+class StreamTweetsTestCase(unittest.TestCase):
+
+    def test_quiet_stream_beats_on_keep_alives(self):
+        heartbeat = CountingHeartbeat()
+        tweets = list(stream_tweets(stream_response(['', '', '']), heartbeat))
+        self.assertEqual(tweets, [])
+        self.assertEqual(heartbeat.beats, 3)
+
+    def test_yields_tweets(self):
+        heartbeat = CountingHeartbeat()
+        tweets = list(stream_tweets(stream_response(
+            ['', '{"id_str": "1"}', '{"id_str": "2"}']), heartbeat))
+        self.assertEqual([t.id_str for t in tweets], ['1', '2'])
+        self.assertEqual(heartbeat.beats, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
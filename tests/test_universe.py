@@ -1,7 +1,23 @@
 import unittest
+from bonfire.universe import tally_weights, weight_changes
 
 
 class UniverseTestCase(unittest.TestCase):
 
     def test_universe(self):
         self.assertTrue(True)
+
+    def test_tally_weights(self):
+        weights = tally_weights({'a': ['b', 'c'], 'b': ['c']})
+        self.assertEqual(weights, {'a': 0.5, 'b': 1.0, 'c': 1.0})
+
+    def test_weight_changes(self):
+        old = tally_weights({'a': ['b', 'c'], 'b': ['c']})
+        new = tally_weights({'a': ['b', 'd'], 'b': ['c']})
+        changed, removed = weight_changes(old, new)
+        self.assertEqual(changed, {'c': 0.5, 'd': 0.5})
+        self.assertEqual(removed, set())
+        changed, removed = weight_changes(old, tally_weights({'a': ['b']}))
+        self.assertEqual(changed, {'a': 1.0})
+        self.assertEqual(removed, set(['c']))
+        self.assertEqual(weight_changes(old, old), ({}, set()))
@@ -0,0 +1,62 @@
+import unittest
+from bonfire.urls import (
+    DomainTrie,
+    is_short_url,
+    normalize_url,
+    strip_tracking_params)
+
+
+class DomainTrieTestCase(unittest.TestCase):
+
+    def test_exact_and_subdomain_match(self):
+        trie = DomainTrie(['bit.ly', 'on.cnn.com'])
+        self.assertEqual(trie.match('bit.ly'), 'bit.ly')
+        self.assertEqual(trie.match('www.bit.ly'), 'bit.ly')
+        self.assertEqual(trie.match('on.cnn.com'), 'on.cnn.com')
+        self.assertIsNone(trie.match('cnn.com'))
+        self.assertIsNone(trie.match('notbit.ly'))
+        self.assertIsNone(trie.match(''))
+
+    def test_top_level_domain_entry(self):
+        trie = DomainTrie(['tk.'])
+        self.assertTrue('example.tk' in trie)
+        self.assertFalse('example.tky' in trie)
+
+    def test_is_short_url(self):
+        self.assertTrue(is_short_url('http://BIT.LY/abc'))
+        self.assertTrue(is_short_url('https://m.youtu.be:443/abc'))
+        self.assertFalse(is_short_url('http://example.com/bit.ly'))
+
+
+class NormalizeURLTestCase(unittest.TestCase):
+
+    def test_strip_tracking_params(self):
+        self.assertEqual(
+            strip_tracking_params('a=1&utm_source=twitter&UTM_medium=x&b=2'),
+            'a=1&b=2')
+        self.assertEqual(strip_tracking_params('fbclid=abc'), '')
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            normalize_url('HTTP://Example.COM:80/story/?utm_campaign=x#top'),
+            'http://example.com/story')
+        self.assertEqual(
+            normalize_url('https://example.com:8443/a?id=5&gclid=1'),
+            'https://example.com:8443/a?id=5')
+        self.assertEqual(
+            normalize_url('http://example.com/#!/page'),
+            'http://example.com/#!/page')
+        self.assertEqual(normalize_url('http://[::1]:80/a/'), 'http://[::1]/a')
+
+    def test_variants_share_normal_form(self):
+        variants = [
+            'http://www.example.com/a/b',
+            'http://www.example.com/a/b/',
+            'http://WWW.example.com/a/b?utm_source=feed',
+            'http://www.example.com/a/b#comments',
+        ]
+        self.assertEqual(len(set(map(normalize_url, variants))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,12 @@
+import unittest
+from bonfire.weights import WeightTable
+
+
+class WeightTableTestCase(unittest.TestCase):
+
+    def test_lookup(self):
+        table = WeightTable(1, [('1', 0.5), ('2', 1.0)])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.get('2'), 1.0)
+        self.assertEqual(table.get('3', 0.0), 0.0)
+        self.assertEqual(table.lookup(['1', '3', '1']), {'1': 0.5})
@@ -1,12 +1,29 @@
 #!/usr/bin/env python
 import os
 import sys
-from flask import Flask, render_template, request, jsonify
+from flask import (
+    Blueprint,
+    Flask,
+    current_app,
+    jsonify,
+    render_template,
+    request)
 from werkzeug.contrib.atom import AtomFeed
+from werkzeug.wsgi import DispatcherMiddleware
 from bonfire.db import get_universe_tweets, get_items, search_items, get_recent_top_links
 from bonfire.dates import dateify_string, stringify_date, now, apply_offset
+from cache import ResponseCache
+
+views = Blueprint('bonfire', __name__)
+cache = ResponseCache()
+
+# Seconds each kind of response is served from the cache before refreshing
+SHORT_TTL = 60
+LONG_TTL = 300
+
+def split_fields(fields):
+    return [field.strip() for field in fields.split(',') if field.strip()]
 
-app = Flask(__name__)
 
 def clean_params(params):
     # Add tz info so the date parser works (apply the offset later)
@@ -22,7 +39,8 @@ def clean_params(params):
         'start': dateify_string,
         'end': dateify_string,
         'scoring': bool,
-        'time_decay': bool
+        'time_decay': bool,
+        'fields': split_fields
     }
     cleaned_params = {}
     for param, val in params.items():
@@ -41,6 +59,35 @@ def clean_params(params):
     return cleaned_params
 
 
+def create_app(universe):
+    """Create a Flask app serving a single universe."""
+    app = Flask(__name__)
+    app.config['BONFIRE_UNIVERSE'] = universe
+    app.register_blueprint(views)
+    return app
+
+
+def create_dispatcher(universes):
+    """
+    Create a WSGI application serving each universe under its own path
+    prefix, e.g. /journotech/fresh/. With a single universe, that universe
+    is also served from the root.
+    """
+    apps = dict(('/%s' % u, create_app(u)) for u in universes)
+    if len(universes) == 1:
+        root = create_app(universes[0])
+    else:
+        root = Flask(__name__)
+        @root.route('/')
+        def index():
+            return jsonify({'status': 'OK', 'universes': sorted(universes)})
+    return DispatcherMiddleware(root, apps)
+
+
+def current_universe():
+    return current_app.config['BONFIRE_UNIVERSE']
+
+
 def respond_json(items):
     response = {
         'status': 'OK',
@@ -61,7 +108,7 @@ def respond_html(items, params):
     else:
         end = stringify_date(now())
     kwargs = {
-        'universe': universe,
+        'universe': current_universe(),
         'links': items,
         'dates': {
             'start': start,
@@ -81,45 +128,49 @@ def top_links(raw_params):
             del params['time_decay']
         #params.pop('hours')
         #params.pop('time_decay')
-        links = search_items(universe, *args, **params)
+        links = search_items(current_universe(), *args, **params)
     else:
-        links = get_items(universe, **params)
+        links = get_items(current_universe(), **params)
 
     if request.path.endswith('json'):
         return respond_json(links)
     return respond_html(links, params)
 
 
-@app.route('/get_items.json')
+@views.route('/get_items.json')
+@cache.cached(SHORT_TTL)
 def get_items_json():
     return top_links(request.args)
 
 
-@app.route('/search_items.json')
+@views.route('/search_items.json')
 def search_items_json():
     return top_links(request.args)
 
 
-@app.route("/")
+@views.route("/")
 def home():
     return day()
 
 
-@app.route("/fresh/")
+@views.route("/fresh/")
+@cache.cached(SHORT_TTL)
 def fresh():
     params = dict(request.args.items())
     params['hours'] = 4
     return top_links(params)
 
 
-@app.route("/day/")
+@views.route("/day/")
+@cache.cached(SHORT_TTL)
 def day():
     params = dict(request.args.items())
     params['hours'] = 24
     return top_links(params)
 
 
-@app.route("/week/")
+@views.route("/week/")
+@cache.cached(LONG_TTL)
 def week():
     params = dict(request.args.items())
     params['hours'] = 24 * 7
@@ -127,11 +178,14 @@ def week():
     return top_links(params)
 
 
-@app.route("/feed/")
+@views.route("/feed/")
+@cache.cached(LONG_TTL)
 def feed():
+    universe = current_universe()
     feed = AtomFeed('Top links in %s' % universe,
         feed_url=request.url, url=request.url_root)
-    links = get_recent_top_links(universe, quantity=20)
+    links = get_recent_top_links(universe, quantity=20,
+        fields=['title', 'description', 'tweets.created'])
     for link in links:
         feed.add(link['title'], unicode(link['description']),
             url=link['url'],
@@ -140,20 +194,20 @@ def feed():
     return feed.get_response()
 
 
-global universe
-if 'BONFIRE_UNIVERSE' in os.environ:
-    universe = os.environ.get('BONFIRE_UNIVERSE')
-
 USAGE = """
 USAGE:
 
  $ python app.py <universe>
 
+For production serving, see serve.py.
 """
 
 if __name__ == "__main__":
     try:
         universe = sys.argv[1]
-        app.run(debug=True)
     except IndexError:
+        universe = os.environ.get('BONFIRE_UNIVERSE')
+    if universe is None:
         print USAGE
+    else:
+        create_app(universe).run(debug=True)
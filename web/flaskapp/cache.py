@@ -0,0 +1,140 @@
+"""
+Response cache for the Bonfire web app.
+
+Rendered responses are kept in memory, keyed by the request path and its
+normalized query parameters. Each cached response carries an ETag and a
+Last-Modified date, so clients revalidating with If-None-Match or
+If-Modified-Since get a 304 without the response being rebuilt.
+
+Once an entry is older than its TTL it is still served for a grace period
+while a background thread rebuilds it, so a burst of traffic results in a
+single Elasticsearch query per entry rather than one per request.
+"""
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request
+
+# Parameters that do not change the response, e.g. jQuery cache busting
+IGNORED_PARAMS = ('_',)
+
+
+def logger():
+    return logging.getLogger(__name__)
+
+
+class CachedResponse(object):
+
+    def __init__(self, response):
+        self.data = response.get_data()
+        self.status = response.status_code
+        self.content_type = response.headers.get('Content-Type')
+        self.etag = hashlib.md5(self.data).hexdigest()
+        self.created = time.time()
+        self.last_modified = datetime.utcfromtimestamp(int(self.created))
+
+    def age(self):
+        return time.time() - self.created
+
+
+class ResponseCache(object):
+    """
+    In-memory cache of rendered view responses.
+
+    :arg max_entries: number of responses to keep before evicting the oldest.
+    :arg grace: seconds past its TTL that a stale response may be served
+        while it is refreshed in the background.
+    """
+
+    def __init__(self, max_entries=512, grace=300):
+        self.max_entries = max_entries
+        self.grace = grace
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def key(self):
+        """Cache key for the current request: mount point, path, and the
+        sorted, non-empty query parameters."""
+        params = sorted((k, v.strip()) for k, v in
+            request.args.iteritems(multi=True)
+            if k not in IGNORED_PARAMS and v.strip())
+        return (request.script_root, request.path, tuple(params))
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries,
+                    key=lambda k: self._entries[k].created)
+                del self._entries[oldest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def cached(self, ttl):
+        """Decorate a view so its responses are cached for ttl seconds."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self.key()
+                entry = self.get(key)
+                if entry is None or entry.age() > ttl + self.grace:
+                    entry = self._render(key, view, args, kwargs)
+                elif entry.age() > ttl:
+                    self._refresh(key, view, args, kwargs)
+                return self._respond(entry, ttl)
+            return wrapper
+        return decorator
+
+    def _render(self, key, view, args, kwargs):
+        response = current_app.make_response(view(*args, **kwargs))
+        entry = CachedResponse(response)
+        if entry.status == 200:
+            self.set(key, entry)
+        return entry
+
+    def _refresh(self, key, view, args, kwargs):
+        """Rebuild an entry in a background thread, unless that is already
+        being done."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        app = current_app._get_current_object()
+        environ = {
+            'path': request.path,
+            'base_url': request.url_root,
+            'query_string': request.query_string,
+        }
+
+        def refresh():
+            try:
+                with app.test_request_context(**environ):
+                    self._render(key, view, args, kwargs)
+            except Exception:
+                logger().exception('Failed to refresh %s' % (key,))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _respond(self, entry, ttl):
+        response = current_app.response_class(entry.data,
+            status=entry.status, content_type=entry.content_type)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = max(int(ttl - entry.age()), 0)
+        return response.make_conditional(request)
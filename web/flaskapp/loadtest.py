@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Load test a running Bonfire web app and report latency per endpoint.
+
+    $ python loadtest.py http://127.0.0.1:5000/journotech -n 200 -c 10
+"""
+import math
+import threading
+import time
+from Queue import Queue, Empty
+import click
+import requests
+
+DEFAULT_ENDPOINTS = (
+    '/', '/fresh/', '/day/', '/week/', '/get_items.json', '/feed/')
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def run_endpoint(url, requests_, concurrency):
+    """Request url requests_ times from concurrency threads.
+    Returns a tuple of (latencies in ms, error count)."""
+    queue = Queue()
+    for _ in range(requests_):
+        queue.put(url)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    session = requests.Session()
+
+    def worker():
+        while True:
+            try:
+                url = queue.get_nowait()
+            except Empty:
+                return
+            start = time.time()
+            try:
+                ok = session.get(url, timeout=30).status_code < 400
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed = (time.time() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, len(errors)
+
+
+@click.command()
+@click.argument('base_url')
+@click.option('-e', '--endpoint', multiple=True,
+    help='Endpoint to test. May be repeated. Defaults to all pages.')
+@click.option('-n', '--requests', 'requests_', default=100,
+    help='Requests per endpoint.')
+@click.option('-c', '--concurrency', default=10)
+def loadtest(base_url, endpoint, requests_, concurrency):
+    """Report p50/p99 latency for each endpoint under BASE_URL."""
+    endpoints = endpoint or DEFAULT_ENDPOINTS
+    row = '%-20s %8s %8s %10s %10s %10s'
+    click.echo(row % ('endpoint', 'ok', 'errors', 'p50 ms', 'p99 ms', 'req/s'))
+    for path in endpoints:
+        start = time.time()
+        latencies, errors = run_endpoint(
+            base_url.rstrip('/') + path, requests_, concurrency)
+        elapsed = time.time() - start
+        click.echo(row % (path, len(latencies), errors,
+            '%.1f' % percentile(latencies, 50),
+            '%.1f' % percentile(latencies, 99),
+            '%.1f' % (requests_ / elapsed)))
+
+
+if __name__ == '__main__':
+    loadtest()
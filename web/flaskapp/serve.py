@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Serve the Bonfire web app for one or more universes with multiple workers.
+
+Uses gunicorn when it is installed, and otherwise falls back to a threaded
+werkzeug server in a single process, which keeps the response cache, the
+Elasticsearch connection pools and the metrics of one process across
+requests. Each universe is served under its own path prefix.
+
+    $ python serve.py --workers 4 journotech knightlab
+
+Under gunicorn each worker serves its own metrics, on the first free port
+of the `workers` ports from the metrics port on.
+"""
+import click
+from bonfire import metrics
+from bonfire.config import get_universes
+from app import create_dispatcher
+
+
+def serve_gunicorn(application, host, port, workers, threads,
+                   metrics_port=None):
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        # Exporters started in the master would only see its metrics
+        metrics.configure(metrics_port, ports=workers)
+
+    class Server(BaseApplication):
+
+        def load_config(self):
+            self.cfg.set('bind', '%s:%d' % (host, port))
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('post_fork', post_fork)
+
+        def load(self):
+            return application
+
+    Server().run()
+
+
+def serve_werkzeug(application, host, port, threads):
+    # werkzeug's processes fork a child for every request, which would
+    # throw away the caches and pools that serving is meant to keep
+    from werkzeug.serving import run_simple
+    run_simple(host, port, application, threaded=threads > 1)
+
+
+@click.command()
+@click.argument('universes', nargs=-1)
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=5000)
+@click.option('--workers', default=4, help='Number of worker processes.')
+@click.option('--threads', default=4, help='Threads per worker (gunicorn).')
+@click.option('--metrics-port', type=int,
+    help='Port to serve metrics on, instead of the [metrics] http_port.')
+def serve(universes, host, port, workers, threads, metrics_port):
+    """Serve the given universes, or all configured universes."""
+    universes = list(universes) or get_universes()
+    application = create_dispatcher(universes)
+    click.echo('Serving %s on %s:%d' % (', '.join(universes), host, port))
+    try:
+        import gunicorn
+    except ImportError:
+        if workers > 1:
+            click.echo('gunicorn is not installed, so serving from one '
+                'process. Install gunicorn for --workers.')
+        metrics.configure(metrics_port)
+        serve_werkzeug(application, host, port, threads)
+    else:
+        serve_gunicorn(application, host, port, workers, threads,
+            metrics_port)
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,22 @@
+"""
+WSGI entry point serving every universe by path prefix.
+
+Universes are taken from the comma-separated BONFIRE_UNIVERSES environment
+variable, or BONFIRE_UNIVERSE, and default to all configured universes.
+For example, with gunicorn:
+
+    $ BONFIRE_UNIVERSES=journotech,knightlab gunicorn -w 4 wsgi:application
+"""
+import os
+from bonfire.config import CONFIG_LIST_REGEX, get_universes
+from app import create_dispatcher
+
+
+def configured_universes():
+    names = os.environ.get('BONFIRE_UNIVERSES') or \
+        os.environ.get('BONFIRE_UNIVERSE', '')
+    universes = [u for u in CONFIG_LIST_REGEX.split(names) if u]
+    return universes or get_universes()
+
+
+application = create_dispatcher(configured_universes())